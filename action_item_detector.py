@@ -4,21 +4,110 @@ Action Item Detector
 Analyzes contracts for time-sensitive action items and sends notifications via AWS SNS.
 """
 
+import json
 import logging
 import os
 import re
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
 
 import boto3
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 
+from contract_structure import ContractStructure
+from notification_outbox import NotificationOutbox
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 
+ACTION_ITEM_TYPES = ["expiration", "payment_due", "audit_due", "renewal", "notice_period", "other"]
+ACTION_ITEM_PRIORITIES = ["high", "medium", "low"]
+
+# Number of repair round-trips for malformed items
+ACTION_ITEM_REPAIR_ATTEMPTS = 1
+
+ACTION_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string", "enum": ACTION_ITEM_TYPES},
+        "description": {"type": "string", "minLength": 1},
+        "due_date": {"type": ["string", "null"], "pattern": r"^\d{4}-\d{2}-\d{2}$"},
+        "priority": {"type": "string", "enum": ACTION_ITEM_PRIORITIES},
+        "action_required": {"type": "string"},
+    },
+    "required": ["type", "description", "due_date", "priority", "action_required"],
+}
+
+ACTION_ITEMS_TOOL = {
+    "name": "record_action_items",
+    "description": "Record the time-sensitive action items found in a contract.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "action_items": {"type": "array", "items": ACTION_ITEM_SCHEMA},
+        },
+        "required": ["action_items"],
+    },
+}
+
+
+def _compile_item_validator(schema: Dict) -> Callable[[object], List[str]]:
+    """
+    Compile the action item schema into a validator function.
+    
+    Supports the subset of JSON Schema used by ACTION_ITEM_SCHEMA (type,
+    enum, pattern, minLength, required). Checks are built once so each item
+    is validated in a single pass over its fields.
+    """
+    type_map = {"string": (str,), "null": (type(None),), "integer": (int,), "number": (int, float)}
+    required = list(schema.get("required", []))
+    checks = []
+    
+    for field, field_schema in schema["properties"].items():
+        types = field_schema.get("type", [])
+        if isinstance(types, str):
+            types = [types]
+        python_types = tuple(t for name in types for t in type_map[name])
+        enum = set(field_schema["enum"]) if "enum" in field_schema else None
+        pattern = re.compile(field_schema["pattern"]) if "pattern" in field_schema else None
+        min_length = field_schema.get("minLength")
+        checks.append((field, python_types, enum, pattern, min_length))
+    
+    def validate(item: object) -> List[str]:
+        if not isinstance(item, dict):
+            return ["item is not an object"]
+        errors = [f"missing required field '{field}'" for field in required if field not in item]
+        for field, python_types, enum, pattern, min_length in checks:
+            if field not in item:
+                continue
+            value = item[field]
+            if python_types and not isinstance(value, python_types):
+                errors.append(f"'{field}' has wrong type {type(value).__name__}")
+                continue
+            if not isinstance(value, str):
+                continue
+            if enum is not None and value not in enum:
+                errors.append(f"'{field}' must be one of {sorted(enum)}")
+            if pattern is not None and not pattern.match(value):
+                errors.append(f"'{field}' does not match {pattern.pattern}")
+            if min_length is not None and len(value.strip()) < min_length:
+                errors.append(f"'{field}' is empty")
+        if not errors and isinstance(item.get("due_date"), str):
+            try:
+                datetime.strptime(item["due_date"], "%Y-%m-%d")
+            except ValueError:
+                errors.append("'due_date' is not a valid calendar date")
+        return errors
+    
+    return validate
+
+
+_validate_action_item = _compile_item_validator(ACTION_ITEM_SCHEMA)
+
+
 class ActionItemDetector:
     """Detects action items from contracts and sends notifications."""
     
@@ -28,6 +117,11 @@ class ActionItemDetector:
         self.user_email = os.getenv("USER_EMAIL")
         self.box_service = box_service  # Store box service for getting email
         self._initialize_sns()
+        # Deduplicating, digesting outbox for scheduled notifications
+        self.outbox = NotificationOutbox(
+            publisher=self._publish_to_sns,
+            message_builder=self._build_email_message
+        )
     
     def _initialize_sns(self):
         """Initialize AWS SNS client."""
@@ -51,12 +145,20 @@ class ActionItemDetector:
         box_service,
         contract_file_id: str,
         contract_filename: str,
-        contract_text: str
+        contract_text: str,
+        structure: Optional[ContractStructure] = None
     ) -> List[Dict]:
-        """Analyze contract for action items using Box AI."""
+        """
+        Analyze contract for action items using Bedrock structured output.
+        
+        With a ContractStructure, only the preamble and the clauses that
+        mention dates or deadline language are sent.
+        """
         
         action_items_prompt = f"""Analyze this contract and identify any time-sensitive action items or deadlines.
 
+Today's date is {datetime.now().strftime('%Y-%m-%d')}.
+
 Look for:
 1. Contract expiration dates (within 10 days)
 2. Payment due dates (upcoming)
@@ -65,154 +167,124 @@ Look for:
 5. Notice periods that need action
 6. Any other time-sensitive obligations
 
-Contract content:
-{contract_text[:5000]}...
-
-For each action item found, provide:
-- Type: (expiration, payment_due, audit_due, renewal, notice_period, other)
-- Description: Brief description of the action item
-- Due Date: The specific date (format: YYYY-MM-DD)
-- Days Until Due: Number of days until the deadline
-- Priority: (high, medium, low)
-- Action Required: What the user needs to do
-
-Format your response as a structured list. If no action items found, respond with "No action items found."
-
-Example format:
-ACTION ITEM 1:
-Type: expiration
-Description: Contract expires on December 31, 2024
-Due Date: 2024-12-31
-Days Until Due: 5
-Priority: high
-Action Required: Review and decide on renewal or termination
-
-ACTION ITEM 2:
-Type: payment_due
-Description: Quarterly payment due on January 15, 2025
-Due Date: 2025-01-15
-Days Until Due: 8
-Priority: medium
-Action Required: Ensure payment is processed before due date
+Record every action item with the {ACTION_ITEMS_TOOL['name']} tool. Use an empty list if there are none.
+Give due dates as YYYY-MM-DD, or null if the contract does not fix a date.
 """
         
         try:
-            # Box AI call is async
-            response = await box_service.ask_ai_about_file(
-                contract_file_id, action_items_prompt
+            response = await box_service.ask_ai_structured(
+                contract_file_id, action_items_prompt, ACTION_ITEMS_TOOL,
+                contract_text=structure.action_item_excerpt() if structure else contract_text
             )
             
-            # Parse the response to extract action items
-            action_items = self._parse_action_items(response, contract_filename)
+            raw_items = response.get('action_items')
+            if not isinstance(raw_items, list):
+                logger.error(f"Malformed action item response for {contract_filename}: {response}")
+                return []
             
-            return action_items
+            valid_items, invalid_items = self._validate_action_items(raw_items)
+            
+            # Only the malformed items are sent back for repair
+            if invalid_items:
+                valid_items.extend(
+                    await self._repair_action_items(box_service, invalid_items, contract_filename)
+                )
+            
+            return self._normalize_action_items(valid_items, contract_filename)
             
         except Exception as e:
             logger.error(f"Error analyzing contract for action items: {e}")
             return []
     
-    def _parse_action_items(self, ai_response: str, contract_filename: str) -> List[Dict]:
-        """Parse AI response to extract structured action items."""
-        action_items = []
-        
-        if "no action items found" in ai_response.lower():
-            return []
-        
-        # Split by "ACTION ITEM" markers
-        items_text = re.split(r'ACTION ITEM\s*\d+:', ai_response, flags=re.IGNORECASE)
+    def _validate_action_items(self, raw_items: List) -> Tuple[List[Dict], List[Tuple[object, List[str]]]]:
+        """Split raw items into valid ones and (item, errors) pairs for invalid ones."""
+        valid_items = []
+        invalid_items = []
+        for raw_item in raw_items:
+            errors = _validate_action_item(raw_item)
+            if errors:
+                invalid_items.append((raw_item, errors))
+            else:
+                valid_items.append(raw_item)
+        return valid_items, invalid_items
+    
+    async def _repair_action_items(
+        self,
+        box_service,
+        invalid_items: List[Tuple[object, List[str]]],
+        contract_filename: str
+    ) -> List[Dict]:
+        """Ask the model to fix only the malformed items, then re-validate them."""
+        logger.warning(f"{len(invalid_items)} malformed action item(s) in {contract_filename}, requesting repair")
         
-        for item_text in items_text[1:]:  # Skip first empty split
+        for attempt in range(ACTION_ITEM_REPAIR_ATTEMPTS):
+            problems = "\n".join(
+                f"- Item {i + 1}: {json.dumps(item, default=str)}\n  Errors: {'; '.join(errors)}"
+                for i, (item, errors) in enumerate(invalid_items)
+            )
+            repair_prompt = f"""These action items extracted from a contract do not match the required schema.
+Fix each one and record the corrected items with the {ACTION_ITEMS_TOOL['name']} tool.
+Keep the meaning of each item; drop an item only if it cannot be fixed.
+
+{problems}
+"""
             try:
-                item = {}
-                
-                # Extract type
-                type_match = re.search(r'Type:\s*(\w+)', item_text, re.IGNORECASE)
-                if type_match:
-                    item['type'] = type_match.group(1).lower()
-                
-                # Extract description
-                desc_match = re.search(r'Description:\s*(.+?)(?:\n|Due Date:)', item_text, re.IGNORECASE | re.DOTALL)
-                if desc_match:
-                    item['description'] = desc_match.group(1).strip()
-                
-                # Extract due date
-                date_match = re.search(r'Due Date:\s*(\d{4}-\d{2}-\d{2})', item_text)
-                if date_match:
-                    item['due_date'] = date_match.group(1)
-                    item['due_date_obj'] = datetime.strptime(item['due_date'], '%Y-%m-%d')
-                    
-                    # Calculate days until due
-                    days_until = (item['due_date_obj'] - datetime.now()).days
-                    item['days_until_due'] = days_until
-                else:
-                    # Try to extract date from description
-                    date_patterns = [
-                        r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-                        r'(\w+\s+\d{1,2},?\s+\d{4})',
-                    ]
-                    for pattern in date_patterns:
-                        date_match = re.search(pattern, item_text)
-                        if date_match:
-                            try:
-                                # Try to parse the date
-                                date_str = date_match.group(1)
-                                # This is a simplified parser - you might need more robust date parsing
-                                item['due_date'] = date_str
-                                break
-                            except:
-                                pass
-                
-                # Extract priority
-                priority_match = re.search(r'Priority:\s*(\w+)', item_text, re.IGNORECASE)
-                if priority_match:
-                    item['priority'] = priority_match.group(1).lower()
-                
-                # Extract action required
-                action_match = re.search(r'Action Required:\s*(.+?)(?:\n\n|\Z)', item_text, re.IGNORECASE | re.DOTALL)
-                if action_match:
-                    item['action_required'] = action_match.group(1).strip()
-                
-                # Add contract filename
-                item['contract'] = contract_filename
-                
-                # Only add if it has required fields
-                if 'type' in item and 'description' in item:
-                    action_items.append(item)
-                    
+                response = await box_service.generate_structured(repair_prompt, ACTION_ITEMS_TOOL)
             except Exception as e:
-                logger.error(f"Error parsing action item: {e}")
-                continue
+                logger.error(f"Error repairing action items: {e}")
+                return []
+            
+            repaired, invalid_items = self._validate_action_items(response.get('action_items') or [])
+            if not invalid_items:
+                return repaired
+            if attempt == ACTION_ITEM_REPAIR_ATTEMPTS - 1:
+                logger.warning(f"Dropping {len(invalid_items)} unrepairable action item(s) from {contract_filename}")
+                return repaired
         
-        return action_items
+        return []
     
-    def filter_urgent_action_items(self, action_items: List[Dict]) -> List[Dict]:
-        """Filter action items that need immediate attention."""
-        urgent_items = []
+    def _normalize_action_items(self, items: List[Dict], contract_filename: str) -> List[Dict]:
+        """Attach contract name and computed due-date fields to validated items."""
+        today = datetime.now().date()
+        action_items = []
         
-        for item in action_items:
-            days_until = item.get('days_until_due')
-            
-            # Check if item is urgent based on type and days until due
-            is_urgent = False
+        for raw_item in items:
+            item = {
+                'type': raw_item['type'],
+                'description': raw_item['description'].strip(),
+                'priority': raw_item.get('priority') or 'medium',
+                'action_required': (raw_item.get('action_required') or 'Review contract').strip(),
+                'contract': contract_filename,
+            }
             
-            if days_until is not None:
-                if item.get('type') == 'expiration' and 0 <= days_until <= 10:
-                    is_urgent = True
-                elif item.get('type') == 'audit_due' and 0 <= days_until <= 5:
-                    is_urgent = True
-                elif item.get('type') == 'payment_due' and 0 <= days_until <= 14:
-                    is_urgent = True
-                elif item.get('type') == 'renewal' and 0 <= days_until <= 10:
-                    is_urgent = True
-                elif item.get('type') == 'notice_period' and 0 <= days_until <= 7:
-                    is_urgent = True
-                elif days_until <= 5:  # Any item due within 5 days
-                    is_urgent = True
+            due_date = raw_item.get('due_date')
+            if due_date:
+                item['due_date'] = due_date
+                item['due_date_obj'] = datetime.strptime(due_date, '%Y-%m-%d')
+                # Calculate days until due locally rather than trusting the model
+                item['days_until_due'] = (item['due_date_obj'].date() - today).days
             
-            if is_urgent:
-                urgent_items.append(item)
+            action_items.append(item)
+        
+        return action_items
+    
+    def filter_urgent_action_items(self, action_items: List[Dict], store=None) -> List[Dict]:
+        """
+        Filter action items that need immediate attention.
+        
+        Pass an ActionItemStore already built from the same items to skip
+        rebuilding the columns.
+        """
+        # Imported here to avoid a circular import (the store uses our type tables)
+        from action_item_store import ActionItemStore
         
-        return urgent_items
+        if not action_items:
+            return []
+        
+        # Urgency windows are evaluated column-wise over the whole batch
+        if store is None:
+            store = ActionItemStore.from_items(action_items)
+        return [action_items[i] for i in store.urgent_indices().tolist()]
     
     async def get_user_email_from_box(self) -> Optional[str]:
         """Get user email from Box if not set in environment."""
@@ -283,6 +355,37 @@ Action Required: Ensure payment is processed before due date
             logger.error(f"Error sending notification: {e}")
             return False
     
+    def _publish_to_sns(self, subject: str, message: str) -> str:
+        """Publish one message to the SNS topic. Raises on failure."""
+        response = self.sns_client.publish(
+            TopicArn=self.sns_topic_arn,
+            Message=message,
+            Subject=subject
+        )
+        return response['MessageId']
+    
+    async def queue_notification(self, action_items: List[Dict]) -> bool:
+        """
+        Queue urgent action items in the outbox and deliver a digest if one is due.
+        
+        Items already notified for the same deadline threshold are skipped, so
+        repeated scans do not resend the same alert.
+        """
+        if not self.sns_client:
+            logger.error("SNS client not initialized")
+            return False
+        
+        if not self.user_email:
+            logger.error("USER_EMAIL not set in environment and could not get from Box")
+            return False
+        
+        if not self.sns_topic_arn:
+            logger.warning("AWS_SNS_TOPIC_ARN not set. Cannot send notification.")
+            return False
+        
+        self.outbox.enqueue(action_items)
+        return await self.outbox.flush()
+    
     def _build_email_message(self, action_items: List[Dict]) -> str:
         """Build the email message body."""
         message = f"""Contract Action Items Alert
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Action Item Store
+Columnar storage for action items across a contract portfolio, with
+vectorized due-date window and urgency queries.
+"""
+
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from action_item_detector import ACTION_ITEM_PRIORITIES, ACTION_ITEM_TYPES
+
+# Days-before-due window in which each item type becomes urgent
+URGENCY_WINDOWS = {
+    'expiration': 10,
+    'audit_due': 5,
+    'payment_due': 14,
+    'renewal': 10,
+    'notice_period': 7,
+}
+# Any item (including overdue ones) due within this many days is urgent
+ANY_ITEM_URGENT_DAYS = 5
+
+TYPE_CODES = {name: code for code, name in enumerate(ACTION_ITEM_TYPES)}
+PRIORITY_CODES = {name: code for code, name in enumerate(ACTION_ITEM_PRIORITIES)}
+
+# Sentinel ordinal for items without a due date
+NO_DUE_DATE = -1
+
+# Urgency window indexed by type code (-1 = no type-specific window)
+_WINDOW_BY_TYPE = np.array(
+    [URGENCY_WINDOWS.get(name, -1) for name in ACTION_ITEM_TYPES], dtype=np.int32
+)
+
+
+def _to_ordinal(value) -> int:
+    """Convert a due date (YYYY-MM-DD string, date or datetime) to a day ordinal."""
+    if value is None or value == '':
+        return NO_DUE_DATE
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').toordinal()
+    except (TypeError, ValueError):
+        return NO_DUE_DATE
+
+
+class ActionItemStore:
+    """
+    Action items held as parallel NumPy columns.
+
+    Numeric columns (due-date ordinal, type code, priority code, contract
+    index) are used for queries; free-text fields are kept in side lists and
+    only touched when matching items are materialized back into dicts.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._size = 0
+        self.due_ordinal = np.empty(capacity, dtype=np.int32)
+        self.type_code = np.empty(capacity, dtype=np.int8)
+        self.priority_code = np.empty(capacity, dtype=np.int8)
+        self.contract_index = np.empty(capacity, dtype=np.int32)
+
+        self.contracts: List[str] = []
+        self._contract_ids: Dict[str, int] = {}
+        self.descriptions: List[str] = []
+        self.actions_required: List[str] = []
+
+    @classmethod
+    def from_items(cls, action_items: List[Dict]) -> "ActionItemStore":
+        """Build a store from action item dicts (as produced by ActionItemDetector)."""
+        store = cls(capacity=max(len(action_items), 1))
+        store.extend(action_items)
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _ensure_capacity(self, needed: int):
+        """Grow the columns geometrically so appends stay amortized O(1)."""
+        capacity = len(self.due_ordinal)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name in ('due_ordinal', 'type_code', 'priority_code', 'contract_index'):
+            column = getattr(self, name)
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _contract_id(self, contract: str) -> int:
+        """Intern a contract name and return its index."""
+        contract_id = self._contract_ids.get(contract)
+        if contract_id is None:
+            contract_id = len(self.contracts)
+            self._contract_ids[contract] = contract_id
+            self.contracts.append(contract)
+        return contract_id
+
+    def extend(self, action_items: Iterable[Dict]):
+        """Append action items to the store."""
+        action_items = list(action_items)
+        start = self._size
+        self._ensure_capacity(start + len(action_items))
+
+        other_code = TYPE_CODES['other']
+        medium_code = PRIORITY_CODES['medium']
+        for offset, item in enumerate(action_items):
+            row = start + offset
+            self.due_ordinal[row] = _to_ordinal(item.get('due_date_obj') or item.get('due_date'))
+            self.type_code[row] = TYPE_CODES.get(item.get('type'), other_code)
+            self.priority_code[row] = PRIORITY_CODES.get(item.get('priority'), medium_code)
+            self.contract_index[row] = self._contract_id(item.get('contract', 'Unknown'))
+            self.descriptions.append(item.get('description', ''))
+            self.actions_required.append(item.get('action_required', ''))
+
+        self._size += len(action_items)
+
+    def days_until_due(self, today: Optional[date] = None) -> np.ndarray:
+        """Days until due for every item (meaningless where there is no due date)."""
+        today = today or date.today()
+        return self.due_ordinal[:self._size] - np.int32(today.toordinal())
+
+    def due_within(
+        self,
+        days: int,
+        types: Optional[List[str]] = None,
+        today: Optional[date] = None
+    ) -> np.ndarray:
+        """
+        Indices of items due in the next `days` days (inclusive), optionally
+        restricted to the given action item types.
+        """
+        days_until = self.days_until_due(today)
+        mask = (self.due_ordinal[:self._size] != NO_DUE_DATE) & (days_until >= 0) & (days_until <= days)
+        if types:
+            codes = [TYPE_CODES[t] for t in types if t in TYPE_CODES]
+            mask &= np.isin(self.type_code[:self._size], codes)
+        return np.flatnonzero(mask)
+
+    def urgent_indices(self, today: Optional[date] = None) -> np.ndarray:
+        """
+        Indices of urgent items: inside their type's urgency window, or due
+        (or overdue) within ANY_ITEM_URGENT_DAYS.
+        """
+        days_until = self.days_until_due(today)
+        has_date = self.due_ordinal[:self._size] != NO_DUE_DATE
+        window = _WINDOW_BY_TYPE[self.type_code[:self._size]]
+        in_type_window = (days_until >= 0) & (days_until <= window)
+        return np.flatnonzero(has_date & (in_type_window | (days_until <= ANY_ITEM_URGENT_DAYS)))
+
+    def counts_by_type(self, indices: np.ndarray) -> Dict[str, int]:
+        """Count the selected items per action item type."""
+        counts = np.bincount(self.type_code[indices], minlength=len(ACTION_ITEM_TYPES))
+        return {name: int(counts[code]) for name, code in TYPE_CODES.items() if counts[code]}
+
+    def to_items(self, indices: np.ndarray, today: Optional[date] = None) -> List[Dict]:
+        """Materialize the selected rows back into action item dicts."""
+        today_ordinal = (today or date.today()).toordinal()
+        items = []
+        for row in indices.tolist():
+            ordinal = int(self.due_ordinal[row])
+            item = {
+                'type': ACTION_ITEM_TYPES[self.type_code[row]],
+                'description': self.descriptions[row],
+                'priority': ACTION_ITEM_PRIORITIES[self.priority_code[row]],
+                'action_required': self.actions_required[row],
+                'contract': self.contracts[self.contract_index[row]],
+            }
+            if ordinal != NO_DUE_DATE:
+                due = date.fromordinal(ordinal)
+                item['due_date'] = due.isoformat()
+                item['days_until_due'] = ordinal - today_ordinal
+            items.append(item)
+        return items
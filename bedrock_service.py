@@ -4,10 +4,11 @@ AWS Bedrock Service
 Handles AI analysis using AWS Bedrock instead of Box AI.
 """
 
+import asyncio
 import json
 import logging
 import os
-from typing import Optional
+from typing import Dict, Optional
 
 import boto3
 from botocore.exceptions import ClientError
@@ -102,11 +103,73 @@ class BedrockService:
             error_code = e.response['Error']['Code']
             error_message = e.response['Error']['Message']
             logger.error(f"Bedrock API error ({error_code}): {error_message}")
-            raise ValueError(f"Bedrock API error: {error_message}")
+            raise ValueError(f"Bedrock API error: {error_message}") from e
         except Exception as e:
             logger.error(f"Error invoking Bedrock model: {e}")
             raise
     
+    def invoke_model_with_tool(
+        self,
+        prompt: str,
+        tool: Dict,
+        max_tokens: int = 4096,
+        temperature: float = 0.0
+    ) -> Dict:
+        """
+        Invoke Bedrock forcing a single tool call, so the model answers with JSON
+        matching the tool's input schema instead of free text.
+        
+        Args:
+            prompt: The prompt to send to the model
+            tool: Tool definition with "name", "description" and "input_schema"
+            max_tokens: Maximum tokens in response (default: 4096)
+            temperature: Temperature for generation (default: 0.0)
+            
+        Returns:
+            The tool input the model produced (parsed JSON object)
+        """
+        try:
+            body = {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "tools": [tool],
+                "tool_choice": {"type": "tool", "name": tool["name"]},
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ]
+            }
+            
+            response = self.bedrock_runtime.invoke_model(
+                modelId=self.model_id,
+                body=json.dumps(body),
+                contentType='application/json',
+                accept='application/json'
+            )
+            
+            response_body_str = response['body'].read()
+            if isinstance(response_body_str, bytes):
+                response_body_str = response_body_str.decode('utf-8')
+            response_body = json.loads(response_body_str)
+            
+            for block in response_body.get('content', []):
+                if block.get('type') == 'tool_use' and block.get('name') == tool['name']:
+                    return block.get('input', {})
+            
+            raise ValueError(f"Model did not call tool {tool['name']} (stop_reason: {response_body.get('stop_reason')})")
+                
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            error_message = e.response['Error']['Message']
+            logger.error(f"Bedrock API error ({error_code}): {error_message}")
+            raise ValueError(f"Bedrock API error: {error_message}") from e
+        except Exception as e:
+            logger.error(f"Error invoking Bedrock model with tool: {e}")
+            raise
+    
     async def analyze_contract(
         self,
         contract_text: str,
@@ -134,7 +197,11 @@ CONTRACT TEXT:
 
 Please analyze the contract above and provide your response."""
         
-        return self.invoke_model(full_prompt, max_tokens=max_tokens, temperature=temperature)
+        # invoke_model blocks on the HTTP call; run it in a worker thread so
+        # concurrent analyses do not serialize on the event loop
+        return await asyncio.to_thread(
+            self.invoke_model, full_prompt, max_tokens=max_tokens, temperature=temperature
+        )
     
     async def generate_content(self, prompt: str, max_tokens: int = 4096) -> str:
         """
@@ -147,5 +214,28 @@ Please analyze the contract above and provide your response."""
         Returns:
             The generated content
         """
-        return self.invoke_model(prompt, max_tokens=max_tokens)
-
+        return await asyncio.to_thread(self.invoke_model, prompt, max_tokens=max_tokens)
+    
+    async def generate_structured(
+        self,
+        prompt: str,
+        tool: Dict,
+        max_tokens: int = 4096,
+        temperature: float = 0.0
+    ) -> Dict:
+        """
+        Generate a JSON object matching a tool's input schema.
+        
+        Args:
+            prompt: The prompt for content generation
+            tool: Tool definition with "name", "description" and "input_schema"
+            max_tokens: Maximum tokens in response
+            temperature: Temperature for generation
+            
+        Returns:
+            The parsed tool input
+        """
+        return await asyncio.to_thread(
+            self.invoke_model_with_tool, prompt, tool,
+            max_tokens=max_tokens, temperature=temperature
+        )
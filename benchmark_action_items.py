@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark urgency queries: per-item dict path vs. columnar ActionItemStore.
+Runs offline on a synthetic portfolio - no Box or AWS access needed.
+
+Usage:
+    python benchmark_action_items.py [num_contracts] [items_per_contract]
+"""
+
+import logging
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from action_item_detector import ACTION_ITEM_PRIORITIES, ACTION_ITEM_TYPES
+from action_item_store import ActionItemStore
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+
+def generate_items(num_contracts: int, items_per_contract: int, seed: int = 42) -> List[Dict]:
+    """Generate synthetic action items spread over the next year (and some overdue)."""
+    rng = random.Random(seed)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    items = []
+    for contract in range(num_contracts):
+        for _ in range(items_per_contract):
+            due = today + timedelta(days=rng.randint(-30, 365))
+            items.append({
+                'type': rng.choice(ACTION_ITEM_TYPES),
+                'description': f"Synthetic deadline for contract {contract}",
+                'priority': rng.choice(ACTION_ITEM_PRIORITIES),
+                'action_required': 'Review contract',
+                'contract': f"contract_{contract:05d}.pdf",
+                'due_date': due.strftime('%Y-%m-%d'),
+                'due_date_obj': due,
+                'days_until_due': (due.date() - today.date()).days,
+            })
+    return items
+
+
+def dict_path_urgent(action_items: List[Dict]) -> List[Dict]:
+    """Reference implementation: the original per-item if/elif urgency chain."""
+    urgent_items = []
+    for item in action_items:
+        days_until = item.get('days_until_due')
+        is_urgent = False
+        if days_until is not None:
+            if item.get('type') == 'expiration' and 0 <= days_until <= 10:
+                is_urgent = True
+            elif item.get('type') == 'audit_due' and 0 <= days_until <= 5:
+                is_urgent = True
+            elif item.get('type') == 'payment_due' and 0 <= days_until <= 14:
+                is_urgent = True
+            elif item.get('type') == 'renewal' and 0 <= days_until <= 10:
+                is_urgent = True
+            elif item.get('type') == 'notice_period' and 0 <= days_until <= 7:
+                is_urgent = True
+            elif days_until <= 5:
+                is_urgent = True
+        if is_urgent:
+            urgent_items.append(item)
+    return urgent_items
+
+
+def dict_path_window(action_items: List[Dict], days: int, types: List[str]) -> List[Dict]:
+    """Reference implementation of a window query over dicts."""
+    return [
+        item for item in action_items
+        if item.get('days_until_due') is not None
+        and 0 <= item['days_until_due'] <= days
+        and item.get('type') in types
+    ]
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Best wall-clock time of several runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    num_contracts = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    items_per_contract = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    today = date.today()
+
+    items = generate_items(num_contracts, items_per_contract)
+    logger.info(f"Portfolio: {num_contracts} contracts, {len(items)} action items")
+
+    build_ms = best_of(lambda: ActionItemStore.from_items(items), repeat=3)
+    store = ActionItemStore.from_items(items)
+
+    # Results must match before timings mean anything
+    expected = dict_path_urgent(items)
+    urgent = store.urgent_indices(today)
+    assert len(expected) == len(urgent), f"urgent mismatch: {len(expected)} vs {len(urgent)}"
+    window_types = ['expiration', 'renewal']
+    expected_window = dict_path_window(items, 30, window_types)
+    assert len(expected_window) == len(store.due_within(30, window_types, today))
+
+    dict_urgent_ms = best_of(lambda: dict_path_urgent(items))
+    store_urgent_ms = best_of(lambda: store.urgent_indices(today))
+    dict_window_ms = best_of(lambda: dict_path_window(items, 30, window_types))
+    store_window_ms = best_of(lambda: store.due_within(30, window_types, today))
+
+    logger.info("")
+    logger.info(f"{'query':<36}{'dict (ms)':>12}{'store (ms)':>12}{'speedup':>10}")
+    logger.info("-" * 70)
+    logger.info(f"{'urgent items':<36}{dict_urgent_ms:>12.2f}{store_urgent_ms:>12.2f}"
+                f"{dict_urgent_ms / store_urgent_ms:>9.1f}x")
+    logger.info(f"{'expiration+renewal due in 30 days':<36}{dict_window_ms:>12.2f}{store_window_ms:>12.2f}"
+                f"{dict_window_ms / store_window_ms:>9.1f}x")
+    logger.info("")
+    logger.info(f"Store build (one-off): {build_ms:.1f} ms")
+    logger.info(f"Urgent items: {len(urgent)} {store.counts_by_type(urgent)}")
+
+
+if __name__ == "__main__":
+    main()
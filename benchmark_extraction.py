@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark contract text extraction: local extraction (text_extraction) of
+the sample HAB-1-19.docx and 2_clean_redline_comparison.pdf plus synthetic
+~100-page DOCX and PDF contracts, against python-docx paragraph extraction
+(the previous local path). With --box-file-id, also times reading a Box file
+through Box text extraction vs. downloading it and extracting locally (needs
+Box credentials in .env).
+
+Usage:
+    python benchmark_extraction.py [repeats] [--box-file-id ID]
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from document_generator import get_renderer
+from text_extraction import PDF_EXTRACTION_AVAILABLE, detect_format, extract_text
+
+# document_generator configures logging on import
+logging.basicConfig(level=logging.INFO, format='%(message)s', force=True)
+logger = logging.getLogger(__name__)
+
+SAMPLES = ["HAB-1-19.docx", "2_clean_redline_comparison.pdf"]
+
+SENTENCE = (
+    "The parties agree that the obligations set out in this clause shall be performed in good faith, "
+    "subject to reasonable notice of not less than thirty days and the limits of liability in this agreement."
+)
+
+
+def generate_document(num_clauses: int) -> str:
+    """Synthetic contract text: a title, then numbered clauses of a few sentences."""
+    lines = ["MASTER SERVICES AGREEMENT", ""]
+    for number in range(1, num_clauses + 1):
+        lines += [f"{number}. Clause {number}", "", *(f"({letter}) {SENTENCE}" for letter in "abcde"), ""]
+    return "\n".join(lines)
+
+
+def median_ms(run: Callable[[], object], repeats: int) -> float:
+    times: List[float] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def python_docx_text(data: bytes) -> str:
+    from docx import Document
+    return "\n".join(paragraph.text for paragraph in Document(io.BytesIO(data)).paragraphs)
+
+
+def benchmark_local(repeats: int):
+    root = Path(__file__).parent
+    files: Dict[str, bytes] = {name: (root / name).read_bytes() for name in SAMPLES if (root / name).exists()}
+    text = generate_document(460)
+    files["synthetic (~100 pages).docx"] = get_renderer().docx(text)
+    files["synthetic (~100 pages).pdf"] = get_renderer().pdf(text)
+
+    logger.info(f"{'file':<32}{'detected':>9}{'size (KB)':>11}{'local (ms)':>12}{'python-docx (ms)':>18}")
+    logger.info("-" * 82)
+    for name, data in files.items():
+        detected = detect_format(data) or "-"
+        if extract_text(data) is None:
+            local = "fallback"
+        else:
+            local = f"{median_ms(lambda: extract_text(data), repeats):.1f}"
+        baseline = f"{median_ms(lambda: python_docx_text(data), repeats):.1f}" if detected == "docx" else "-"
+        logger.info(f"{name:<32}{detected:>9}{len(data) / 1024:>11.1f}{local:>12}{baseline:>18}")
+    if not PDF_EXTRACTION_AVAILABLE:
+        logger.info("(pypdf not installed: PDFs fall back to Box text extraction)")
+
+
+async def benchmark_box(file_id: str, repeats: int):
+    from box_contract_service import BoxContractService
+
+    service = BoxContractService()
+    await service.initialize()
+    results = {}
+    for local in (False, True):
+        service.local_text_extraction = local
+        times = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            await service.read_file(file_id)
+            times.append(time.perf_counter() - started)
+        results["download + local" if local else "Box text extraction"] = statistics.median(times) * 1000
+    service.close()
+
+    logger.info("")
+    logger.info(f"{'Box file ' + file_id:<32}{'median (ms)':>12}")
+    logger.info("-" * 44)
+    for name, ms in results.items():
+        logger.info(f"{name:<32}{ms:>12.1f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repeats", type=int, nargs="?", default=10)
+    parser.add_argument("--box-file-id", help="Also time reading this Box file both ways")
+    args = parser.parse_args(argv)
+
+    benchmark_local(args.repeats)
+    if args.box_file_id:
+        asyncio.run(benchmark_box(args.box_file_id, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for ContractProcessor.
+Generates a synthetic contract corpus across all contract categories and
+runs the full pipeline against in-memory fake Box and Bedrock backends with
+realistic latency distributions - no Box or AWS access needed.
+
+Reports throughput, p50/p95/p99 per pipeline stage and tokens per contract,
+and compares the results against a baseline file.
+
+Outputs are uploaded as plain text unless --render is given: rendering is
+real CPU work, which the time scale would inflate like simulated latency.
+
+Usage:
+    python benchmark_pipeline.py [--contracts 200] [--time-scale 0.01] [--render]
+    python benchmark_pipeline.py --save-baseline
+    python benchmark_pipeline.py --compare [--tolerance 0.15]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = Path(__file__).parent / "benchmark_pipeline_baseline.json"
+
+# Approximate characters per model token
+CHARS_PER_TOKEN = 4
+
+# Clause headings characteristic of each category (mixed with common boilerplate)
+CATEGORY_CLAUSES = {
+    "Service Contract": ["Scope of Services", "Service Levels", "Fees and Invoicing", "Acceptance"],
+    "Employment Contract": ["Position and Duties", "Compensation", "Benefits", "Non-Competition"],
+    "Lease and Rent Agreement": ["Premises", "Rent", "Security Deposit", "Maintenance and Repairs"],
+    "Non-Disclosure Agreement (NDA)": ["Confidential Information", "Permitted Disclosure", "Return of Materials"],
+    "Partnership and Joint Venture Agreement": ["Capital Contributions", "Profit Sharing", "Management", "Dissolution"],
+    "Loan and Financing Contract": ["Principal Amount", "Interest Rate", "Repayment Schedule", "Events of Default"],
+    "Government and Procurement Contract": ["Statement of Work", "Compliance", "Audit Rights", "Small Business Subcontracting"],
+    "Software License Agreement": ["License Grant", "Restrictions", "Support and Updates", "Source Code Escrow"],
+    "Freelancer and Contractor Agreement": ["Deliverables", "Independent Contractor Status", "Intellectual Property", "Payment Terms"],
+}
+COMMON_CLAUSES = [
+    "Definitions", "Term", "Termination", "Indemnification", "Limitation of Liability",
+    "Governing Law", "Dispute Resolution", "Notices", "Assignment", "Force Majeure",
+    "Entire Agreement", "Severability", "Warranties", "Insurance",
+]
+# Contract sizes as number of clauses, with their share of the corpus
+SIZE_MIX = [(8, 0.4), (25, 0.45), (70, 0.15)]
+FORMATS = [(".pdf", 0.5), (".docx", 0.35), (".txt", 0.15)]
+URGENCY_MIX = [(None, 0.75), ("Priority: urgent", 0.1), ("Priority: high", 0.1), ("Priority: low", 0.05)]
+
+# Latency distributions in seconds: lognormal (median, p95)
+BOX_LATENCY = {
+    "list_folder_items": (0.35, 0.9),
+    "read_file": (0.6, 2.0),
+    "find_or_create_folder": (0.3, 0.8),
+    "upload_text_file": (0.5, 1.5),
+    "upload_file": (0.6, 1.8),
+}
+# Bedrock: time to first token plus output tokens at a generation rate
+BEDROCK_FIRST_TOKEN = (0.8, 2.5)
+BEDROCK_TOKENS_PER_SECOND = 60.0
+
+
+def _weighted_choice(rng: random.Random, options):
+    values, weights = zip(*options)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _lognormal(rng: random.Random, median: float, p95: float) -> float:
+    """Sample a lognormal distribution given its median and 95th percentile."""
+    sigma = math.log(p95 / median) / 1.645
+    return rng.lognormvariate(math.log(median), sigma)
+
+
+def generate_corpus(num_contracts: int, seed: int = 42) -> List[Dict]:
+    """
+    Generate synthetic contracts across all categories with varying sizes,
+    formats, deadlines and per-contract urgency.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    categories = list(CATEGORY_CLAUSES)
+    corpus = []
+    for index in range(num_contracts):
+        category = categories[index % len(categories)]
+        num_clauses = _weighted_choice(rng, SIZE_MIX)
+        headings = CATEGORY_CLAUSES[category] + rng.sample(COMMON_CLAUSES, k=min(len(COMMON_CLAUSES), num_clauses))
+        while len(headings) < num_clauses:
+            headings.append(f"Additional Provisions {len(headings)}")
+
+        party = f"Counterparty {rng.randint(100, 999)} LLC"
+        lines = [f"{category.upper()}", "", f"This {category} is entered into by Client and {party}.", ""]
+        for number, heading in enumerate(headings[:num_clauses], 1):
+            lines.append(f"{number}. {heading}")
+            sentences = rng.randint(3, 9)
+            if heading in COMMON_CLAUSES:
+                # Boilerplate: the same wording in every contract, only the values differ
+                sentences = 3 + len(heading) % 7
+            for sentence in range(sentences):
+                lines.append(
+                    f"({chr(ord('a') + sentence)}) The parties agree that {heading.lower()} shall be governed by the terms set out "
+                    f"herein, subject to reasonable notice of not less than {rng.choice([10, 30, 60, 90])} days."
+                )
+            if rng.random() < 0.15:
+                due = today + timedelta(days=rng.randint(-10, 120))
+                kind = rng.choice(["Payment is due on", "This agreement expires on", "Renewal notice is due by"])
+                lines.append(f"{kind} {due.isoformat()}.")
+            lines.append("")
+
+        suffix = _weighted_choice(rng, FORMATS)
+        name = f"{category.split()[0]}_{index:05d}"
+        corpus.append({
+            'name': name + suffix,
+            'contract_name': name,
+            'category': category,
+            'text': "\n".join(lines),
+            'instructions': _weighted_choice(rng, URGENCY_MIX),
+        })
+    return corpus
+
+
+class FakeBox:
+    """
+    In-memory Box + Bedrock stand-in for BoxContractService.
+
+    All sleeps are multiplied by time_scale so a long simulated run finishes
+    quickly; timings are reported back in simulated seconds.
+    """
+
+    def __init__(self, corpus: List[Dict], time_scale: float, seed: int = 42):
+        self.time_scale = time_scale
+        self.seed = seed
+        self._next_id = 1000
+        self.folders: Dict[tuple, str] = {}
+        self.items: Dict[str, List[Dict]] = {}
+        self.texts: Dict[str, str] = {}
+        self.categories: Dict[str, str] = {}
+        self.tokens: Dict[str, Dict[str, int]] = {}
+        self.calls: Dict[str, int] = {}
+        self.contracts_folder_id = self._folder("0", "Smart_Contracts")
+        self.interests_folder_id = self._folder("0", "my_interests")
+        self._add_file(self.interests_folder_id, "MY_INTERESTS.txt",
+                       "Protect against unlimited liability. Require 30-day payment terms.")
+        for contract in corpus:
+            file_id = self._add_file(self.contracts_folder_id, contract['name'], contract['text'])
+            self.categories[file_id] = contract['category']
+            if contract['instructions']:
+                self._add_file(self.contracts_folder_id, contract['contract_name'] + ".instructions",
+                               contract['instructions'])
+
+    def _new_id(self) -> str:
+        self._next_id += 1
+        return str(self._next_id)
+
+    def _folder(self, parent: str, name: str) -> str:
+        if (parent, name) not in self.folders:
+            folder_id = self._new_id()
+            self.folders[(parent, name)] = folder_id
+            self.items.setdefault(parent, []).append({'id': folder_id, 'name': name, 'type': 'folder'})
+            self.items[folder_id] = []
+        return self.folders[(parent, name)]
+
+    def _add_file(self, folder_id: str, name: str, text: str, data: Optional[bytes] = None) -> str:
+        file_id = self._new_id()
+        self.texts[file_id] = text
+        data = text.encode('utf-8') if data is None else data
+        self.items.setdefault(folder_id, []).append({
+            'id': file_id, 'name': name, 'type': 'file',
+            'sha1': hashlib.sha1(data).hexdigest(), 'etag': '0', 'size': len(data),
+            'modified_at': f"2025-01-01T00:00:{int(file_id) % 60:02d}",
+        })
+        return file_id
+
+    def _rng(self, *key) -> random.Random:
+        # Seeded per call so latencies do not depend on task interleaving
+        return random.Random(f"{self.seed}:{':'.join(map(str, key))}")
+
+    async def _latency(self, method: str, key: str, seconds: Optional[float] = None):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if seconds is None:
+            seconds = _lognormal(self._rng(method, key, self.calls[method]), *BOX_LATENCY[method])
+        await asyncio.sleep(seconds * self.time_scale)
+
+    async def initialize(self):
+        pass
+
+    async def find_or_create_folder(self, parent_folder_id: str, folder_name: str) -> str:
+        await self._latency("find_or_create_folder", folder_name)
+        return self._folder(parent_folder_id, folder_name)
+
+    async def list_folder_items(self, folder_id: str) -> List[Dict]:
+        await self._latency("list_folder_items", folder_id)
+        return [dict(item) for item in self.items.get(folder_id, [])]
+
+    async def read_file(self, file_id: str) -> str:
+        await self._latency("read_file", file_id)
+        return self.texts[file_id]
+
+    async def upload_text_file(self, folder_id: str, filename: str, content: str) -> str:
+        await self._latency("upload_text_file", f"{folder_id}/{filename}")
+        return self._add_file(folder_id, filename, content)
+
+    async def upload_file(self, folder_id: str, filename: str, data: bytes) -> str:
+        await self._latency("upload_file", f"{folder_id}/{filename}")
+        return self._add_file(folder_id, filename, data.decode('utf-8', errors='replace'), data)
+
+    async def upload_stream(self, folder_id: str, filename: str, stream) -> str:
+        await self._latency("upload_file", f"{folder_id}/{filename}")
+        data = stream.read()
+        return self._add_file(folder_id, filename, data.decode('utf-8', errors='replace'), data)
+
+    async def upload_new_version(self, file_id: str, filename: str, stream) -> str:
+        await self._latency("upload_file", file_id)
+        data = stream.read()
+        self.texts[file_id] = data.decode('utf-8', errors='replace')
+        for items in self.items.values():
+            for item in items:
+                if item['id'] == file_id:
+                    item.update(name=filename, sha1=hashlib.sha1(data).hexdigest(), size=len(data))
+        return file_id
+
+    async def ask_ai_about_file(self, file_id: str, prompt: str, contract_text: Optional[str] = None) -> str:
+        """Fake Bedrock generation: first-token latency plus output tokens at a fixed rate."""
+        if contract_text is None:
+            contract_text = await self.read_file(file_id)
+        if prompt.startswith("Analyze this contract and classify"):
+            response = self.categories.get(file_id, "Service Contract")
+        elif "negotiation guide" in prompt.lower():
+            response = "Negotiation point. " * 400
+        else:
+            # Rewritten (mirror) contract: roughly the size of the original
+            response = contract_text + "\nRevised to protect the user's interests."
+        await self._generate(file_id, prompt, contract_text, response)
+        return response
+
+    async def ask_ai_structured(self, file_id: str, prompt: str, tool: Dict, contract_text: Optional[str] = None) -> Dict:
+        """Fake Bedrock tool use: rewrites each "[Clause N]" block of the text."""
+        if contract_text is None:
+            contract_text = await self.read_file(file_id)
+        clauses = []
+        for block in re.split(r'^(?=\[Clause \d+\])', contract_text, flags=re.MULTILINE):
+            match = re.match(r'\[Clause (\d+)\][^\n]*\n', block)
+            if match:
+                clauses.append({'id': int(match.group(1)), 'text': block[match.end():].strip() + " (protected)"})
+        response = {'clauses': clauses}
+        await self._generate(file_id, prompt, contract_text, json.dumps(response))
+        return response
+
+    async def _generate(self, file_id: str, prompt: str, contract_text: str, response: str):
+        """Count the tokens of a generation and wait for its simulated latency."""
+        input_tokens = (len(prompt) + len(contract_text)) // CHARS_PER_TOKEN
+        output_tokens = len(response) // CHARS_PER_TOKEN
+        usage = self.tokens.setdefault(file_id, {'input': 0, 'output': 0, 'calls': 0})
+        usage['input'] += input_tokens
+        usage['output'] += output_tokens
+        usage['calls'] += 1
+
+        rng = self._rng("bedrock", file_id, usage['calls'])
+        seconds = _lognormal(rng, *BEDROCK_FIRST_TOKEN) + output_tokens / BEDROCK_TOKENS_PER_SECOND
+        await self._latency("ask_ai_about_file", file_id, seconds)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    p50, p95, p99 = np.percentile(np.asarray(values), [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+
+async def run_benchmark(num_contracts: int, time_scale: float, seed: int = 42, render: bool = False) -> Dict:
+    """Process a synthetic corpus end to end and collect the metrics."""
+    state_dir = tempfile.mkdtemp(prefix="contract_benchmark_")
+    os.environ["RETRY_QUEUE_FILE"] = os.path.join(state_dir, "retry_queue.json")
+    os.environ["CHECKPOINT_DIR"] = os.path.join(state_dir, "checkpoints")
+    os.environ["REVISION_DIR"] = os.path.join(state_dir, "revisions")
+    os.environ["CLAUSE_LIBRARY_DB"] = os.path.join(state_dir, "clause_library.db")
+    os.environ["NOTIFICATION_OUTBOX_FILE"] = os.path.join(state_dir, "notification_outbox.json")
+    # The corpus repeats boilerplate clauses; measure the library with learning on
+    os.environ["CLAUSE_LIBRARY"] = "true"
+    os.environ["CLAUSE_LIBRARY_LEARN"] = "true"
+    os.environ.pop("LEASE_BACKEND", None)
+    if not render:
+        for artifact in ("MIRROR", "REDLINE", "GUIDE"):
+            os.environ[f"OUTPUT_FORMATS_{artifact}"] = "txt"
+
+    from contract_processor import ContractProcessor
+    logging.getLogger("contract_processor").setLevel(logging.WARNING)
+    logging.getLogger("contract_pipeline").setLevel(logging.WARNING)
+    logging.getLogger("priority_scheduler").setLevel(logging.WARNING)
+
+    corpus = generate_corpus(num_contracts, seed)
+    box = FakeBox(corpus, time_scale, seed)
+    processor = ContractProcessor(box_service=box)
+    await processor.initialize()
+
+    finished = []
+    on_complete = processor.pipeline.on_complete
+
+    async def record_job(job):
+        finished.append((job, time.monotonic() - job.created_at))
+        await on_complete(job)
+
+    processor.pipeline.on_complete = record_job
+
+    started = time.perf_counter()
+    await processor.process_new_contracts()
+    wall_seconds = time.perf_counter() - started
+    await processor.pipeline.stop()
+    processor.render_pool.shutdown()
+
+    simulated_seconds = wall_seconds / time_scale
+    stages = {
+        stage: percentiles([job.stage_timings[stage] / time_scale for job, _ in finished if stage in job.stage_timings])
+        for stage in processor.pipeline.metrics()
+    }
+    tokens = [usage['input'] + usage['output'] for usage in box.tokens.values()]
+    return {
+        'config': {'contracts': num_contracts, 'time_scale': time_scale, 'seed': seed, 'render': render},
+        'processed': len(finished),
+        'failed': num_contracts - len(finished),
+        'simulated_seconds': simulated_seconds,
+        'contracts_per_hour': len(finished) / simulated_seconds * 3600 if simulated_seconds else 0.0,
+        'end_to_end': percentiles([elapsed / time_scale for _, elapsed in finished]),
+        'stages': stages,
+        'tokens_per_contract': {
+            'mean': float(np.mean(tokens)) if tokens else 0.0,
+            **percentiles(tokens),
+        },
+        'bedrock_calls_per_contract': (
+            sum(usage['calls'] for usage in box.tokens.values()) / len(box.tokens) if box.tokens else 0.0
+        ),
+        # Real CPU time, not scaled: documents are actually rendered
+        'render': processor.render_pool.metrics(),
+    }
+
+
+def report(results: Dict):
+    logger.info(
+        f"Corpus: {results['config']['contracts']} contracts, "
+        f"{results['processed']} processed, {results['failed']} failed"
+    )
+    logger.info(
+        f"Throughput: {results['contracts_per_hour']:.0f} contracts/hour "
+        f"({results['simulated_seconds']:.0f}s simulated)"
+    )
+    logger.info("")
+    logger.info(f"{'stage':<12}{'p50 (s)':>10}{'p95 (s)':>10}{'p99 (s)':>10}")
+    logger.info("-" * 42)
+    for name, p in list(results['stages'].items()) + [('end-to-end', results['end_to_end'])]:
+        logger.info(f"{name:<12}{p['p50']:>10.2f}{p['p95']:>10.2f}{p['p99']:>10.2f}")
+    logger.info("")
+    t = results['tokens_per_contract']
+    logger.info(
+        f"Tokens per contract: mean {t['mean']:.0f}, p50 {t['p50']:.0f}, p95 {t['p95']:.0f} "
+        f"({results['bedrock_calls_per_contract']:.1f} Bedrock calls)"
+    )
+    for file_format, m in results.get('render', {}).items():
+        logger.info(
+            f"Render {file_format.upper():<5} {m['rendered']} files, avg {m['avg_seconds'] * 1000:.0f}ms "
+            f"max {m['max_seconds'] * 1000:.0f}ms (real), avg {m['avg_bytes'] / 1024:.0f}KB"
+        )
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    Returns:
+        Descriptions of the metrics that regressed by more than `tolerance`
+    """
+    regressions = []
+    if results['contracts_per_hour'] < baseline['contracts_per_hour'] * (1 - tolerance):
+        regressions.append(
+            f"throughput {results['contracts_per_hour']:.0f}/h vs baseline {baseline['contracts_per_hour']:.0f}/h"
+        )
+    checks = [('end-to-end', results['end_to_end'], baseline['end_to_end'])]
+    checks += [
+        (stage, results['stages'][stage], baseline['stages'][stage])
+        for stage in results['stages'] if stage in baseline['stages']
+    ]
+    for name, current, previous in checks:
+        if previous['p95'] and current['p95'] > previous['p95'] * (1 + tolerance):
+            regressions.append(f"{name} p95 {current['p95']:.2f}s vs baseline {previous['p95']:.2f}s")
+    mean_tokens = results['tokens_per_contract']['mean']
+    if mean_tokens > baseline['tokens_per_contract']['mean'] * (1 + tolerance):
+        regressions.append(
+            f"tokens/contract {mean_tokens:.0f} vs baseline {baseline['tokens_per_contract']['mean']:.0f}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end contract pipeline benchmark")
+    parser.add_argument("--contracts", type=int, default=200)
+    parser.add_argument("--time-scale", type=float, default=0.01,
+                        help="Wall-clock seconds per simulated second")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative regression before --compare fails")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--render", action="store_true",
+                        help="Render DOCX/PDF outputs (real CPU time, scaled like everything else)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.contracts, args.time_scale, args.seed, args.render))
+    report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Baseline saved to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            logger.info("")
+            logger.info("❌ Regressions against baseline:")
+            for regression in regressions:
+                logger.info(f"  {regression}")
+            sys.exit(1)
+        logger.info("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
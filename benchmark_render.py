@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark document rendering: per-document render time of DOCX and PDF
+output for a small and a ~100-page contract, with a fresh renderer per
+document (styles and template rebuilt every time) vs. the cached per-process
+renderer, the tracked-changes redline DOCX of each contract against a copy
+with some clauses edited, then peak Python memory while streaming a ~100 and
+a ~1000-page contract in chunks to a temporary file (it should stay flat as
+documents grow). Runs offline on synthetic text - no Box or AWS access
+needed.
+
+Usage:
+    python benchmark_render.py [repeats]
+"""
+
+import logging
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List
+
+from document_generator import DocumentRenderer, get_renderer
+from redline_docx import render_redline_docx
+
+# document_generator configures logging on import
+logging.basicConfig(level=logging.INFO, format='%(message)s', force=True)
+logger = logging.getLogger(__name__)
+
+SENTENCE = (
+    "The parties agree that the obligations set out in this clause shall be performed in good faith, "
+    "subject to reasonable notice of not less than thirty days and the limits of liability in this agreement."
+)
+
+# Edited sentences in the copy each redline is computed against
+REDLINE_EDITS = 20
+
+
+def generate_document(num_clauses: int) -> str:
+    """Synthetic contract text: a title, then numbered clauses of a few sentences."""
+    lines = ["MASTER SERVICES AGREEMENT", ""]
+    for number in range(1, num_clauses + 1):
+        lines.append(f"{number}. Clause {number}")
+        for letter in "abcde":
+            lines.append(f"({letter}) {SENTENCE}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def iter_chunks(text: str, size: int = 4096) -> Iterator[str]:
+    """The text in fixed-size chunks, as a streaming model response would arrive."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def peak_memory(render: Callable[[], None]) -> float:
+    """Peak memory allocated by Python during one render, in MB."""
+    tracemalloc.start()
+    try:
+        render()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def stream_to_file(text: str, file_format: str):
+    with tempfile.TemporaryFile() as out:
+        getattr(get_renderer(), f"write_{file_format}")(iter_chunks(text), out)
+
+
+def pdf_pages(data: bytes) -> int:
+    return len(re.findall(rb'/Type /Page[^s]', data))
+
+
+def time_renders(render: Callable[[], bytes], repeats: int) -> Dict:
+    times: List[float] = []
+    data = b""
+    for _ in range(repeats):
+        started = time.perf_counter()
+        data = render()
+        times.append(time.perf_counter() - started)
+    return {'median_ms': statistics.median(times) * 1000, 'min_ms': min(times) * 1000, 'data': data}
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    documents = {
+        "small (1 page)": generate_document(3),
+        "large (~100 pages)": generate_document(460),
+    }
+    cached = DocumentRenderer()
+
+    logger.info(f"{'document':<20}{'format':<8}{'pages':>6}{'fresh (ms)':>12}{'cached (ms)':>13}{'saved':>8}")
+    logger.info("-" * 67)
+    for name, text in documents.items():
+        for file_format in ("docx", "pdf"):
+            fresh = time_renders(lambda: getattr(DocumentRenderer(), file_format)(text), repeats)
+            reused = time_renders(lambda: getattr(cached, file_format)(text), repeats)
+            pages = pdf_pages(reused['data']) if file_format == "pdf" else "-"
+            saved = 1 - reused['median_ms'] / fresh['median_ms']
+            logger.info(
+                f"{name:<20}{file_format:<8}{pages:>6}{fresh['median_ms']:>12.1f}"
+                f"{reused['median_ms']:>13.1f}{saved:>8.0%}"
+            )
+
+    logger.info("")
+    logger.info(f"{'tracked redline':<20}{'edits':>8}{'median (ms)':>13}")
+    logger.info("-" * 41)
+    for name, text in documents.items():
+        edited = text.replace("thirty days", "sixty days", REDLINE_EDITS)
+        edits = min(text.count("thirty days"), REDLINE_EDITS)
+        redline = time_renders(lambda: render_redline_docx(text, edited), repeats)
+        logger.info(f"{name:<20}{edits:>8}{redline['median_ms']:>13.1f}")
+
+    logger.info("")
+    logger.info(f"{'streamed document':<20}{'format':<8}{'peak memory (MB)':>18}")
+    logger.info("-" * 46)
+    streamed_documents = {
+        "~100 pages": documents["large (~100 pages)"],
+        "~1000 pages": generate_document(4600),
+    }
+    # Template and styles are built on first use; keep that out of the peaks
+    stream_to_file(documents["small (1 page)"], "docx")
+    stream_to_file(documents["small (1 page)"], "pdf")
+    for name, text in streamed_documents.items():
+        for file_format in ("docx", "pdf"):
+            peak = peak_memory(lambda: stream_to_file(text, file_format))
+            logger.info(f"{name:<20}{file_format:<8}{peak:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,13 @@ Handles all Box API interactions for the contract protection system.
 Uses the same authentication system as the MCP server.
 """
 
+import asyncio
+import io
 import logging
 import os
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, List, Optional
 
 # Add mcp-server-box src to path
 mcp_server_path = Path(__file__).parent / "mcp-server-box" / "src"
@@ -22,10 +24,14 @@ from box_ai_agents_toolkit import (
     box_file_upload,
     box_ai_ask_file_single,
 )
-from box_sdk_gen import BoxClient, BoxSDKError
+from box_sdk_gen import (
+    BoxClient, BoxSDKError, UploadFileAttributes, UploadFileAttributesParentField, UploadFileVersionAttributes
+)
+from chunked_upload import ChunkedUploader
 from config import AppConfig
 from dotenv import load_dotenv
 from mcp_auth.auth_box_api import get_oauth_client, get_oauth_config
+from storage_backend import StorageBackend
 from box_sdk_gen import BoxOAuth, BoxClient, FileWithInMemoryCacheTokenStorage
 
 # Load environment variables
@@ -35,11 +41,18 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-class BoxContractService:
-    """Service for interacting with Box API."""
+class BoxContractService(StorageBackend):
+    """Storage backend for Box: handles all Box API interactions."""
+    
+    # Fields requested when listing folders
+    ITEM_FIELDS = ["name", "type", "sha1", "etag", "size", "modified_at"]
+    LIST_PAGE_SIZE = 1000
     
     def __init__(self):
+        super().__init__()
         self.client: Optional[BoxClient] = None
+        self.chunked_uploader: Optional[ChunkedUploader] = None
+        self.local_text_extraction = os.getenv("LOCAL_TEXT_EXTRACTION", "true").lower() in ("1", "true", "yes")
         
     async def initialize(self):
         """Initialize Box client with OAuth."""
@@ -238,12 +251,26 @@ class BoxContractService:
         client = self._get_client()
         
         try:
-            # Use SDK directly for reliable results
-            items_response = client.folders.get_folder_items(folder_id)
+            # Use SDK directly for reliable results, following pages until all
+            # entries are listed (Box returns at most `limit` items per call)
+            entries = []
+            offset = 0
+            while True:
+                items_response = await asyncio.to_thread(
+                    client.folders.get_folder_items,
+                    folder_id,
+                    fields=self.ITEM_FIELDS,
+                    offset=offset,
+                    limit=self.LIST_PAGE_SIZE
+                )
+                entries.extend(items_response.entries or [])
+                offset += len(items_response.entries or [])
+                if not items_response.entries or offset >= (items_response.total_count or 0):
+                    break
             
             # Convert to list of dicts
             items = []
-            for item in items_response.entries:
+            for item in entries:
                 # Determine type: 'file' or 'folder'
                 item_type = 'file' if str(item.type) == 'FileBaseTypeField.FILE' else 'folder'
                 
@@ -251,6 +278,11 @@ class BoxContractService:
                     'id': item.id,
                     'name': item.name,
                     'type': item_type,
+                    # Version metadata used for change detection (files only)
+                    'sha1': getattr(item, 'sha1', None),
+                    'etag': getattr(item, 'etag', None),
+                    'size': getattr(item, 'size', None),
+                    'modified_at': str(getattr(item, 'modified_at', '') or '') or None,
                 })
             
             return items
@@ -259,13 +291,56 @@ class BoxContractService:
             logger.error(f"Error listing folder items: {e}")
             raise
     
+    async def get_file_info(self, file_id: str) -> Dict:
+        """Get version metadata (sha1, etag, size, modified_at) for a file."""
+        client = self._get_client()
+        
+        try:
+            file_info = await asyncio.to_thread(
+                client.files.get_file_by_id, file_id, fields=self.ITEM_FIELDS
+            )
+            return {
+                'id': file_info.id,
+                'name': file_info.name,
+                'type': 'file',
+                'sha1': file_info.sha1,
+                'etag': file_info.etag,
+                'size': file_info.size,
+                'modified_at': str(file_info.modified_at) if file_info.modified_at else None,
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting file info for {file_id}: {e}")
+            raise
+    
+    def _download(self, file_id: str) -> bytes:
+        stream = self._get_client().downloads.download_file(file_id)
+        try:
+            return stream.read()
+        finally:
+            stream.close()
+    
     async def read_file(self, file_id: str) -> str:
-        """Read text content from a Box file."""
+        """
+        Read text content from a Box file: downloaded once and extracted
+        locally (TXT, DOCX, PDF), with Box text extraction as the fallback for
+        other formats, scanned PDFs and failed local extraction.
+        """
         client = self._get_client()
         
+        if self.local_text_extraction:
+            try:
+                data = await asyncio.to_thread(self._download, file_id)
+                text = await self.text_extractor.extract(data, file_id)
+                if text is not None:
+                    return text
+                logger.info(f"No local text for file {file_id}, using Box text extraction")
+            except Exception as e:
+                logger.warning(f"Local text extraction failed for file {file_id}, using Box text extraction: {e}")
+        
         try:
-            # Use Box text extraction
-            result = box_file_text_extract(client, file_id)
+            # Use Box text extraction (blocking HTTP call, keep it off the event loop)
+            result = await asyncio.to_thread(box_file_text_extract, client, file_id)
             
             # Extract text from result
             if isinstance(result, dict):
@@ -279,29 +354,80 @@ class BoxContractService:
             logger.error(f"Error reading file {file_id}: {e}")
             raise
     
+    def _get_uploader(self) -> ChunkedUploader:
+        """Chunked uploader for large files, created on first use."""
+        if self.chunked_uploader is None:
+            self.chunked_uploader = ChunkedUploader(self._get_client())
+        return self.chunked_uploader
+    
+    async def _upload_bytes(self, folder_id: str, filename: str, data: bytes) -> str:
+        """Upload file contents: chunked upload sessions above the threshold, otherwise one request."""
+        uploader = self._get_uploader()
+        if uploader.should_chunk(len(data)):
+            return await uploader.upload(folder_id, filename, io.BytesIO(data), len(data))
+        
+        # Upload file using Box AI toolkit (blocking HTTP call, keep it off the event loop)
+        result = await asyncio.to_thread(
+            box_file_upload,
+            client=self._get_client(),
+            content=data,
+            file_name=filename,
+            parent_folder_id=folder_id
+        )
+        
+        # Extract file ID from result
+        if isinstance(result, dict):
+            return result.get('id', result.get('file_id', ''))
+        return str(result)
+    
     async def upload_text_file(
         self, folder_id: str, filename: str, content: str
     ) -> str:
         """Upload a text file to Box."""
-        client = self._get_client()
-        
         try:
             # Convert string to bytes
-            file_bytes = content.encode('utf-8')
+            file_id = await self._upload_bytes(folder_id, filename, content.encode('utf-8'))
             
-            # Upload file using Box AI toolkit
-            result = box_file_upload(
-                client=client,
-                content=file_bytes,
-                file_name=filename,
-                parent_folder_id=folder_id
-            )
+            logger.info(f"Uploaded file: {filename}")
+            return file_id
             
-            # Extract file ID from result
-            if isinstance(result, dict):
-                file_id = result.get('id', result.get('file_id', ''))
+        except Exception as e:
+            logger.error(f"Error uploading file {filename}: {e}")
+            raise
+    
+    async def upload_file(self, folder_id: str, filename: str, data: bytes) -> str:
+        """Upload an already rendered file (e.g. DOCX or PDF) to Box."""
+        try:
+            file_id = await self._upload_bytes(folder_id, filename, data)
+            
+            logger.info(f"Uploaded file: {filename}")
+            return file_id
+            
+        except Exception as e:
+            logger.error(f"Error uploading file {filename}: {e}")
+            raise
+    
+    async def upload_stream(self, folder_id: str, filename: str, stream: BinaryIO) -> str:
+        """
+        Upload a rendered file to Box straight from a seekable binary stream,
+        without reading it into memory: in parts through a chunked upload
+        session above the threshold, otherwise in one request.
+        """
+        client = self._get_client()
+        
+        try:
+            size = stream.seek(0, io.SEEK_END)
+            stream.seek(0)
+            uploader = self._get_uploader()
+            if uploader.should_chunk(size):
+                file_id = await uploader.upload(folder_id, filename, stream, size)
             else:
-                file_id = str(result)
+                files = await asyncio.to_thread(
+                    client.uploads.upload_file,
+                    UploadFileAttributes(name=filename, parent=UploadFileAttributesParentField(id=folder_id)),
+                    stream
+                )
+                file_id = files.entries[0].id
             
             logger.info(f"Uploaded file: {filename}")
             return file_id
@@ -310,6 +436,29 @@ class BoxContractService:
             logger.error(f"Error uploading file {filename}: {e}")
             raise
     
+    async def upload_new_version(self, file_id: str, filename: str, stream: BinaryIO) -> str:
+        """Upload a seekable binary stream as a new version of an existing Box file."""
+        client = self._get_client()
+        
+        try:
+            size = stream.seek(0, io.SEEK_END)
+            stream.seek(0)
+            uploader = self._get_uploader()
+            if uploader.should_chunk(size):
+                new_file_id = await uploader.upload(None, filename, stream, size, file_id=file_id)
+            else:
+                files = await asyncio.to_thread(
+                    client.uploads.upload_file_version, file_id, UploadFileVersionAttributes(name=filename), stream
+                )
+                new_file_id = files.entries[0].id
+            
+            logger.info(f"Uploaded new version of {filename}")
+            return new_file_id
+            
+        except Exception as e:
+            logger.error(f"Error uploading new version of {filename}: {e}")
+            raise
+    
     async def upload_document_file(
         self, folder_id: str, filename: str, content: str, file_type: str = "docx"
     ) -> str:
@@ -327,8 +476,6 @@ class BoxContractService:
         """
         from document_generator import create_docx_from_text, create_pdf_from_text
         
-        client = self._get_client()
-        
         try:
             # Generate proper document format
             if filename.endswith('.docx') or file_type.lower() == 'docx':
@@ -340,19 +487,7 @@ class BoxContractService:
                 logger.warning(f"Unknown file type for {filename}, using plain text")
                 file_bytes = content.encode('utf-8')
             
-            # Upload file using Box AI toolkit
-            result = box_file_upload(
-                client=client,
-                content=file_bytes,
-                file_name=filename,
-                parent_folder_id=folder_id
-            )
-            
-            # Extract file ID from result
-            if isinstance(result, dict):
-                file_id = result.get('id', result.get('file_id', ''))
-            else:
-                file_id = str(result)
+            file_id = await self._upload_bytes(folder_id, filename, file_bytes)
             
             logger.info(f"Uploaded formatted document: {filename}")
             return file_id
@@ -361,43 +496,6 @@ class BoxContractService:
             logger.error(f"Error uploading document {filename}: {e}")
             raise
     
-    async def ask_ai_about_file(self, file_id: str, prompt: str) -> str:
-        """
-        Use AWS Bedrock to analyze a file.
-        Reads the file from Box and sends it to Bedrock for analysis.
-        """
-        try:
-            # Read the file content from Box first
-            contract_text = await self.read_file(file_id)
-            
-            # Import BedrockService here to avoid circular imports
-            from bedrock_service import BedrockService
-            
-            # Initialize Bedrock service
-            bedrock = BedrockService()
-            
-            # Use Bedrock to analyze the contract
-            logger.info(f"Using AWS Bedrock to analyze file {file_id}")
-            result = await bedrock.analyze_contract(
-                contract_text=contract_text,
-                prompt=prompt,
-                max_tokens=8192,
-                temperature=0.7
-            )
-            
-            if not result or len(result.strip()) < 10:
-                logger.warning(f"Bedrock returned very short or empty response")
-                raise ValueError("Bedrock returned empty or invalid response")
-            
-            return result
-            
-        except ImportError:
-            logger.error("BedrockService not found. Please ensure bedrock_service.py exists.")
-            raise
-        except Exception as e:
-            logger.error(f"Error calling Bedrock: {e}")
-            raise
-    
     async def get_current_user_email(self) -> Optional[str]:
         """Get the current authenticated user's email from Box."""
         client = self._get_client()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Checkpoint Store
+Persists the finished intermediate results of a contract (classification,
+mirror folder, generated artifacts, uploaded files) so a restarted processor
+resumes from the last completed step instead of starting over.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointStore:
+    """One JSON checkpoint file per contract key."""
+
+    DEFAULT_DIRECTORY = Path(__file__).parent / "checkpoints"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(
+            directory or os.getenv("CHECKPOINT_DIR", str(self.DEFAULT_DIRECTORY))
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        # Contract names can contain characters that are awkward in filenames
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.directory / f"{digest}.json"
+
+    def load(self, key: str, version: Optional[str] = None) -> Dict:
+        """
+        Load the checkpoint for a contract.
+
+        Args:
+            key: Contract key
+            version: Current file version (sha1); a checkpoint taken for a
+                     different version is discarded
+
+        Returns:
+            The checkpoint data, or an empty dict if there is none
+        """
+        path = self._path(key)
+        if not path.exists():
+            return {}
+        try:
+            with open(path, 'r') as f:
+                checkpoint = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading checkpoint for {key}: {e}")
+            return {}
+
+        if version and checkpoint.get('version') and checkpoint['version'] != version:
+            logger.info(f"Discarding checkpoint for {key}: contract file changed")
+            self.delete(key)
+            return {}
+        return checkpoint
+
+    def save(self, key: str, checkpoint: Dict):
+        """Atomically write a contract's checkpoint."""
+        path = self._path(key)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(checkpoint, key=key), f)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str):
+        """Remove a checkpoint once the contract is fully processed."""
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
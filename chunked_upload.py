@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Chunked Upload
+Uploads large files to Box through chunked upload sessions instead of one
+request: parts are sent concurrently, the SHA-1 digest of the whole file is
+computed incrementally while the parts are read, and open sessions are
+persisted so an interrupted upload resumes with the parts Box already has
+instead of starting again from byte zero.
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from box_sdk_gen import BoxClient, UploadPart
+
+logger = logging.getLogger(__name__)
+
+# Box only accepts upload sessions for files of at least 20 MB
+MIN_CHUNKED_UPLOAD_SIZE = 20_000_000
+
+# Commits are retried while Box is still processing the parts (HTTP 202)
+COMMIT_ATTEMPTS = 5
+COMMIT_RETRY_DELAY = 2.0
+
+
+class _StaleSession(Exception):
+    """A resumed session's parts do not match the file being uploaded."""
+
+
+class UploadSessionStore:
+    """Open upload sessions, one JSON file per destination file, so interrupted uploads can resume."""
+
+    DEFAULT_DIRECTORY = Path(__file__).parent / "upload_sessions"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(
+            directory or os.getenv("UPLOAD_SESSION_DIR", str(self.DEFAULT_DIRECTORY))
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.directory / f"{digest}.json"
+
+    def load(self, key: str) -> Dict:
+        """The open session for a destination file, or an empty dict."""
+        path = self._path(key)
+        if not path.exists():
+            return {}
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading upload session for {key}: {e}")
+            return {}
+
+    def save(self, key: str, session: Dict):
+        """Atomically write a session."""
+        path = self._path(key)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(session, key=key), f)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str):
+        """Forget a session once it is committed, aborted or expired."""
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ChunkedUploader:
+    """
+    Box chunked uploads with concurrent parts and resume.
+
+    Args:
+        client: Authenticated Box client
+        sessions: Where open sessions are kept between runs
+        threshold: Files of at least this many bytes use upload sessions
+                   (CHUNKED_UPLOAD_THRESHOLD, at least Box's 20 MB minimum)
+        concurrency: Parts uploaded at the same time (UPLOAD_PART_CONCURRENCY,
+                     default 4); this many parts are held in memory at most
+    """
+
+    def __init__(
+        self,
+        client: BoxClient,
+        sessions: Optional[UploadSessionStore] = None,
+        threshold: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.client = client
+        self.sessions = sessions or UploadSessionStore()
+        self.threshold = max(
+            threshold or int(os.getenv("CHUNKED_UPLOAD_THRESHOLD", str(MIN_CHUNKED_UPLOAD_SIZE))),
+            MIN_CHUNKED_UPLOAD_SIZE
+        )
+        self.concurrency = concurrency or int(os.getenv("UPLOAD_PART_CONCURRENCY", "4"))
+
+    def should_chunk(self, size: int) -> bool:
+        return size >= self.threshold
+
+    def _uploaded_parts(self, session_id: str) -> Dict[int, UploadPart]:
+        """Parts Box already has for a session, by offset."""
+        parts: Dict[int, UploadPart] = {}
+        while True:
+            page = self.client.chunked_uploads.get_file_upload_session_parts(
+                session_id, offset=len(parts), limit=1000
+            )
+            entries = page.entries or []
+            parts.update((part.offset, part) for part in entries)
+            if not entries or len(parts) >= (page.total_count or 0):
+                return parts
+
+    async def _open_session(self, key: str, folder_id: str, filename: str, size: int, file_id: Optional[str]):
+        """Resume the persisted session for this file if Box still has it, else create one."""
+        session = self.sessions.load(key)
+        if session:
+            expires_at = session.get('expires_at')
+            if expires_at and datetime.fromisoformat(expires_at) <= datetime.now(timezone.utc):
+                logger.info(f"Upload session for {filename} expired; starting a new one")
+            else:
+                try:
+                    uploaded = await asyncio.to_thread(self._uploaded_parts, session['id'])
+                    logger.info(
+                        f"Resuming upload of {filename}: {len(uploaded)}/{session['total_parts']} parts already uploaded"
+                    )
+                    return session, uploaded
+                except Exception as e:
+                    logger.info(f"Upload session for {filename} cannot be resumed ({e}); starting a new one")
+            self.sessions.delete(key)
+
+        if file_id:
+            created = await asyncio.to_thread(
+                self.client.chunked_uploads.create_file_upload_session_for_existing_file,
+                file_id, size, file_name=filename
+            )
+        else:
+            created = await asyncio.to_thread(
+                self.client.chunked_uploads.create_file_upload_session, folder_id, size, filename
+            )
+        session = {
+            'id': created.id,
+            'part_size': created.part_size,
+            'total_parts': created.total_parts,
+            'expires_at': created.session_expires_at.isoformat() if created.session_expires_at else None,
+        }
+        self.sessions.save(key, session)
+        return session, {}
+
+    def _upload_part(self, session_id: str, chunk: bytes, offset: int, size: int) -> UploadPart:
+        digest = base64.b64encode(hashlib.sha1(chunk).digest()).decode('ascii')
+        uploaded = self.client.chunked_uploads.upload_file_part(
+            session_id, io.BytesIO(chunk), f"sha={digest}", f"bytes {offset}-{offset + len(chunk) - 1}/{size}"
+        )
+        return uploaded.part
+
+    def _abort(self, session_id: str):
+        try:
+            self.client.chunked_uploads.delete_file_upload_session_by_id(session_id)
+        except Exception as e:
+            logger.warning(f"Could not abort upload session {session_id}: {e}")
+
+    async def upload(
+        self, folder_id: str, filename: str, stream: BinaryIO, size: int, file_id: Optional[str] = None
+    ) -> str:
+        """
+        Upload a file of the given size from a seekable binary stream
+        positioned at its start; with file_id, as a new version of that file.
+        Returns the file's ID.
+        """
+        key = f"{file_id or folder_id}/{filename}:{size}"
+        session, uploaded = await self._open_session(key, folder_id, filename, size, file_id)
+
+        file_hash = hashlib.sha1()
+        parts: List[UploadPart] = []
+        tasks: List[asyncio.Task] = []
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def send(chunk: bytes, offset: int) -> UploadPart:
+            try:
+                return await asyncio.to_thread(self._upload_part, session['id'], chunk, offset, size)
+            finally:
+                slots.release()
+
+        try:
+            offset = 0
+            while offset < size:
+                # Read the next part only when a slot is free, so memory stays bounded
+                await slots.acquire()
+                try:
+                    chunk = await asyncio.to_thread(stream.read, session['part_size'])
+                    if not chunk:
+                        raise ValueError(f"{filename} ended after {offset} of {size} bytes")
+                    existing = uploaded.get(offset)
+                    if existing is not None and (
+                        existing.size != len(chunk) or existing.sha_1 != hashlib.sha1(chunk).hexdigest()
+                    ):
+                        raise _StaleSession()
+                except BaseException:
+                    slots.release()
+                    raise
+                file_hash.update(chunk)
+                if existing is None:
+                    # send() releases the slot once the part is uploaded
+                    tasks.append(asyncio.create_task(send(chunk, offset)))
+                else:
+                    parts.append(existing)
+                    slots.release()
+                offset += len(chunk)
+            parts += await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        except Exception as e:
+            # Let the parts in flight finish, so the session holds exactly
+            # what Box has; it is kept and its parts reused on the next attempt
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if not isinstance(e, (_StaleSession, ValueError)):
+                raise
+            await asyncio.to_thread(self._abort, session['id'])
+            self.sessions.delete(key)
+            if isinstance(e, ValueError):
+                raise
+            # Same name and size but different content: start over with a new session
+            logger.info(f"Upload session for {filename} holds different content; starting a new one")
+            stream.seek(0)
+            return await self.upload(folder_id, filename, stream, size, file_id)
+
+        parts.sort(key=lambda part: part.offset)
+        digest = base64.b64encode(file_hash.digest()).decode('ascii')
+        for attempt in range(COMMIT_ATTEMPTS):
+            files = await asyncio.to_thread(
+                self.client.chunked_uploads.create_file_upload_session_commit, session['id'], parts, f"sha={digest}"
+            )
+            if files is not None and files.entries:
+                break
+            # Box is still processing the parts
+            await asyncio.sleep(COMMIT_RETRY_DELAY * (attempt + 1))
+        else:
+            raise RuntimeError(f"Upload session for {filename} was not committed after {COMMIT_ATTEMPTS} attempts")
+
+        self.sessions.delete(key)
+        logger.info(f"Uploaded {filename} in {len(parts)} parts ({len(parts) - len(tasks)} resumed)")
+        return files.entries[0].id
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Clause Diff
+Local redline engine: splits two versions of a contract into clauses, aligns
+them (tolerating renumbered sections and moved clauses), diffs aligned
+clauses word by word and renders a deterministic redline document.
+"""
+
+import difflib
+import re
+from typing import Dict, List, Optional, Tuple
+
+from contract_structure import ContractStructure
+
+# Markdown decoration models like to add around headings
+_DECORATION = re.compile(r'^[#*_\s]+|[*_\s]+$')
+_WORDS = re.compile(r'\S+\s*')
+
+# Minimum similarity for two differing clauses to count as the same clause
+MIN_SIMILARITY = 0.4
+
+UNCHANGED = "unchanged"
+RENUMBERED = "renumbered"
+MODIFIED = "modified"
+ADDED = "added"
+DELETED = "deleted"
+
+# Word diff segment kinds
+EQUAL = "equal"
+DELETE = "delete"
+INSERT = "insert"
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class Clause:
+    """One clause: its heading line plus the text up to the next heading."""
+
+    def __init__(self, index: int, number: Optional[str], heading: str, text: str, start: int, end: int):
+        self.index = index
+        self.number = number  # e.g. "3", "2.1", "IV"; None for unnumbered headings/preamble
+        self.heading = heading  # heading without its number
+        self.text = text  # full clause text, heading line included
+        self.start = start  # character offsets in the source document
+        self.end = end
+        body = text.split("\n", 1)[1] if "\n" in text else ""
+        self.body = body.strip()
+        # Content without the number, so renumbered clauses still match exactly
+        self.key = _normalize(f"{heading}\n{body}")
+        self.words = self.key.split()
+
+    @property
+    def label(self) -> str:
+        parts = [f"§{self.number}" if self.number else None, self.heading or None]
+        return " ".join(part for part in parts if part) or f"clause {self.index + 1}"
+
+
+def split_clauses(text: str, structure: Optional[ContractStructure] = None) -> List[Clause]:
+    """
+    Split a contract into clauses at numbered headings ("1.", "2.1",
+    "Section 3", "IV."), definitions and short all-caps heading lines. Text
+    before the first heading becomes a preamble clause.
+
+    Args:
+        text: Contract text
+        structure: Already parsed structure of the text, if the caller has one
+    """
+    structure = structure or ContractStructure(text)
+    return [
+        Clause(index, node.number, node.title, node.own_text, node.start, node.body_end)
+        for index, node in enumerate(structure.clauses())
+    ]
+
+
+def renumber(text: str, old_number: str, new_number: str) -> str:
+    """Replace a clause number at the start of its heading line."""
+    pattern = re.compile(
+        rf'^(\W*(?:(?:section|article|clause)\s+)?){re.escape(old_number)}(?=\b|[.)])', re.IGNORECASE
+    )
+    return pattern.sub(lambda match: f"{match.group(1)}{new_number}", text, count=1)
+
+
+def similarity(a: Clause, b: Clause) -> float:
+    """Word-level similarity of two clauses (0..1), with a bonus for equal headings."""
+    matcher = difflib.SequenceMatcher(None, a.words, b.words, autojunk=False)
+    if matcher.real_quick_ratio() < MIN_SIMILARITY / 2:
+        return 0.0
+    score = matcher.ratio()
+    if a.heading and _normalize(a.heading) == _normalize(b.heading):
+        score = min(1.0, score + 0.2)
+    return score
+
+
+def _longest_increasing(values: List[int]) -> set:
+    """Indices (into values) of one longest strictly increasing subsequence."""
+    tails: List[int] = []  # positions in values
+    previous = [-1] * len(values)
+    for position, value in enumerate(values):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if values[tails[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low:
+            previous[position] = tails[low - 1]
+        if low == len(tails):
+            tails.append(position)
+        else:
+            tails[low] = position
+    keep = set()
+    position = tails[-1] if tails else -1
+    while position != -1:
+        keep.add(position)
+        position = previous[position]
+    return keep
+
+
+class ClauseChange:
+    """How one clause changed between the original and the revised contract."""
+
+    def __init__(self, status: str, original: Optional[Clause], revised: Optional[Clause], score: float = 1.0):
+        self.status = status
+        self.original = original
+        self.revised = revised
+        self.score = score
+        self.moved = False
+
+
+def align_clauses(original: List[Clause], revised: List[Clause]) -> List[ClauseChange]:
+    """
+    Align two clause lists.
+
+    Identical clauses are paired first (regardless of number or position),
+    then the most similar remaining pairs above MIN_SIMILARITY. Paired
+    clauses that are out of order relative to the rest are marked moved.
+
+    Returns:
+        Changes in revised order, with deleted clauses placed after the
+        clause that preceded them in the original
+    """
+    pairs: Dict[int, Tuple[int, float]] = {}  # revised index -> (original index, score)
+    unmatched_original = set(range(len(original)))
+
+    by_key: Dict[str, List[int]] = {}
+    for clause in original:
+        by_key.setdefault(clause.key, []).append(clause.index)
+    for clause in revised:
+        candidates = by_key.get(clause.key)
+        if candidates:
+            original_index = candidates.pop(0)
+            pairs[clause.index] = (original_index, 1.0)
+            unmatched_original.discard(original_index)
+
+    scored = []
+    for clause in revised:
+        if clause.index in pairs:
+            continue
+        for original_index in unmatched_original:
+            score = similarity(original[original_index], clause)
+            if score >= MIN_SIMILARITY:
+                # Ties broken by position so the result is deterministic
+                scored.append((-score, clause.index, original_index))
+    for negative_score, revised_index, original_index in sorted(scored):
+        if revised_index in pairs or original_index not in unmatched_original:
+            continue
+        pairs[revised_index] = (original_index, -negative_score)
+        unmatched_original.discard(original_index)
+
+    # Clauses outside the longest in-order run of pairs were moved
+    paired_revised = sorted(pairs)
+    in_order = _longest_increasing([pairs[index][0] for index in paired_revised])
+    moved = {paired_revised[position] for position in range(len(paired_revised)) if position not in in_order}
+
+    changes_by_revised: Dict[int, ClauseChange] = {}
+    for revised_index, (original_index, score) in pairs.items():
+        before, after = original[original_index], revised[revised_index]
+        if before.key != after.key:
+            status = MODIFIED
+        elif (before.number or "") != (after.number or ""):
+            status = RENUMBERED
+        else:
+            status = UNCHANGED
+        change = ClauseChange(status, before, after, score)
+        change.moved = revised_index in moved
+        changes_by_revised[revised_index] = change
+
+    # Place each deleted clause after the revised clause paired with its
+    # nearest preceding original clause
+    original_to_revised = {original_index: revised_index for revised_index, (original_index, _) in pairs.items()}
+    deleted_after: Dict[int, List[ClauseChange]] = {}
+    for original_index in sorted(unmatched_original):
+        anchor = -1
+        for earlier in range(original_index - 1, -1, -1):
+            if earlier in original_to_revised:
+                anchor = original_to_revised[earlier]
+                break
+        deleted_after.setdefault(anchor, []).append(ClauseChange(DELETED, original[original_index], None))
+
+    changes = list(deleted_after.get(-1, []))
+    for clause in revised:
+        changes.append(changes_by_revised.get(clause.index) or ClauseChange(ADDED, None, clause))
+        changes.extend(deleted_after.get(clause.index, []))
+    return changes
+
+
+def _word_opcodes(original: str, revised: str) -> Tuple[List[str], List[str], List[Tuple]]:
+    """Words (with their trailing whitespace) of both texts and the opcodes turning one into the other."""
+    a, b = _WORDS.findall(original), _WORDS.findall(revised)
+    matcher = difflib.SequenceMatcher(None, [w.strip() for w in a], [w.strip() for w in b], autojunk=False)
+    return a, b, matcher.get_opcodes()
+
+
+def word_segments(original: str, revised: str) -> List[Tuple[str, str]]:
+    """
+    Word-level diff as (EQUAL | DELETE | INSERT, text) segments in reading
+    order, whitespace preserved; a replacement is its deletion followed by
+    its insertion, with trailing whitespace they share left unchanged (so a
+    replaced word at the end of a line keeps the line break).
+    """
+    a, b, opcodes = _word_opcodes(original, revised)
+    segments = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        deleted, inserted = "".join(a[i1:i2]), "".join(b[j1:j2])
+        if tag == 'equal':
+            if deleted == inserted:
+                segments.append((EQUAL, inserted))
+                continue
+            # Same words, other whitespace (e.g. a line break before deleted
+            # text): the whitespace that differs is a change of its own
+            equal = ""
+            for old_word, new_word in zip(a[i1:i2], b[j1:j2]):
+                word = new_word.rstrip()
+                old_space, new_space = old_word[len(word):], new_word[len(word):]
+                equal += word
+                if old_space == new_space:
+                    equal += new_space
+                    continue
+                segments.append((EQUAL, equal))
+                equal = ""
+                if old_space:
+                    segments.append((DELETE, old_space))
+                if new_space:
+                    segments.append((INSERT, new_space))
+            if equal:
+                segments.append((EQUAL, equal))
+        elif tag == 'delete':
+            segments.append((DELETE, deleted))
+        elif tag == 'insert':
+            segments.append((INSERT, inserted))
+        else:
+            trailing = inserted[len(inserted.rstrip()):]
+            shared = trailing if deleted.endswith(trailing) and trailing else ""
+            segments.append((DELETE, deleted[:len(deleted) - len(shared)]))
+            segments.append((INSERT, inserted[:len(inserted) - len(shared)]))
+            if shared:
+                segments.append((EQUAL, shared))
+    return segments
+
+
+def word_diff(original: str, revised: str) -> str:
+    """Inline word-level diff: [-deleted-] and {+added+}, whitespace preserved."""
+    a, b, opcodes = _word_opcodes(original, revised)
+    out = []
+
+    def marked(words: List[str], open_mark: str, close_mark: str) -> str:
+        text = "".join(words)
+        stripped = text.rstrip()
+        return f"{open_mark}{stripped}{close_mark}{text[len(stripped):]}"
+
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            out.append("".join(b[j1:j2]))
+            continue
+        if tag in ('delete', 'replace'):
+            deleted = marked(a[i1:i2], "[-", "-]")
+            out.append(deleted.rstrip() + (" " if tag == 'replace' else deleted[len(deleted.rstrip()):]))
+        if tag in ('insert', 'replace'):
+            out.append(marked(b[j1:j2], "{+", "+}"))
+    return "".join(out)
+
+
+def _clause_body(clause: Clause) -> str:
+    """Clause text without its number, for word diffs."""
+    first_line, _, rest = clause.text.partition("\n")
+    heading = clause.heading or _DECORATION.sub('', first_line.strip())
+    return f"{heading}\n{rest}" if rest else heading
+
+
+def summarize(changes: List[ClauseChange]) -> Dict[str, int]:
+    counts = {status: 0 for status in (MODIFIED, ADDED, DELETED, RENUMBERED, UNCHANGED)}
+    counts["moved"] = 0
+    for change in changes:
+        counts[change.status] += 1
+        counts["moved"] += change.moved
+    return counts
+
+
+def render_redline(
+    original_text: str,
+    revised_text: str,
+    contract_category: str = "",
+    original_structure: Optional[ContractStructure] = None
+) -> str:
+    """
+    Build the redline comparison document for an original contract and its
+    rewritten (mirror) version. Pass original_structure to reuse an already
+    parsed original.
+    """
+    changes = align_clauses(
+        split_clauses(original_text, original_structure), split_clauses(revised_text)
+    )
+    counts = summarize(changes)
+
+    lines = [
+        "REDLINE COMPARISON DOCUMENT",
+        "============================",
+        "",
+    ]
+    if contract_category:
+        lines += [f"Contract Type: {contract_category}", ""]
+    lines += [
+        f"Summary: {counts[MODIFIED]} modified, {counts[ADDED]} added, {counts[DELETED]} deleted, "
+        f"{counts['moved']} moved, {counts[RENUMBERED]} renumbered, {counts[UNCHANGED]} unchanged",
+        "Legend: [-deleted text-]  {+added text+}",
+        "",
+    ]
+
+    for change in changes:
+        before, after = change.original, change.revised
+        if change.status == ADDED:
+            tag = "ADDED"
+        elif change.status == DELETED:
+            tag = "DELETED"
+        else:
+            notes = []
+            if change.status == MODIFIED:
+                notes.append("MODIFIED")
+            if before.number and after.number and before.number != after.number:
+                notes.append(f"RENUMBERED from §{before.number}")
+            if change.moved:
+                notes.append(f"MOVED from position {before.index + 1}")
+            tag = ", ".join(notes) or "UNCHANGED"
+
+        number = (after or before).number
+        lines.append("-" * 60)
+        lines.append(f"§{number}  [{tag}]" if number else f"[{tag}]")
+        lines.append("")
+        if change.status == ADDED:
+            lines.append(word_diff("", _clause_body(after)))
+        elif change.status == DELETED:
+            lines.append(word_diff(_clause_body(before), ""))
+        elif change.status == MODIFIED:
+            lines.append(word_diff(_clause_body(before), _clause_body(after)))
+        else:
+            lines.append(_clause_body(after))
+        lines.append("")
+
+    return "\n".join(lines).rstrip() + "\n"
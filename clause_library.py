@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Clause Library
+Stores accepted clause rewrites keyed by normalized clause fingerprint,
+user interests hash and contract category, and serves them for exact and
+near matches so recurring boilerplate (limitation of liability,
+indemnification, termination, ...) is not rewritten by the model again.
+
+A near match is a stored clause that differs only in substituted words
+(party names, amounts, dates, notice periods). The stored rewrite is
+served with the same substitutions applied, and only if the model kept
+every substituted word verbatim; anything else counts as a novel clause.
+
+Operator usage (record a mirror contract you accepted):
+    python clause_library.py accept <contract.txt> <mirror.txt> <category> [interests.txt] [instructions.txt]
+    python clause_library.py stats
+"""
+
+import difflib
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from clause_diff import ADDED, DELETED, Clause, align_clauses, renumber, split_clauses
+from contract_structure import ContractStructure
+
+logger = logging.getLogger(__name__)
+
+EXACT = "exact"
+NEAR = "near"
+
+CLAUSE_REWRITES_TOOL = {
+    "name": "record_clause_rewrites",
+    "description": "Record the protected rewrite of each listed contract clause.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "clauses": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "text": {"type": "string"},
+                    },
+                    "required": ["id", "text"],
+                },
+            },
+        },
+        "required": ["clauses"],
+    },
+}
+
+
+_NUMBER = re.compile(r'\d+(?:[.,]\d+)*')
+# "3. ", "Section 4: ", "IV) " at the start of a clause
+_LEADING_NUMBER = re.compile(
+    r'^\W*(?:(?:section|article|clause)\s+(?:\d+(?:\.\d+)*|[ivxlc]+)[.:)]?|(?:\d+(?:\.\d+)*|[IVXLC]+)[.):])\s+',
+    re.IGNORECASE
+)
+
+
+def clause_fingerprint(clause: Clause) -> str:
+    """Hash of the clause's normalized heading and body (its number is ignored)."""
+    return hashlib.sha1(clause.key.encode('utf-8')).hexdigest()
+
+
+def clause_shape(clause: Clause) -> str:
+    """Hash of the normalized clause with every number masked (same wording, other values)."""
+    return hashlib.sha1(_NUMBER.sub('#', clause.key).encode('utf-8')).hexdigest()
+
+
+def interests_fingerprint(user_interests: Optional[str], per_contract_instructions: Optional[str]) -> str:
+    """Hash of the guidance a rewrite was made for."""
+    payload = f"{' '.join((user_interests or '').split())}\x00{' '.join((per_contract_instructions or '').split())}"
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+# Words with their trailing whitespace, so a rewrite can be reassembled exactly
+_TOKENS = re.compile(r'\S+\s*')
+# Substituted words must sit inside a run of at least this many words the
+# model kept verbatim, so they are not matched to a stray equal word
+MIN_ANCHOR_WORDS = 3
+
+
+def transfer_edits(
+    stored_original: str,
+    stored_rewrite: str,
+    clause_text: str,
+    min_similarity: float = 0.0
+) -> Optional[Tuple[str, float]]:
+    """
+    Apply the word substitutions that turn stored_original into clause_text
+    to the same words of stored_rewrite.
+
+    Returns:
+        (adapted rewrite, word similarity of the two clauses), or None if the
+        clauses are less similar than min_similarity, differ by more than
+        substitutions, or a substituted word was itself changed by the rewrite
+        or also occurs elsewhere in it
+    """
+    before, after = stored_original.split(), clause_text.split()
+    if len(before) == len(after):
+        # Same length (the common case: other values in the same wording):
+        # comparing word by word gives the substitutions without a diff
+        edits = _positional_edits(before, after)
+        score = sum(i2 - i1 for tag, i1, i2, _, _ in edits if tag == 'equal') / max(len(before), 1)
+        if score < min_similarity:
+            return None
+    else:
+        matcher = difflib.SequenceMatcher(None, before, after, autojunk=False)
+        if matcher.real_quick_ratio() < min_similarity or matcher.quick_ratio() < min_similarity:
+            return None
+        edits = matcher.get_opcodes()
+        if any(tag in ('insert', 'delete') for tag, *_ in edits):
+            return None
+        score = matcher.ratio()
+        if score < min_similarity:
+            return None
+
+    rewrite_tokens = _TOKENS.findall(stored_rewrite.strip())
+    rewrite_words = [token.rstrip() for token in rewrite_tokens]
+    # Position in the rewrite of each original word the model kept verbatim
+    kept: Dict[int, int] = {}
+    min_anchor = min(MIN_ANCHOR_WORDS, len(before))
+    for a, b, size in _matching_blocks(before, rewrite_words):
+        if size >= min_anchor:
+            for offset in range(size):
+                kept[a + offset] = b + offset
+
+    replacements = []
+    for tag, i1, i2, j1, j2 in edits:
+        if tag != 'replace':
+            continue
+        targets = [kept.get(index) for index in range(i1, i2)]
+        if None in targets or targets[-1] - targets[0] != i2 - i1 - 1:
+            return None
+        replacements.append((targets[0], targets[-1] + 1, after[j1:j2]))
+
+    # An old value in words the model added (e.g. a party name in a new
+    # sentence) would be served unchanged
+    copied = set(kept.values())
+    for tag, i1, i2, _, _ in edits:
+        replaced = before[i1:i2]
+        if tag == 'replace' and any(
+            rewrite_words[start:start + len(replaced)] == replaced and start not in copied
+            for start in range(len(rewrite_words) - len(replaced) + 1)
+        ):
+            return None
+
+    for start, end, words in reversed(replacements):
+        last = rewrite_tokens[end - 1]
+        rewrite_tokens[start:end] = [" ".join(words) + last[len(last.rstrip()):]]
+    return "".join(rewrite_tokens), score
+
+
+def _positional_edits(before: List[str], after: List[str]) -> List[Tuple[str, int, int, int, int]]:
+    """Opcodes (as SequenceMatcher.get_opcodes) of two equally long word lists compared position by position."""
+    edits = []
+    for position, (a, b) in enumerate(zip(before, after)):
+        tag = 'equal' if a == b else 'replace'
+        if edits and edits[-1][0] == tag:
+            edits[-1] = (tag, edits[-1][1], position + 1, edits[-1][3], position + 1)
+        else:
+            edits.append((tag, position, position + 1, position, position + 1))
+    return edits
+
+
+def _matching_blocks(a: List[str], b: List[str]) -> List[Tuple[int, int, int]]:
+    """
+    (a index, b index, size) of the runs of words a and b share. The common
+    prefix and suffix are taken as is, so difflib only scans the middle.
+    """
+    prefix = 0
+    while prefix < min(len(a), len(b)) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(a), len(b)) - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    middle = difflib.SequenceMatcher(
+        None, a[prefix:len(a) - suffix], b[prefix:len(b) - suffix], autojunk=False
+    ).get_matching_blocks()
+    blocks = [(0, 0, prefix)] + [(i + prefix, j + prefix, size) for i, j, size in middle] + [
+        (len(a) - suffix, len(b) - suffix, suffix)
+    ]
+    merged: List[Tuple[int, int, int]] = []
+    for i, j, size in blocks:
+        if not size:
+            continue
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    return merged
+
+
+def _body(text: str) -> str:
+    """Clause text with the number at the start of its heading removed."""
+    return _LEADING_NUMBER.sub('', text, count=1)
+
+
+class LibraryMatch:
+    """A library rewrite served for a clause."""
+
+    def __init__(self, kind: str, rewrite: str, score: float):
+        self.kind = kind  # EXACT or NEAR
+        self.rewrite = rewrite
+        self.score = score
+
+
+class ClauseLibrary:
+    """
+    Accepted clause rewrites in a SQLite file.
+
+    Args:
+        path: Database file (CLAUSE_LIBRARY_DB, default clause_library.db next to this module)
+        near_match: Minimum word similarity for a near match (CLAUSE_LIBRARY_NEAR_MATCH)
+        min_words: Shorter clauses (headings, signature lines) are not stored (CLAUSE_LIBRARY_MIN_WORDS)
+    """
+
+    DEFAULT_PATH = Path(__file__).parent / "clause_library.db"
+    # Near-match candidates are limited to clauses of about the same length
+    LENGTH_TOLERANCE = 0.15
+    MAX_CANDIDATES = 10
+    MAX_SHAPE_CANDIDATES = 5
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        near_match: Optional[float] = None,
+        min_words: Optional[int] = None
+    ):
+        self.path = path or os.getenv("CLAUSE_LIBRARY_DB", str(self.DEFAULT_PATH))
+        self.near_match = near_match or float(os.getenv("CLAUSE_LIBRARY_NEAR_MATCH", "0.9"))
+        self.min_words = min_words or int(os.getenv("CLAUSE_LIBRARY_MIN_WORDS", "12"))
+        self.hits = {EXACT: 0, NEAR: 0}
+        self.misses = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS clauses ("
+                " fingerprint TEXT NOT NULL,"
+                " interests TEXT NOT NULL,"
+                " category TEXT NOT NULL,"
+                " shape TEXT NOT NULL,"
+                " heading TEXT NOT NULL,"
+                " word_count INTEGER NOT NULL,"
+                " number TEXT,"
+                " original TEXT NOT NULL,"
+                " rewrite TEXT NOT NULL,"
+                " uses INTEGER NOT NULL DEFAULT 0,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (fingerprint, interests, category))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS clauses_shape ON clauses (category, interests, shape)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS clauses_near ON clauses (category, interests, heading, word_count)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (calls arrive from asyncio worker threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # A cache of rewrites: losing the last commits on power loss is fine
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row(self, clause: Clause, rewrite: str, category: str, interests: str) -> Optional[Tuple]:
+        """INSERT parameters for a rewrite, or None if the clause is too short to keep."""
+        if len(clause.words) < self.min_words or not rewrite.strip():
+            return None
+        return (
+            clause_fingerprint(clause), interests, category, clause_shape(clause), " ".join(clause.heading.lower().split()),
+            len(clause.words), clause.number, clause.text, rewrite.strip(), time.time()
+        )
+
+    def _store(self, rows: List[Tuple]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO clauses (fingerprint, interests, category, shape, heading, word_count, number, original, rewrite, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(fingerprint, interests, category) DO UPDATE SET "
+                " rewrite = excluded.rewrite, number = excluded.number, updated_at = excluded.updated_at",
+                rows
+            )
+
+    def add(self, clause: Clause, rewrite: str, category: str, interests: str) -> bool:
+        """Store an accepted rewrite. Returns False if the clause is too short to keep."""
+        row = self._row(clause, rewrite, category, interests)
+        if row is None:
+            return False
+        self._store([row])
+        return True
+
+    def lookup(self, clause: Clause, category: str, interests: str) -> Optional[LibraryMatch]:
+        """The stored rewrite for a clause (exact match first, then the first near match that adapts)."""
+        found = self._match(self._connect(), clause, category, interests)
+        if found is None:
+            return None
+        match, fingerprint = found
+        self._record_uses([fingerprint], category, interests)
+        return match
+
+    def _match(
+        self, conn: sqlite3.Connection, clause: Clause, category: str, interests: str
+    ) -> Optional[Tuple[LibraryMatch, str]]:
+        """(match, fingerprint of the stored clause it came from), without recording the use."""
+        if len(clause.words) < self.min_words:
+            return None
+        fingerprint = clause_fingerprint(clause)
+        row = conn.execute(
+            "SELECT number, rewrite FROM clauses WHERE fingerprint = ? AND interests = ? AND category = ?",
+            (fingerprint, interests, category)
+        ).fetchone()
+        if row:
+            number, rewrite = row
+            if number and clause.number and number != clause.number:
+                rewrite = renumber(rewrite, number, clause.number)
+            self.hits[EXACT] += 1
+            return LibraryMatch(EXACT, rewrite, 1.0), fingerprint
+
+        # Same wording with other values first (indexed), then any similar
+        # clause of about the same length; the first one that adapts is served
+        shape = clause_shape(clause)
+        for candidates in self._near_candidates(conn, clause, shape, category, interests):
+            for fingerprint, number, original, rewrite in candidates:
+                # Compared without the clause number, which would count as a substitution
+                transferred = transfer_edits(_body(original), rewrite, _body(clause.text), self.near_match)
+                if transferred is None:
+                    continue
+                adapted, score = transferred
+                if number and clause.number and number != clause.number:
+                    adapted = renumber(adapted, number, clause.number)
+                self.hits[NEAR] += 1
+                return LibraryMatch(NEAR, adapted, score), fingerprint
+        self.misses += 1
+        return None
+
+    def _near_candidates(self, conn: sqlite3.Connection, clause: Clause, shape: str, category: str, interests: str):
+        """Batches of near-match candidates, most promising first."""
+        yield conn.execute(
+            "SELECT fingerprint, number, original, rewrite FROM clauses "
+            "WHERE category = ? AND interests = ? AND shape = ? ORDER BY uses DESC LIMIT ?",
+            (category, interests, shape, self.MAX_SHAPE_CANDIDATES)
+        ).fetchall()
+        word_count = len(clause.words)
+        yield conn.execute(
+            "SELECT fingerprint, number, original, rewrite FROM clauses "
+            "WHERE category = ? AND interests = ? AND heading = ? AND word_count BETWEEN ? AND ? AND shape != ? "
+            "ORDER BY uses DESC LIMIT ?",
+            (
+                category, interests, " ".join(clause.heading.lower().split()),
+                int(word_count * (1 - self.LENGTH_TOLERANCE)), int(word_count * (1 + self.LENGTH_TOLERANCE)) + 1,
+                shape, self.MAX_CANDIDATES
+            )
+        ).fetchall()
+
+    def _record_uses(self, fingerprints: List[str], category: str, interests: str):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "UPDATE clauses SET uses = uses + 1 WHERE fingerprint = ? AND interests = ? AND category = ?",
+                [(fingerprint, interests, category) for fingerprint in fingerprints]
+            )
+
+    def lookup_all(
+        self, clauses: List[Clause], category: str, interests: str, min_coverage: float = 0.0
+    ) -> Dict[int, LibraryMatch]:
+        """
+        Library rewrites for the clauses that have one, by clause index.
+
+        Args:
+            min_coverage: Share of the contract text (by characters) the matches
+                          must cover; below it nothing is returned, and the
+                          lookup stops as soon as the share is out of reach
+        """
+        conn = self._connect()
+        total = sum(len(clause.text) for clause in clauses) or 1
+        # Longest clauses first, so an unreachable coverage shows up early
+        remaining = total
+        covered = 0
+        matches: Dict[int, LibraryMatch] = {}
+        fingerprints = []
+        for clause in sorted(clauses, key=lambda clause: len(clause.text), reverse=True):
+            remaining -= len(clause.text)
+            found = self._match(conn, clause, category, interests)
+            if found is not None:
+                matches[clause.index], fingerprint = found
+                fingerprints.append(fingerprint)
+                covered += len(clause.text)
+            elif (covered + remaining) / total < min_coverage:
+                return {}
+        if fingerprints:
+            self._record_uses(fingerprints, category, interests)
+        return matches
+
+    def learn(
+        self,
+        original_text: str,
+        mirror_text: str,
+        category: str,
+        interests: str,
+        structure: Optional[ContractStructure] = None
+    ) -> int:
+        """
+        Store the clause rewrites of a processed contract: each original clause
+        paired with its counterpart in the mirror contract.
+
+        Clauses are paired by clause number and heading, which the mirror
+        usually keeps; the similarity alignment is only needed for the clauses
+        left over.
+
+        Returns:
+            Number of rewrites stored
+        """
+        original = split_clauses(original_text, structure)
+        mirror = split_clauses(mirror_text)
+        pairs = _pair_by_number(original, mirror)
+        leftover_original = [clause for clause in original if clause.index not in pairs]
+        if leftover_original:
+            paired_mirror = {clause.index for clause in pairs.values()}
+            leftover_mirror = [clause for clause in mirror if clause.index not in paired_mirror]
+            for change in align_clauses(_reindexed(leftover_original), _reindexed(leftover_mirror)):
+                if change.status not in (ADDED, DELETED):
+                    pairs[leftover_original[change.original.index].index] = leftover_mirror[change.revised.index]
+
+        rows = []
+        for index, rewrite in sorted(pairs.items()):
+            clause, text = original[index], rewrite.text
+            # Stored under the original's number, which a renumbered mirror does not carry
+            if clause.number and rewrite.number and rewrite.number != clause.number:
+                text = renumber(text, rewrite.number, clause.number)
+            row = self._row(clause, text, category, interests)
+            if row is not None:
+                rows.append(row)
+        if rows:
+            self._store(rows)
+        return len(rows)
+
+
+def _pair_by_number(original: List[Clause], mirror: List[Clause]) -> Dict[int, Clause]:
+    """
+    Original clause index -> mirror clause, for clause numbers that occur once
+    in both under the same heading (a mirror that added or dropped a clause
+    has renumbered the rest).
+    """
+    def unique(clauses: List[Clause]) -> Dict[str, Clause]:
+        by_number: Dict[str, List[Clause]] = {}
+        for clause in clauses:
+            if clause.number:
+                by_number.setdefault(clause.number, []).append(clause)
+        return {number: found[0] for number, found in by_number.items() if len(found) == 1}
+
+    mirror_by_number = unique(mirror)
+    return {
+        clause.index: mirror_by_number[number]
+        for number, clause in unique(original).items()
+        if number in mirror_by_number
+        and clause.heading.lower().split() == mirror_by_number[number].heading.lower().split()
+    }
+
+
+def _reindexed(clauses: List[Clause]) -> List[Clause]:
+    """Copies of a clause subset indexed 0..n-1, as align_clauses expects."""
+    return [
+        Clause(position, clause.number, clause.heading, clause.text, clause.start, clause.end)
+        for position, clause in enumerate(clauses)
+    ]
+
+
+def main():
+    """Operator command line."""
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    library = ClauseLibrary()
+
+    if command == "accept" and len(sys.argv) >= 5:
+        contract_path, mirror_path, category = sys.argv[2:5]
+        # The same guidance the processor had, so the rewrites are served for it
+        guidance = [Path(path).read_text(encoding='utf-8') for path in sys.argv[5:7]]
+        guidance += [None] * (2 - len(guidance))
+        stored = library.learn(
+            Path(contract_path).read_text(encoding='utf-8'),
+            Path(mirror_path).read_text(encoding='utf-8'),
+            category,
+            interests_fingerprint(*guidance)
+        )
+        logger.info(f"Stored {stored} clause rewrite(s) for category '{category}'")
+    elif command == "stats":
+        conn = library._connect()
+        for category, count, uses in conn.execute(
+            "SELECT category, COUNT(*), SUM(uses) FROM clauses GROUP BY category ORDER BY category"
+        ):
+            logger.info(f"  {category}: {count} rewrite(s), served {uses} time(s)")
+    else:
+        logger.info(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Contract Folder Index
+In-memory index of the Smart_Contracts folder built from a single listing:
+contract name -> contract file, per-contract .instructions file and all
+file versions of that contract.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+INSTRUCTIONS_SUFFIX = ".instructions"
+
+
+def _version_of(item: Optional[Dict]) -> Optional[str]:
+    """Content version of a listed file (sha1, falling back to etag)."""
+    if item is None:
+        return None
+    return item.get('sha1') or item.get('etag')
+
+
+class ContractEntry:
+    """Everything the contracts folder holds for one contract name."""
+
+    def __init__(self, contract_name: str):
+        self.contract_name = contract_name
+        self.versions: List[Dict] = []  # contract files sharing this name (e.g. .pdf and .docx)
+        self.instructions_file: Optional[Dict] = None
+
+    @property
+    def contract_file(self) -> Optional[Dict]:
+        """The most recently modified contract file."""
+        return self.versions[0] if self.versions else None
+
+
+class ContractFolderIndex:
+    """Index of the contracts folder, rebuilt from each folder listing."""
+
+    def __init__(
+        self,
+        is_contract_file: Callable[[str], bool],
+        extract_contract_name: Callable[[str], str]
+    ):
+        self.is_contract_file = is_contract_file
+        self.extract_contract_name = extract_contract_name
+        self.entries: Dict[str, ContractEntry] = {}
+        self.built = False
+        # file_id -> (version, text) for instructions already read
+        self._instructions_text: Dict[str, tuple] = {}
+
+    def rebuild(self, items: List[Dict]) -> Set[str]:
+        """
+        Rebuild the index from a listing of the contracts folder.
+
+        Returns:
+            Names of contracts whose .instructions file was added, edited or
+            removed since the previous build (empty on the first build)
+        """
+        entries: Dict[str, ContractEntry] = {}
+
+        for item in items:
+            if item['type'] != 'file':
+                continue
+            filename = item['name']
+            if filename.endswith(INSTRUCTIONS_SUFFIX):
+                contract_name = filename[:-len(INSTRUCTIONS_SUFFIX)]
+                # Accept both "Contract.instructions" and "Contract.pdf.instructions"
+                if self.is_contract_file(contract_name):
+                    contract_name = self.extract_contract_name(contract_name)
+                entry = entries.setdefault(contract_name, ContractEntry(contract_name))
+                entry.instructions_file = item
+            elif self.is_contract_file(filename):
+                contract_name = self.extract_contract_name(filename)
+                entry = entries.setdefault(contract_name, ContractEntry(contract_name))
+                entry.versions.append(item)
+
+        for entry in entries.values():
+            entry.versions.sort(key=lambda v: v.get('modified_at') or '', reverse=True)
+
+        changed = set()
+        if self.built:
+            for name in set(entries) | set(self.entries):
+                old = self.entries.get(name)
+                new = entries.get(name)
+                old_version = _version_of(old.instructions_file if old else None)
+                new_version = _version_of(new.instructions_file if new else None)
+                if old_version != new_version and new is not None and new.versions:
+                    changed.add(name)
+
+        self.entries = entries
+        self.built = True
+        if changed:
+            logger.info(f"Instructions changed for: {', '.join(sorted(changed))}")
+        return changed
+
+    def get(self, contract_name: str) -> Optional[ContractEntry]:
+        return self.entries.get(contract_name)
+
+    def instructions_file(self, contract_name: str) -> Optional[Dict]:
+        """The .instructions file listed for a contract, if any."""
+        entry = self.entries.get(contract_name)
+        return entry.instructions_file if entry else None
+
+    def contract_files(self) -> List[Dict]:
+        """All contract files in the folder."""
+        return [version for entry in self.entries.values() for version in entry.versions]
+
+    def cached_instructions(self, item: Dict) -> Optional[str]:
+        """Instructions text read earlier for this exact file version."""
+        cached = self._instructions_text.get(item['id'])
+        if cached and cached[0] is not None and cached[0] == _version_of(item):
+            return cached[1]
+        return None
+
+    def cache_instructions(self, item: Dict, text: str):
+        self._instructions_text[item['id']] = (_version_of(item), text)
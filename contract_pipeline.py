@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Contract Pipeline
+Runs contract processing as explicit stages connected by bounded queues,
+each stage with its own worker pool and queue-depth metrics.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stage names in processing order
+STAGES = ["ingest", "extract", "classify", "generate", "render", "upload"]
+
+# Default worker pool sizes. Box-bound stages are cheap to run wide; the
+# Bedrock-bound generate stage is limited by model throughput.
+DEFAULT_STAGE_WORKERS = {
+    "ingest": 2,
+    "extract": 4,
+    "classify": 4,
+    "generate": 3,
+    "render": 2,
+    "upload": 4,
+}
+
+
+def stage_workers_from_env() -> Dict[str, int]:
+    """Worker counts per stage, overridable with PIPELINE_WORKERS_<STAGE>."""
+    return {
+        name: int(os.getenv(f"PIPELINE_WORKERS_{name.upper()}", str(default)))
+        for name, default in DEFAULT_STAGE_WORKERS.items()
+    }
+
+
+async def _maybe_await(result):
+    """Await callback results that are coroutines (callbacks may be sync or async)."""
+    if asyncio.iscoroutine(result):
+        await result
+
+
+class ContractJob:
+    """State of one contract as it moves through the pipeline."""
+
+    def __init__(self, file_id: str, filename: str, contract_name: str, version: Optional[str] = None):
+        self.file_id = file_id
+        self.filename = filename
+        self.contract_name = contract_name
+        self.version = version  # sha1 of the contract file, when known
+
+        # Filled in by the stages
+        self.user_interests: Optional[str] = None
+        self.per_contract_instructions: Optional[str] = None
+        self.contract_text: Optional[str] = None
+        self.structure = None  # ContractStructure of contract_text
+        self.contract_category: Optional[str] = None
+        self.mirror_folder_id: Optional[str] = None
+        self.artifacts: Dict[str, str] = {}  # artifact name -> generated text
+        self.outputs: Dict[str, object] = {}  # output filename -> content to upload
+        self.checkpoint: Dict = {}  # finished intermediate results (see CheckpointStore)
+        self.previous_revision: Optional[Dict] = None  # last processed version (see RevisionStore)
+        self.fallback_artifacts: Set[str] = set()  # artifacts replaced by placeholder content
+
+        self.stage_timings: Dict[str, float] = {}
+        self.error: Optional[Exception] = None
+        self.created_at = time.monotonic()
+
+    @property
+    def key(self) -> str:
+        """Key used to track processed contracts."""
+        return f"{self.contract_name}_{self.file_id}"
+
+
+class PipelineStage:
+    """One stage: a bounded input queue drained by a pool of workers."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[ContractJob], Awaitable[None]],
+        workers: int,
+        queue_size: int
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        # Metrics
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        self.max_depth = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    async def put(self, job: ContractJob):
+        """Enqueue a job, waiting while the queue is full (backpressure)."""
+        await self.queue.put(job)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def metrics(self) -> Dict:
+        """Snapshot of this stage's metrics."""
+        completed = self.processed + self.failed
+        return {
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.max_depth,
+            'busy_workers': self.busy,
+            'processed': self.processed,
+            'failed': self.failed,
+            'avg_seconds': self.total_seconds / completed if completed else 0.0,
+            'max_seconds': self.max_seconds,
+        }
+
+
+class ContractPipeline:
+    """Chains stages so each job flows ingest -> ... -> upload."""
+
+    def __init__(
+        self,
+        handlers: List[Tuple[str, Callable[[ContractJob], Awaitable[None]]]],
+        workers: Optional[Dict[str, int]] = None,
+        queue_size: Optional[int] = None,
+        on_complete: Optional[Callable[[ContractJob], object]] = None,
+        on_error: Optional[Callable[[ContractJob, Exception], object]] = None
+    ):
+        """
+        Create a pipeline.
+
+        Args:
+            handlers: (stage name, async handler) pairs in processing order
+            workers: Worker pool size per stage name
+            queue_size: Capacity of each stage's input queue
+            on_complete: Called (sync or async) with each job that finished the last stage
+            on_error: Called (sync or async) with a job and the exception that stopped it
+        """
+        workers = workers or stage_workers_from_env()
+        queue_size = queue_size or int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+        self.stages = [
+            PipelineStage(name, handler, workers.get(name, 1), queue_size)
+            for name, handler in handlers
+        ]
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.in_flight: Dict[str, ContractJob] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        """Start the worker pools (idempotent)."""
+        if self._tasks:
+            return
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for worker_id in range(stage.workers):
+                self._tasks.append(asyncio.create_task(
+                    self._worker(stage, next_stage),
+                    name=f"pipeline-{stage.name}-{worker_id}"
+                ))
+        logger.info(
+            "Pipeline started: " + ", ".join(f"{s.name}×{s.workers}" for s in self.stages)
+        )
+
+    async def submit(self, job: ContractJob) -> bool:
+        """
+        Feed a job into the first stage. Waits if the pipeline is saturated.
+
+        Returns:
+            False if a job with the same key is already in flight
+        """
+        if job.key in self.in_flight:
+            return False
+        self.start()
+        self.in_flight[job.key] = job
+        self._idle.clear()
+        await self.stages[0].put(job)
+        return True
+
+    def _finish(self, job: ContractJob):
+        """Remove a job that left the pipeline (done or failed)."""
+        self.in_flight.pop(job.key, None)
+        if not self.in_flight:
+            self._idle.set()
+
+    async def join(self):
+        """Wait until every submitted job has left the pipeline."""
+        await self._idle.wait()
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for in-flight jobs to finish.
+
+        Returns:
+            True if the pipeline emptied in time
+        """
+        try:
+            await asyncio.wait_for(self.join(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self):
+        """Cancel the worker pools."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, stage: PipelineStage, next_stage: Optional[PipelineStage]):
+        """Take jobs from a stage queue, run the handler, pass them on."""
+        while True:
+            job = await stage.queue.get()
+            try:
+                error = await self._run_handler(stage, job)
+                if error is not None:
+                    job.error = error
+                    self._finish(job)
+                    logger.error(f"❌ Stage '{stage.name}' failed for {job.filename}: {error}")
+                    if self.on_error:
+                        await self._run_callback(self.on_error, job, error)
+                elif next_stage is not None:
+                    # Blocks while the next stage is full, slowing this one down
+                    await next_stage.put(job)
+                else:
+                    self._finish(job)
+                    if self.on_complete:
+                        await self._run_callback(self.on_complete, job)
+            finally:
+                stage.queue.task_done()
+
+    async def _run_callback(self, callback: Callable, job: ContractJob, *args):
+        """Run an on_error/on_complete callback; its errors are logged so the worker keeps running."""
+        try:
+            await _maybe_await(callback(job, *args))
+        except Exception:
+            logger.exception(f"Pipeline callback {getattr(callback, '__name__', callback)} failed for {job.filename}")
+
+    async def _run_handler(self, stage: PipelineStage, job: ContractJob) -> Optional[Exception]:
+        """Run a stage handler on a job, recording timing. Returns the error, if any."""
+        stage.busy += 1
+        started = time.monotonic()
+        try:
+            await stage.handler(job)
+            stage.processed += 1
+            return None
+        except Exception as e:
+            stage.failed += 1
+            return e
+        finally:
+            elapsed = time.monotonic() - started
+            job.stage_timings[stage.name] = elapsed
+            stage.total_seconds += elapsed
+            stage.max_seconds = max(stage.max_seconds, elapsed)
+            stage.busy -= 1
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Metrics for every stage, keyed by stage name."""
+        return {stage.name: stage.metrics() for stage in self.stages}
+
+    def log_metrics(self):
+        """Log a one-line summary per stage."""
+        for name, m in self.metrics().items():
+            logger.info(
+                f"Stage {name:<9} workers={m['workers']} busy={m['busy_workers']} "
+                f"depth={m['queue_depth']} (max {m['max_queue_depth']}) "
+                f"done={m['processed']} failed={m['failed']} "
+                f"avg={m['avg_seconds']:.2f}s max={m['max_seconds']:.2f}s"
+            )
@@ -5,15 +5,31 @@ Monitors Box contracts folder and generates protected mirror contracts.
 """
 
 import asyncio
+import hashlib
+import io
 import logging
 import os
 import re
+import signal
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
-from box_contract_service import BoxContractService
 from action_item_detector import ActionItemDetector
+from action_item_store import ActionItemStore
+from checkpoint_store import CheckpointStore
+from clause_diff import render_redline, split_clauses
+from clause_library import CLAUSE_REWRITES_TOOL, ClauseLibrary, interests_fingerprint
+from contract_index import ContractFolderIndex
+from contract_pipeline import STAGES, ContractJob, ContractPipeline
+from contract_structure import ContractStructure, StructureCache
+from incremental_revision import REVISED_CLAUSES_TOOL, RevisionPlan, RevisionStore, guidance_fingerprint
+from interests_cache import InterestsCache
+from priority_scheduler import PriorityScheduler, urgency_from_instructions
+from render_pool import DOCX, TXT, RenderPool, output_formats_from_env
+from retry_queue import TRANSIENT, RetryQueue, classify_error
+from storage_backend import StorageBackend, create_storage_backend
+from work_lease import DONE as LEASE_DONE, HELD as LEASE_HELD, LeaseManager, create_lease_store
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -26,6 +42,20 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _content_sha1(content) -> str:
+    """SHA-1 of an output file's content: text (as uploaded, UTF-8), bytes or a seekable binary stream."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if isinstance(content, bytes):
+        return hashlib.sha1(content).hexdigest()
+    digest = hashlib.sha1()
+    content.seek(0)
+    for block in iter(lambda: content.read(1024 * 1024), b""):
+        digest.update(block)
+    content.seek(0)
+    return digest.hexdigest()
+
+
 class ContractProcessor:
     """Processes contracts and generates protected versions."""
     
@@ -35,6 +65,14 @@ class ContractProcessor:
     MY_INTERESTS_FOLDER = "my_interests"
     MY_INTERESTS_FILE = "MY_INTERESTS.txt"
     
+    # Output files generated for each contract
+    # Output file names per artifact, without the format extension
+    OUTPUT_FILES = {
+        'mirror': "1_mirror_contract_protecting_YOUR_interests",
+        'redline': "2_clean_redline_comparison",
+        'guide': "3_negotiation_guide",
+    }
+    
     # Contract categories
     CONTRACT_CATEGORIES = [
         "Service Contract",
@@ -48,12 +86,78 @@ class ContractProcessor:
         "Freelancer and Contractor Agreement"
     ]
     
-    def __init__(self):
-        self.box_service = BoxContractService()
+    def __init__(self, box_service=None):
+        """
+        Args:
+            box_service: Storage backend to use (defaults to the one selected by
+                         STORAGE_BACKEND; pass a recording/replaying one from
+                         service_cassette to run offline)
+        """
+        self.box_service = box_service or create_storage_backend()
         self.processed_contracts = set()  # Track processed contracts
         self.category_folder_ids = {}  # Store category folder IDs
         self.action_detector = ActionItemDetector(box_service=self.box_service)  # Action item detector
         self.checked_contracts = set()  # Track contracts checked for action items
+        # Max contracts analyzed at once during an action item scan
+        self.action_scan_concurrency = int(os.getenv("ACTION_ITEM_SCAN_CONCURRENCY", "8"))
+        self._action_scan_task: Optional[asyncio.Task] = None
+        self.action_item_store = ActionItemStore()  # Action items from the latest scan
+        # Failed contracts waiting for a retry (with backoff) or in the dead-letter list
+        self.retry_queue = RetryQueue()
+        # Contracts folder index (contract name → files), rebuilt from each listing
+        self.contract_index = ContractFolderIndex(self._is_contract_file, self._extract_contract_name)
+        # MY_INTERESTS.txt, fetched once and revalidated by version
+        self.interests_cache = InterestsCache(
+            self.box_service, self.MY_INTERESTS_FILE, on_change=self._on_interests_changed
+        )
+        self.reprocess_on_interests_change = os.getenv(
+            "REPROCESS_ON_INTERESTS_CHANGE", "false"
+        ).lower() in ("1", "true", "yes")
+        # Shared work leases for multi-worker mode (None when LEASE_BACKEND is unset)
+        lease_store = create_lease_store()
+        self.leases = LeaseManager(lease_store) if lease_store else None
+        self._lease_skip_until: Dict[str, float] = {}
+        # Finished intermediate results, so restarts resume mid-contract
+        self.checkpoints = CheckpointStore()
+        # Clause trees of extracted contracts, parsed once per file version
+        self.contract_structures = StructureCache()
+        # Last processed revision of each contract; a new version is reprocessed
+        # by clause diff against it instead of from scratch
+        self.revisions = RevisionStore()
+        self.processed_versions: Dict[str, Optional[str]] = {}  # contract key -> processed sha1
+        self.incremental_reprocessing = os.getenv(
+            "INCREMENTAL_REPROCESSING", "true"
+        ).lower() in ("1", "true", "yes")
+        # Above this share of changed text a revision is regenerated in full
+        self.incremental_max_change = float(os.getenv("INCREMENTAL_MAX_CHANGE", "0.5"))
+        # Accepted clause rewrites reused across contracts (None when CLAUSE_LIBRARY is off).
+        # Off by default: the library is filled by `python clause_library.py accept` or
+        # CLAUSE_LIBRARY_LEARN, and an empty one only adds lookups to every contract
+        self.clause_library = ClauseLibrary() if os.getenv(
+            "CLAUSE_LIBRARY", "false"
+        ).lower() in ("1", "true", "yes") else None
+        # Learning is opt-in: every learned rewrite is replayed into later contracts with a
+        # matching clause, and a processed mirror is not necessarily one the user accepted
+        self.clause_library_learn = self.clause_library is not None and os.getenv(
+            "CLAUSE_LIBRARY_LEARN", "false"
+        ).lower() in ("1", "true", "yes")
+        # Below this share of the contract covered by the library, the mirror is generated in one call
+        self.clause_library_min_coverage = float(os.getenv("CLAUSE_LIBRARY_MIN_COVERAGE", "0.5"))
+        # Output formats per artifact (OUTPUT_FORMATS_<ARTIFACT>); DOCX/PDF are rendered in a process pool
+        self.output_formats = output_formats_from_env()
+        self.render_pool = RenderPool()
+        # Set on SIGTERM/SIGINT: stop intake and drain in-flight work
+        self.shutdown_event = asyncio.Event()
+        self.shutdown_deadline = float(os.getenv("SHUTDOWN_DEADLINE", "60"))
+        # Orders new contracts by urgency, size, token cost and age
+        self.scheduler = PriorityScheduler()
+        self._feeder_task: Optional[asyncio.Task] = None
+        # Staged processing pipeline (ingest → extract → classify → generate → render → upload)
+        self.pipeline = ContractPipeline(
+            self._stage_handlers(),
+            on_complete=self._on_job_complete,
+            on_error=self._on_job_error
+        )
         
     async def initialize(self):
         """Initialize Box service and create necessary folders."""
@@ -95,38 +199,44 @@ class ContractProcessor:
         self.contracts_folder_id = contracts_folder_id
         self.protect_folder_id = protect_folder_id
         self.interests_folder_id = interests_folder_id
+        self.interests_cache.folder_id = interests_folder_id
         
     async def get_user_interests(self) -> Optional[str]:
-        """Load user interests from Box. Returns None if not found."""
+        """Load user interests (cached, revalidated by Box version). Returns None if not found."""
         try:
-            # Find MY_INTERESTS.txt in my_interests folder
-            interests_file_id = await self.box_service.find_file_in_folder(
-                self.interests_folder_id, self.MY_INTERESTS_FILE
-            )
-            
-            if interests_file_id:
-                interests_text = await self.box_service.read_file(interests_file_id)
-                logger.info("Loaded user interests from Box")
-                return interests_text
-            else:
-                logger.info(f"{self.MY_INTERESTS_FILE} not found. Will make contract fairer without user interests.")
-                return None
-                
+            return await self.interests_cache.get()
         except Exception as e:
             logger.error(f"Error loading user interests: {e}")
-            return None
+            # Serve the last known interests if Box is unreachable
+            return self.interests_cache.text
+    
+    async def _on_interests_changed(self, old_interests: Optional[str], new_interests: Optional[str]):
+        """Interests cache callback: optionally reprocess contracts with the new interests."""
+        if not self.reprocess_on_interests_change:
+            logger.info("User interests changed; existing outputs are kept (REPROCESS_ON_INTERESTS_CHANGE is off)")
+            return
+        
+        affected = len(self.processed_contracts)
+        # Every contract is generated against the general interests, so all are affected
+        if self.leases:
+            for contract_key in self.processed_contracts:
+                await self.leases.forget(contract_key)
+        self.processed_contracts.clear()
+        logger.info(f"User interests changed; {affected} contract(s) will be reprocessed")
     
     async def get_per_contract_instructions(self, contract_name: str) -> Optional[str]:
         """Get per-contract instructions if they exist."""
         try:
-            # Look for {contract_name}.instructions file
-            instructions_filename = f"{contract_name}.instructions"
-            instructions_file_id = await self.box_service.find_file_in_folder(
-                self.contracts_folder_id, instructions_filename
-            )
+            # Look up {contract_name}.instructions in the contracts folder index
+            if not self.contract_index.built:
+                await self._refresh_contract_index()
+            instructions_file = self.contract_index.instructions_file(contract_name)
             
-            if instructions_file_id:
-                instructions = await self.box_service.read_file(instructions_file_id)
+            if instructions_file:
+                instructions = self.contract_index.cached_instructions(instructions_file)
+                if instructions is None:
+                    instructions = await self.box_service.read_file(instructions_file['id'])
+                    self.contract_index.cache_instructions(instructions_file, instructions)
                 logger.info(f"Found per-contract instructions for {contract_name}")
                 return instructions
             return None
@@ -135,21 +245,49 @@ class ContractProcessor:
             logger.error(f"Error loading per-contract instructions: {e}")
             return None
     
+    async def _refresh_contract_index(self) -> List[Dict]:
+        """
+        List the contracts folder once and rebuild the index from it.
+        Contracts whose .instructions file changed are marked for reprocessing.
+        
+        Returns:
+            The folder listing
+        """
+        items = await self.box_service.list_folder_items(self.contracts_folder_id)
+        changed = self.contract_index.rebuild(items)
+        
+        for contract_name in changed:
+            for version in self.contract_index.get(contract_name).versions:
+                contract_key = f"{contract_name}_{version['id']}"
+                if contract_key in self.processed_contracts:
+                    self.processed_contracts.discard(contract_key)
+                    if self.leases:
+                        await self.leases.forget(contract_key)
+                    logger.info(f"Instructions for {contract_name} changed, will reprocess {version['name']}")
+        
+        return items
+    
     async def classify_contract(
         self,
         contract_file_id: str,
-        contract_text: str
+        contract_text: str,
+        structure: Optional[ContractStructure] = None
     ) -> str:
-        """Classify contract into one of the predefined categories using Box AI."""
+        """
+        Classify contract into one of the predefined categories using Box AI.
+        
+        Only the title, preamble and section outline are sent; they identify
+        the contract type as well as the full text does.
+        """
         
         categories_list = "\n".join([f"- {cat}" for cat in self.CONTRACT_CATEGORIES])
+        excerpt = (structure or self.contract_structures.get(contract_text)).classification_excerpt()
         
         classification_prompt = f"""Analyze this contract and classify it into ONE of the following categories:
 
 {categories_list}
 
-Contract content (first 3000 characters):
-{contract_text[:3000]}...
+The contract's preamble and section outline are provided below.
 
 IMPORTANT: 
 - Respond with ONLY the exact category name from the list above
@@ -161,7 +299,7 @@ Category:"""
         
         try:
             classification = await self.box_service.ask_ai_about_file(
-                contract_file_id, classification_prompt
+                contract_file_id, classification_prompt, contract_text=excerpt
             )
             
             # Clean up the response - extract just the category name
@@ -187,6 +325,9 @@ Category:"""
             
         except Exception as e:
             logger.error(f"Error classifying contract: {e}")
+            # Temporary failures go to the retry queue instead of a guessed category
+            if classify_error(e) == TRANSIENT:
+                raise
             # Default to first category on error
             logger.warning(f"Using default category: {self.CONTRACT_CATEGORIES[0]}")
             return self.CONTRACT_CATEGORIES[0]
@@ -212,14 +353,26 @@ Category:"""
         contract_extensions = ['.pdf', '.doc', '.docx', '.txt']
         return any(filename.lower().endswith(ext) for ext in contract_extensions)
     
-    async def process_new_contracts(self):
-        """Check for new contracts and process them."""
+    async def process_new_contracts(self, wait: bool = True):
+        """
+        Check for new contracts and feed them into the processing pipeline.
+        
+        Args:
+            wait: Wait until the submitted contracts have been processed.
+                  The monitoring loop passes False so it keeps polling while
+                  the pipeline works.
+        """
         try:
-            # List all files in contracts folder
-            items = await self.box_service.list_folder_items(self.contracts_folder_id)
+            # List all files in contracts folder (and refresh the index from it)
+            items = await self._refresh_contract_index()
             
-            contracts_to_process = []
+            # Forget lease skips that have run out (or whose file is gone)
+            now = time.time()
+            self._lease_skip_until = {
+                key: until for key, until in self._lease_skip_until.items() if until > now
+            }
             
+            queued = 0
             for item in items:
                 if item['type'] == 'file':
                     filename = item['name']
@@ -228,38 +381,120 @@ Category:"""
                     # Check if it's a contract file
                     if self._is_contract_file(filename):
                         contract_name = self._extract_contract_name(filename)
-                        contract_key = f"{contract_name}_{file_id}"
+                        job = ContractJob(file_id, filename, contract_name, version=item.get('sha1'))
                         
-                        # Check if we've already processed this contract
-                        if contract_key not in self.processed_contracts:
-                            contracts_to_process.append({
-                                'file_id': file_id,
-                                'filename': filename,
-                                'contract_name': contract_name
-                            })
+                        # A new version of a processed contract (e.g. a revised draft) is reprocessed
+                        if job.key in self.processed_contracts and job.version and \
+                                self.processed_versions.get(job.key) not in (None, job.version):
+                            self.processed_contracts.discard(job.key)
+                            if self.leases:
+                                await self.leases.forget(job.key)
+                            logger.info(f"New version of {filename} uploaded, will reprocess")
+                        
+                        # Skip processed contracts, ones already queued or in flight,
+                        # and failed ones still backing off (or dead-lettered)
+                        if job.key in self.processed_contracts:
+                            continue
+                        if job.key in self.scheduler or job.key in self.pipeline.in_flight:
+                            continue
+                        if self.retry_queue.is_blocked(job.key):
+                            continue
+                        if self._lease_skip_until.get(job.key, 0) > time.time():
+                            continue
+                        
+                        # Urgency marked in the .instructions file is a scheduling signal
+                        instructions = await self.get_per_contract_instructions(contract_name)
+                        await self.scheduler.add(
+                            job,
+                            urgency=urgency_from_instructions(instructions),
+                            size_bytes=item.get('size')
+                        )
+                        queued += 1
             
-            # Process each new contract
-            for contract in contracts_to_process:
-                contract_key = f"{contract['contract_name']}_{contract['file_id']}"
-                try:
-                    await self.process_contract(
-                        contract['file_id'],
-                        contract['filename'],
-                        contract['contract_name']
-                    )
-                    # Mark as processed only on success
-                    self.processed_contracts.add(contract_key)
-                    logger.info(f"✅ Marked {contract['filename']} as processed")
-                except Exception as e:
-                    logger.error(f"❌ Failed to process {contract['filename']}: {e}")
-                    # Mark as processed even on failure to prevent infinite retries
-                    # (You can remove this line if you want to retry failed contracts)
-                    self.processed_contracts.add(contract_key)
-                    logger.warning(f"⚠️  Marked {contract['filename']} as processed (failed) to prevent retry loop")
+            if queued:
+                logger.info(f"Queued {queued} new contract(s) for processing")
+                self._start_feeder()
+            
+            if wait and queued:
+                await self.scheduler.join()
+                await self.pipeline.join()
+                self.pipeline.log_metrics()
                 
         except Exception as e:
             logger.error(f"Error checking for new contracts: {e}")
     
+    def _start_feeder(self):
+        """Start the task moving jobs from the scheduler into the pipeline."""
+        if self._feeder_task is None or self._feeder_task.done():
+            self._feeder_task = asyncio.create_task(self._feed_pipeline())
+    
+    async def _feed_pipeline(self):
+        """Submit the highest-priority queued contract whenever the pipeline has room."""
+        while True:
+            job = await self.scheduler.get()
+            
+            # In multi-worker mode, only process contracts we hold the lease on
+            if self.leases and not await self._claim_lease(job):
+                continue
+            
+            # Blocks while the ingest queue is full, so the rest stay ordered in the scheduler
+            await self.pipeline.submit(job)
+    
+    async def _claim_lease(self, job: ContractJob) -> bool:
+        """Claim the shared lease for a contract. Returns True if we may process it."""
+        try:
+            claim = await self.leases.claim(job.key, job.version)
+        except Exception as e:
+            logger.error(f"Error claiming lease on {job.filename}: {e}")
+            return False
+        
+        if claim == LEASE_DONE:
+            # Another worker already processed this version (the lease records
+            # it, so a later revised draft is claimed and processed again)
+            self._lease_skip_until.pop(job.key, None)
+            self.processed_contracts.add(job.key)
+            self.processed_versions[job.key] = job.version
+            return False
+        if claim == LEASE_HELD:
+            logger.info(f"{job.filename} is being processed by another worker")
+            # Don't queue it again until the other worker's lease could have lapsed
+            self._lease_skip_until[job.key] = time.time() + self.leases.ttl / 3
+            return False
+        self._lease_skip_until.pop(job.key, None)
+        return True
+    
+    def queue_position(self, contract_key: str) -> Optional[int]:
+        """Position of a contract in the processing queue (None if not waiting)."""
+        return self.scheduler.position(contract_key)
+    
+    async def _on_job_complete(self, job: ContractJob):
+        """Pipeline callback: contract went through every stage."""
+        # Mark as processed only on success
+        self.processed_contracts.add(job.key)
+        self.processed_versions[job.key] = job.version
+        self.retry_queue.record_success(job.key)
+        self._save_revision(job)
+        self.checkpoints.delete(job.key)
+        if self.leases:
+            await self.leases.release(job.key, done=True)
+        await self._learn_clause_rewrites(job)
+        total = time.monotonic() - job.created_at
+        logger.info(f"✅ Marked {job.filename} as processed ({total:.1f}s in pipeline)")
+    
+    async def _on_job_error(self, job: ContractJob, error: Exception):
+        """Pipeline callback: a stage raised for this contract."""
+        if self.leases:
+            # Free the contract for other workers (or our own retry)
+            await self.leases.release(job.key, done=False)
+        logger.error(f"❌ Failed to process {job.filename}: {error}")
+        # The retry queue decides when (or whether) the contract is tried again;
+        # until then process_new_contracts skips it
+        self.retry_queue.record_failure(job.key, {
+            'file_id': job.file_id,
+            'filename': job.filename,
+            'contract_name': job.contract_name,
+        }, error)
+    
     async def check_all_contracts_for_action_items(self):
         """Check all contracts in contracts folder for action items."""
         try:
@@ -277,47 +512,80 @@ Category:"""
                             "arn:aws:sns:us-east-1:440588070262:contract-action-items"
                         )
             
-            # List all files in contracts folder
-            items = await self.box_service.list_folder_items(self.contracts_folder_id)
+            # List all files in contracts folder (and refresh the index from it)
+            items = await self._refresh_contract_index()
+            contract_items = [
+                item for item in items
+                if item['type'] == 'file' and self._is_contract_file(item['name'])
+            ]
             
-            all_action_items = []
+            # Fan out over contracts with bounded concurrency. The text cache is
+            # shared for this scan so each contract is extracted from Box once.
+            semaphore = asyncio.Semaphore(self.action_scan_concurrency)
+            text_cache: Dict[str, str] = {}
+            latencies: List[float] = []
+            failures = 0
+            completed = 0
+            scan_started = time.monotonic()
             
-            for item in items:
-                if item['type'] == 'file':
-                    filename = item['name']
-                    file_id = item['id']
+            async def scan_contract(item: Dict) -> List[Dict]:
+                nonlocal failures, completed
+                filename = item['name']
+                file_id = item['id']
+                async with semaphore:
+                    started = time.monotonic()
+                    try:
+                        if file_id not in text_cache:
+                            text_cache[file_id] = await self.box_service.read_file(file_id)
+                        structure = self.contract_structures.get(
+                            text_cache[file_id], f"{file_id}:{item.get('sha1')}" if item.get('sha1') else None
+                        )
+                        
+                        # Analyze for action items
+                        action_items = await self.action_detector.analyze_contract_for_action_items(
+                            self.box_service,
+                            file_id,
+                            filename,
+                            text_cache[file_id],
+                            structure=structure
+                        )
+                        
+                        if action_items:
+                            logger.info(f"Found {len(action_items)} action item(s) in {filename}")
+                        else:
+                            logger.debug(f"No action items found in {filename}")
+                        return action_items
                     
-                    # Check if it's a contract file
-                    if self._is_contract_file(filename):
-                        try:
-                            # Read contract content
-                            contract_text = await self.box_service.read_file(file_id)
-                            
-                            # Analyze for action items
-                            action_items = await self.action_detector.analyze_contract_for_action_items(
-                                self.box_service,
-                                file_id,
-                                filename,
-                                contract_text
-                            )
-                            
-                            if action_items:
-                                logger.info(f"Found {len(action_items)} action item(s) in {filename}")
-                                all_action_items.extend(action_items)
-                            else:
-                                logger.debug(f"No action items found in {filename}")
-                                
-                        except Exception as e:
-                            logger.error(f"Error checking action items for {filename}: {e}")
-                            continue
+                    except Exception as e:
+                        logger.error(f"Error checking action items for {filename}: {e}")
+                        failures += 1
+                        return []
+                    finally:
+                        latencies.append(time.monotonic() - started)
+                        completed += 1
+                        if completed % 10 == 0 or completed == len(contract_items):
+                            logger.info(f"Action item scan progress: {completed}/{len(contract_items)} contracts")
+            
+            results = await asyncio.gather(*(scan_contract(item) for item in contract_items))
+            all_action_items = [action_item for result in results for action_item in result]
+            
+            self._log_scan_summary(
+                len(contract_items), failures, len(all_action_items),
+                latencies, time.monotonic() - scan_started
+            )
+            
+            # Keep a columnar snapshot of the portfolio for window queries
+            self.action_item_store = ActionItemStore.from_items(all_action_items)
             
             # Filter for urgent items
-            urgent_items = self.action_detector.filter_urgent_action_items(all_action_items)
+            urgent_items = self.action_detector.filter_urgent_action_items(
+                all_action_items, store=self.action_item_store
+            )
             
             if urgent_items:
                 logger.info(f"Found {len(urgent_items)} urgent action item(s)")
-                # Send notification
-                self.action_detector.send_notification(urgent_items)
+                # Queue notification (deduplicated and batched into digests)
+                await self.action_detector.queue_notification(urgent_items)
             else:
                 logger.info("No urgent action items found")
             
@@ -327,6 +595,28 @@ Category:"""
             logger.error(f"Error checking contracts for action items: {e}")
             return []
     
+    def _log_scan_summary(
+        self,
+        contract_count: int,
+        failures: int,
+        action_item_count: int,
+        latencies: List[float],
+        elapsed: float
+    ):
+        """Log a progress/latency summary for an action item scan."""
+        if latencies:
+            ordered = sorted(latencies)
+            p50 = ordered[len(ordered) // 2]
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            latency_info = f"p50 {p50:.1f}s, p95 {p95:.1f}s, max {ordered[-1]:.1f}s"
+        else:
+            latency_info = "no contracts scanned"
+        logger.info(
+            f"Action item scan finished in {elapsed:.1f}s: {contract_count} contract(s), "
+            f"{failures} failed, {action_item_count} action item(s) "
+            f"(concurrency {self.action_scan_concurrency}; {latency_info})"
+        )
+    
     async def process_contract(
         self,
         contract_file_id: str,
@@ -334,54 +624,409 @@ Category:"""
         contract_name: str
     ):
         """Process a single contract and generate protected version."""
-        logger.info(f"Processing contract: {contract_filename}")
-        
+        job = ContractJob(contract_file_id, contract_filename, contract_name)
         try:
-            # Read contract content
-            contract_text = await self.box_service.read_file(contract_file_id)
+            # Run the pipeline stages inline for this one contract
+            for stage_name, handler in self._stage_handlers():
+                await handler(job)
             
-            # Classify the contract
-            contract_category = await self.classify_contract(
-                contract_file_id, contract_text
+        except Exception as e:
+            logger.error(f"Error processing contract {contract_filename}: {e}")
+            raise
+    
+    def _stage_handlers(self) -> List[Tuple[str, Callable[[ContractJob], Awaitable[None]]]]:
+        """Pipeline stage handlers in processing order."""
+        handlers = {
+            "ingest": self._stage_ingest,
+            "extract": self._stage_extract,
+            "classify": self._stage_classify,
+            "generate": self._stage_generate,
+            "render": self._stage_render,
+            "upload": self._stage_upload,
+        }
+        return [(name, handlers[name]) for name in STAGES]
+    
+    async def _stage_ingest(self, job: ContractJob):
+        """Ingest: load the guidance that applies to this contract."""
+        logger.info(f"Processing contract: {job.filename}")
+        
+        # Resume from steps finished before a restart
+        job.checkpoint = self.checkpoints.load(job.key, job.version)
+        if job.checkpoint:
+            logger.info(f"Resuming {job.filename} from checkpoint ({', '.join(sorted(job.checkpoint.get('artifacts', {}))) or 'classified'})")
+            # Checkpointed placeholder content stays marked as such
+            job.fallback_artifacts = set(job.checkpoint.get('fallback_artifacts', []))
+        
+        # Get user interests
+        job.user_interests = await self.get_user_interests()
+        
+        # Get per-contract instructions if they exist
+        job.per_contract_instructions = await self.get_per_contract_instructions(
+            job.contract_name
+        )
+        
+        # A previously processed version lets a revised draft be reprocessed incrementally
+        if self.incremental_reprocessing and job.version:
+            revision = self.revisions.load(job.key)
+            if revision.get('version') and revision['version'] != job.version:
+                job.previous_revision = revision
+    
+    async def _stage_extract(self, job: ContractJob):
+        """Extract: read the contract text once for all later stages."""
+        job.contract_text = await self.box_service.read_file(job.file_id)
+        job.structure = self.contract_structures.get(
+            job.contract_text, f"{job.file_id}:{job.version}" if job.version else None
+        )
+    
+    async def _stage_classify(self, job: ContractJob):
+        """Classify: pick the category and find/create the mirror folder."""
+        if job.checkpoint.get('mirror_folder_id'):
+            job.contract_category = job.checkpoint['contract_category']
+            job.mirror_folder_id = job.checkpoint['mirror_folder_id']
+            return
+        if job.previous_revision and job.previous_revision.get('mirror_folder_id'):
+            # A revised draft keeps the category and folder of the version before it
+            job.contract_category = job.previous_revision['contract_category']
+            job.mirror_folder_id = job.previous_revision['mirror_folder_id']
+            self._save_checkpoint(
+                job,
+                contract_category=job.contract_category,
+                mirror_folder_id=job.mirror_folder_id
             )
-            logger.info(f"Contract classified as: {contract_category}")
-            
-            # Get user interests
-            user_interests = await self.get_user_interests()
-            
-            # Get per-contract instructions if they exist
-            per_contract_instructions = await self.get_per_contract_instructions(
-                contract_name
+            return
+        
+        job.contract_category = await self.classify_contract(
+            job.file_id, job.contract_text, job.structure
+        )
+        logger.info(f"Contract classified as: {job.contract_category}")
+        
+        # Get the category folder ID
+        category_folder_id = self.category_folder_ids.get(job.contract_category)
+        if not category_folder_id:
+            logger.warning(f"Category folder not found for {job.contract_category}, using default")
+            category_folder_id = list(self.category_folder_ids.values())[0]
+        
+        # Create mirror folder inside the category folder
+        mirror_folder_name = f"{job.contract_name}_mirror"
+        job.mirror_folder_id = await self.box_service.find_or_create_folder(
+            category_folder_id, mirror_folder_name
+        )
+        self._save_checkpoint(
+            job,
+            contract_category=job.contract_category,
+            mirror_folder_id=job.mirror_folder_id
+        )
+    
+    async def _stage_generate(self, job: ContractJob):
+        """Generate: produce the 3 output documents with AWS Bedrock."""
+        def checkpoint_artifact(name: str, content: str):
+            artifacts = dict(job.checkpoint.get('artifacts', {}), **{name: content})
+            self._save_checkpoint(job, artifacts=artifacts, fallback_artifacts=sorted(job.fallback_artifacts))
+        
+        if job.previous_revision and not job.checkpoint.get('artifacts'):
+            artifacts = await self._generate_incremental_revision(job)
+            if artifacts is not None:
+                for name, content in artifacts.items():
+                    checkpoint_artifact(name, content)
+                job.artifacts = artifacts
+                return
+        
+        job.artifacts = await self._generate_protected_contract(
+            job.file_id,
+            job.contract_text,
+            job.user_interests,
+            job.per_contract_instructions,
+            job.contract_category,
+            structure=job.structure,
+            completed=job.checkpoint.get('artifacts'),
+            completed_fallbacks=job.fallback_artifacts,
+            on_artifact=checkpoint_artifact,
+            on_fallback=job.fallback_artifacts.add
+        )
+    
+    async def _stage_render(self, job: ContractJob):
+        """Render: turn the generated artifacts into files in the configured formats."""
+        already_uploaded = set(job.checkpoint.get('uploaded', []))
+        files = [
+            (name, content, file_format)
+            for name, content in job.artifacts.items()
+            for file_format in self.output_formats.get(name, [TXT])
+            if f"{self.OUTPUT_FILES[name]}.{file_format}" not in already_uploaded
+        ]
+        
+        # The redline DOCX is written with tracked changes from the original
+        # and the mirror, unless either is placeholder content
+        tracked_redline = not job.fallback_artifacts & {'mirror', 'redline'} and 'mirror' in job.artifacts
+        
+        async def render(name: str, content: str, file_format: str):
+            if file_format == TXT:
+                return content
+            if name == 'redline' and file_format == DOCX and tracked_redline:
+                return await self.render_pool.render_redline(job.contract_text, job.artifacts['mirror'])
+            return await self.render_pool.render(content, file_format)
+        
+        rendered = await asyncio.gather(*(render(name, content, file_format) for name, content, file_format in files))
+        job.outputs = {
+            f"{self.OUTPUT_FILES[name]}.{file_format}": data for (name, _, file_format), data in zip(files, rendered)
+        }
+    
+    async def _stage_upload(self, job: ContractJob):
+        """Upload: store the rendered files in the mirror folder."""
+        if self.leases and self.leases.lost(job.key):
+            # Another worker reclaimed the contract; let it upload
+            raise RuntimeError(f"Lease on {job.filename} was lost before upload")
+        def checkpoint_upload(filename: str):
+            uploaded = job.checkpoint.get('uploaded', []) + [filename]
+            self._save_checkpoint(job, uploaded=uploaded)
+        
+        try:
+            await self._upload_output_files(
+                job.mirror_folder_id,
+                job.contract_name,
+                job.outputs,
+                already_uploaded=set(job.checkpoint.get('uploaded', [])),
+                on_uploaded=checkpoint_upload
             )
-            
-            # Get the category folder ID
-            category_folder_id = self.category_folder_ids.get(contract_category)
-            if not category_folder_id:
-                logger.warning(f"Category folder not found for {contract_category}, using default")
-                category_folder_id = list(self.category_folder_ids.values())[0]
-            
-            # Create mirror folder inside the category folder
-            mirror_folder_name = f"{contract_name}_mirror"
-            mirror_folder_id = await self.box_service.find_or_create_folder(
-                category_folder_id, mirror_folder_name
+        finally:
+            # Rendered files are spooled temporary files
+            for content in job.outputs.values():
+                if hasattr(content, 'close'):
+                    content.close()
+        logger.info(f"✅ Successfully processed: {job.filename} → {job.contract_category}")
+    
+    def _save_revision(self, job: ContractJob):
+        """Keep the processed version and its outputs for incremental reprocessing of later drafts."""
+        if not self.incremental_reprocessing or not job.version:
+            return
+        if job.fallback_artifacts & {'mirror', 'guide'} or not {'mirror', 'guide'} <= set(job.artifacts):
+            # Placeholder content is no base for a revision
+            self.revisions.delete(job.key)
+            return
+        try:
+            self.revisions.save(job.key, {
+                'version': job.version,
+                'contract_text': job.contract_text,
+                'contract_category': job.contract_category,
+                'mirror_folder_id': job.mirror_folder_id,
+                'guidance': guidance_fingerprint(
+                    job.contract_category, job.user_interests, job.per_contract_instructions
+                ),
+                'artifacts': {name: job.artifacts[name] for name in ('mirror', 'guide')},
+            })
+        except Exception as e:
+            logger.error(f"Error saving processed revision of {job.filename}: {e}")
+    
+    async def _learn_clause_rewrites(self, job: ContractJob):
+        """
+        Add the clause rewrites of a processed contract's mirror to the clause
+        library (only with CLAUSE_LIBRARY_LEARN on). Only mirrors written by
+        the model are learned; placeholder content never is.
+        """
+        if not self.clause_library_learn or 'mirror' in job.fallback_artifacts or 'mirror' not in job.artifacts:
+            return
+        try:
+            stored = await asyncio.to_thread(
+                self.clause_library.learn,
+                job.contract_text,
+                job.artifacts['mirror'],
+                job.contract_category,
+                interests_fingerprint(job.user_interests, job.per_contract_instructions),
+                job.structure
             )
-            
-            # Generate the 3 output files using Box AI
-            await self._generate_protected_contract(
-                contract_file_id,
-                contract_text,
-                user_interests,
-                per_contract_instructions,
-                mirror_folder_id,
-                contract_name,
-                contract_category
+            logger.debug(f"Stored {stored} clause rewrite(s) from {job.filename} in the clause library")
+        except Exception as e:
+            logger.error(f"Error adding {job.filename} to the clause library: {e}")
+    
+    async def _generate_mirror_from_library(
+        self,
+        contract_file_id: str,
+        contract_text: str,
+        prompt: str,
+        structure: ContractStructure,
+        contract_category: str,
+        interests: str
+    ) -> Optional[str]:
+        """
+        Assemble the mirror contract from clause library rewrites, asking
+        Bedrock to rewrite only the clauses the library has no match for.
+        
+        Returns:
+            The mirror contract, or None when the library covers too little of
+            the contract or the model response is incomplete (the contract is
+            then rewritten in one call)
+        """
+        clauses = split_clauses(contract_text, structure)
+        matches = await asyncio.to_thread(
+            self.clause_library.lookup_all, clauses, contract_category, interests, self.clause_library_min_coverage
+        )
+        total = sum(len(clause.text) for clause in clauses)
+        coverage = sum(len(clauses[index].text) for index in matches) / max(total, 1)
+        if not matches:
+            return None
+        
+        novel = [clause for clause in clauses if clause.index not in matches]
+        logger.info(
+            f"Clause library matched {len(matches)}/{len(clauses)} clause(s) ({coverage:.0%} of the text), "
+            f"rewriting {len(novel)} novel clause(s)"
+        )
+        rewritten: Dict[int, str] = {}
+        added: Dict[Optional[int], List[str]] = {}  # clauses the model added, by the novel clause before them
+        if novel:
+            library_prompt = f"""{prompt}
+
+The other clauses of this contract are already rewritten. Rewrite ONLY the clauses below.
+For each one, record with the {CLAUSE_REWRITES_TOOL['name']} tool its id (the number in brackets, e.g. 3 for [Clause 3]) and the full protected text of the clause, keeping its number and heading.
+If protecting the user's interests needs a new clause, record it directly after the clause it should follow, with id -1."""
+            excerpt = "\n\n".join(f"[Clause {clause.index}] {clause.label}\n{clause.text}" for clause in novel)
+            try:
+                response = await self.box_service.ask_ai_structured(
+                    contract_file_id, library_prompt, CLAUSE_REWRITES_TOOL, contract_text=excerpt
+                )
+            except Exception as e:
+                logger.error(f"AWS Bedrock failed for novel clauses: {e}")
+                if classify_error(e) == TRANSIENT:
+                    raise
+                return None
+            novel_ids = {clause.index for clause in novel}
+            previous = None  # novel clause the model's added clauses follow
+            for entry in response.get('clauses') or []:
+                if not isinstance(entry, dict) or not isinstance(entry.get('text'), str) or not entry['text'].strip():
+                    continue
+                try:
+                    clause_id = int(entry.get('id'))
+                except (TypeError, ValueError):
+                    clause_id = None
+                if clause_id in novel_ids and clause_id not in rewritten:
+                    rewritten[clause_id] = entry['text'].strip()
+                    previous = clause_id
+                else:
+                    # A clause the model added: keep it after the clause it followed
+                    added.setdefault(previous, []).append(entry['text'].strip())
+            missing = [clause for clause in novel if clause.index not in rewritten]
+            if missing:
+                logger.warning(f"Novel clause response is missing {len(missing)} of {len(novel)} clause(s)")
+                return None
+        
+        parts = []
+        for clause in clauses:
+            if clause.index in matches:
+                parts.append(matches[clause.index].rewrite)
+                continue
+            if clause.index == novel[0].index:
+                # Clauses added before any rewritten one go in front of the first
+                parts += added.get(None, [])
+            parts.append(rewritten[clause.index])
+            parts += added.get(clause.index, [])
+        return "\n\n".join(parts) + "\n"
+    
+    async def _generate_incremental_revision(self, job: ContractJob) -> Optional[Dict[str, str]]:
+        """
+        Reprocess a revised draft by clause diff against the previous version.
+        
+        Only added and modified clauses are sent to Bedrock; their rewrites are
+        spliced into the previous mirror contract and a section for this
+        revision is appended to the negotiation guide. The redline is rebuilt
+        locally.
+        
+        Returns:
+            The artifacts, or None when the contract has to be regenerated in
+            full (guidance changed, too much of the text changed, or the model
+            response was incomplete)
+        """
+        revision = job.previous_revision
+        guidance = guidance_fingerprint(job.contract_category, job.user_interests, job.per_contract_instructions)
+        if revision.get('guidance') != guidance:
+            logger.info(f"Interests or instructions changed since {job.filename} was processed, regenerating in full")
+            return None
+        
+        plan = await asyncio.to_thread(
+            RevisionPlan,
+            revision['contract_text'],
+            revision['artifacts']['mirror'],
+            job.contract_text,
+            job.structure
+        )
+        if plan.change_ratio > self.incremental_max_change:
+            logger.info(
+                f"{plan.change_ratio:.0%} of {job.filename} changed since the last version, regenerating in full"
             )
-            
-            logger.info(f"✅ Successfully processed: {contract_filename} → {contract_category}")
-            
+            return None
+        
+        counts = plan.counts
+        logger.info(
+            f"Revised draft of {job.filename}: {counts['modified']} modified, {counts['added']} added, "
+            f"{counts['deleted']} deleted clause(s); rewriting {len(plan.pending)} clause(s)"
+        )
+        
+        rewritten = {}
+        if plan.pending:
+            prompt = self._build_revision_prompt(
+                job.user_interests, job.per_contract_instructions, job.contract_category
+            )
+            try:
+                response = await self.box_service.ask_ai_structured(
+                    job.file_id, prompt, REVISED_CLAUSES_TOOL, contract_text=plan.excerpt()
+                )
+            except Exception as e:
+                logger.error(f"AWS Bedrock failed for revised clauses of {job.filename}: {e}")
+                if classify_error(e) == TRANSIENT:
+                    raise
+                return None
+            rewritten = plan.parse_response(response)
+            if rewritten is None:
+                return None
+        
+        mirror = plan.splice_mirror(rewritten)
+        guide = plan.update_guide(revision['artifacts']['guide'], rewritten)
+        redline = await asyncio.to_thread(
+            render_redline, job.contract_text, mirror, job.contract_category, job.structure
+        )
+        return {'mirror': mirror, 'guide': guide, 'redline': redline}
+    
+    def _build_revision_prompt(
+        self,
+        user_interests: Optional[str],
+        per_contract_instructions: Optional[str],
+        contract_category: str
+    ) -> str:
+        """Build the prompt for rewriting the changed clauses of a revised draft."""
+        prompt = f"""You are a contract analysis expert. The counterparty sent a revised draft of a {contract_category} you already rewrote to protect the user's interests.
+
+Only the clauses below are new or changed in the revised draft. Each shows the previous draft and your previous rewrite (when there was one) for reference.
+"""
+        if user_interests:
+            prompt += f"""
+USER'S GENERAL INTERESTS:
+{user_interests}
+"""
+        if per_contract_instructions:
+            prompt += f"""
+SPECIFIC INSTRUCTIONS FOR THIS CONTRACT:
+{per_contract_instructions}
+
+NOTE: Per-contract instructions take priority over general interests.
+"""
+        if not user_interests and not per_contract_instructions:
+            prompt += """
+Make each clause fairer and more balanced without changing core business terms (pricing, deliverables, key obligations).
+"""
+        prompt += f"""
+TASK:
+For every clause, record with the {REVISED_CLAUSES_TOOL['name']} tool:
+- id: the clause number in brackets, e.g. 3 for [Clause 3]
+- text: the protected rewrite of the REVISED DRAFT clause, keeping its number and heading, consistent with your previous rewrite
+- guide_note: 2-4 sentences for the negotiation guide on what the counterparty changed and how to respond
+"""
+        return prompt
+    
+    def _save_checkpoint(self, job: ContractJob, **updates):
+        """Record finished intermediate results for a job."""
+        job.checkpoint.update(updates)
+        job.checkpoint['version'] = job.version
+        try:
+            self.checkpoints.save(job.key, job.checkpoint)
         except Exception as e:
-            logger.error(f"Error processing contract {contract_filename}: {e}")
-            raise
+            logger.error(f"Error saving checkpoint for {job.filename}: {e}")
     
     async def _generate_protected_contract(
         self,
@@ -389,15 +1034,26 @@ Category:"""
         contract_text: str,
         user_interests: Optional[str],
         per_contract_instructions: Optional[str],
-        mirror_folder_id: str,
-        contract_name: str,
-        contract_category: str
-    ):
-        """Use Box AI to generate the 3 protected contract files."""
+        contract_category: str,
+        structure: Optional[ContractStructure] = None,
+        completed: Optional[Dict[str, str]] = None,
+        completed_fallbacks: Optional[Set[str]] = None,
+        on_artifact: Optional[Callable[[str, str], None]] = None,
+        on_fallback: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, str]:
+        """
+        Use AWS Bedrock to generate the 3 protected contract files.
+        
+        Artifacts in `completed` (e.g. from a checkpoint) are reused, those in
+        `completed_fallbacks` as placeholder content; on_artifact is called as
+        each remaining one finishes, on_fallback for each one replaced by
+        placeholder content.
+        """
         
         # Build the prompt for Box AI
+        structure = structure or self.contract_structures.get(contract_text)
         prompt = self._build_analysis_prompt(
-            contract_text,
+            structure,
             user_interests,
             per_contract_instructions,
             contract_category
@@ -412,34 +1068,37 @@ Category:"""
 Generate the complete rewritten contract (File 1) that protects the user's interests while keeping non-negotiables intact. 
 Output the full contract text in a clear, professional format suitable for a .docx file."""
         
-        try:
-            mirror_contract = await self.box_service.ask_ai_about_file(
-                contract_file_id, mirror_prompt
-            )
-        except Exception as e:
-            logger.error(f"AWS Bedrock failed for mirror contract: {e}")
-            logger.warning("Generating fallback content...")
-            mirror_contract = self._generate_fallback_mirror_contract(
-                contract_text, contract_category, user_interests
-            )
-        
-        # File 2: Redline comparison
-        redline_prompt = f"""{prompt}
-
-Create a detailed redline comparison (File 2) showing:
-- Original text (marked for deletion)
-- New text (marked for addition)
-- Side-by-side comparison format
-Format this as a clean PDF-ready comparison document."""
+        mirror_fell_back = 'mirror' in (completed_fallbacks or set())
         
-        try:
-            redline_comparison = await self.box_service.ask_ai_about_file(
-                contract_file_id, redline_prompt
-            )
-        except Exception as e:
-            logger.error(f"AWS Bedrock failed for redline comparison: {e}")
-            logger.warning("Generating fallback content...")
-            redline_comparison = self._generate_fallback_redline(contract_text, contract_category)
+        async def generate_mirror() -> str:
+            nonlocal mirror_fell_back
+            try:
+                # Recurring clauses come from the library; only novel ones cost tokens
+                if self.clause_library:
+                    mirror = await self._generate_mirror_from_library(
+                        contract_file_id,
+                        contract_text,
+                        prompt,
+                        structure,
+                        contract_category,
+                        interests_fingerprint(user_interests, per_contract_instructions)
+                    )
+                    if mirror is not None:
+                        return mirror
+                return await self.box_service.ask_ai_about_file(
+                    contract_file_id, mirror_prompt, contract_text=contract_text
+                )
+            except Exception as e:
+                logger.error(f"AWS Bedrock failed for mirror contract: {e}")
+                if classify_error(e) == TRANSIENT:
+                    raise
+                logger.warning("Generating fallback content...")
+                mirror_fell_back = True
+                if on_fallback:
+                    on_fallback('mirror')
+                return self._generate_fallback_mirror_contract(
+                    contract_text, contract_category, user_interests
+                )
         
         # File 3: Negotiation guide
         negotiation_prompt = f"""{prompt}
@@ -453,34 +1112,69 @@ Create a comprehensive negotiation guide (File 3) that includes:
 6. Recommended negotiation order
 Format this as a clear, actionable guide."""
         
-        try:
-            negotiation_guide = await self.box_service.ask_ai_about_file(
-                contract_file_id, negotiation_prompt
-            )
-        except Exception as e:
-            logger.error(f"AWS Bedrock failed for negotiation guide: {e}")
-            logger.warning("Generating fallback content...")
-            negotiation_guide = self._generate_fallback_negotiation_guide(
-                contract_text, contract_category, user_interests
-            )
+        async def generate_guide() -> str:
+            try:
+                return await self.box_service.ask_ai_about_file(
+                    contract_file_id, negotiation_prompt, contract_text=contract_text
+                )
+            except Exception as e:
+                logger.error(f"AWS Bedrock failed for negotiation guide: {e}")
+                if classify_error(e) == TRANSIENT:
+                    raise
+                logger.warning("Generating fallback content...")
+                if on_fallback:
+                    on_fallback('guide')
+                return self._generate_fallback_negotiation_guide(
+                    contract_text, contract_category, user_interests
+                )
         
-        # Upload the 3 files to Box
-        await self._upload_output_files(
-            mirror_folder_id,
-            contract_name,
-            mirror_contract,
-            redline_comparison,
-            negotiation_guide
-        )
+        generators = {
+            'mirror': generate_mirror,
+            'guide': generate_guide,
+        }
+        artifacts = dict(completed or {})
+        
+        def finish(name: str, content: str):
+            artifacts[name] = content
+            if on_artifact:
+                on_artifact(name, content)
+        
+        async def run(name: str):
+            finish(name, await generators[name]())
+        
+        # The generations are independent, so run the missing ones concurrently.
+        # A transient failure (e.g. throttling) fails the job so the retry queue
+        # can try again later instead of uploading placeholder content.
+        await asyncio.gather(*(run(name) for name in generators if name not in artifacts))
+        
+        # File 2: Redline comparison, computed locally by diffing the original
+        # against the mirror contract (no model call)
+        if 'redline' not in artifacts:
+            if mirror_fell_back:
+                if on_fallback:
+                    on_fallback('redline')
+                redline = self._generate_fallback_redline(contract_text, contract_category)
+            else:
+                redline = await asyncio.to_thread(
+                    render_redline, contract_text, artifacts['mirror'], contract_category, structure
+                )
+            finish('redline', redline)
+        
+        return artifacts
     
     def _build_analysis_prompt(
         self,
-        contract_text: str,
+        structure: ContractStructure,
         user_interests: Optional[str],
         per_contract_instructions: Optional[str],
         contract_category: str
     ) -> str:
-        """Build the prompt for Box AI analysis."""
+        """
+        Build the prompt for Box AI analysis.
+        
+        The full contract text is attached to every request, so the prompt
+        only carries the contract's section outline.
+        """
         
         # Check if we have any user guidance
         has_user_guidance = user_interests is not None or per_contract_instructions is not None
@@ -491,8 +1185,8 @@ Format this as a clear, actionable guide."""
 
 CONTRACT TYPE: {contract_category}
 
-CONTRACT TO ANALYZE:
-{contract_text[:5000]}... (full contract provided in file)
+CONTRACT STRUCTURE (full contract provided below):
+{structure.outline()}
 """
             
             if user_interests:
@@ -533,8 +1227,8 @@ GUIDELINES:
 
 CONTRACT TYPE: {contract_category}
 
-CONTRACT TO ANALYZE:
-{contract_text[:5000]}... (full contract provided in file)
+CONTRACT STRUCTURE (full contract provided below):
+{structure.outline()}
 
 TASK:
 1. Identify terms that are one-sided, unfair, or could be improved for balance
@@ -644,34 +1338,108 @@ This document will be replaced with AI-generated content once Box AI permissions
         self,
         mirror_folder_id: str,
         contract_name: str,
-        mirror_contract: str,
-        redline_comparison: str,
-        negotiation_guide: str
+        outputs: Dict[str, object],
+        already_uploaded: Optional[set] = None,
+        on_uploaded: Optional[Callable[[str], None]] = None
     ):
-        """Upload the 3 output files to Box as plain text files."""
+        """
+        Upload the rendered output files to Box (text as plain text files,
+        rendered documents streamed from their spooled files). Outputs already
+        in the mirror folder are compared by SHA-1: identical ones are not
+        uploaded again, changed ones are uploaded as a new version of the
+        existing file.
+        """
+        pending = {
+            filename: content for filename, content in outputs.items()
+            if not already_uploaded or filename not in already_uploaded
+        }
+        existing = await self._existing_output_files(mirror_folder_id) if pending else {}
         
-        # File 1: Mirror contract (TXT)
-        await self.box_service.upload_text_file(
-            mirror_folder_id,
-            f"1_mirror_contract_protecting_YOUR_interests.txt",
-            mirror_contract
-        )
+        uploaded = skipped = versioned = 0
+        for filename, content in pending.items():
+            item = existing.get(filename)
+            if item and item.get('sha1') and item['sha1'] == await asyncio.to_thread(_content_sha1, content):
+                skipped += 1
+            elif item:
+                stream = content if hasattr(content, 'read') else io.BytesIO(
+                    content if isinstance(content, bytes) else content.encode('utf-8')
+                )
+                await self.box_service.upload_new_version(item['id'], filename, stream)
+                versioned += 1
+                uploaded += 1
+            elif isinstance(content, bytes):
+                await self.box_service.upload_file(mirror_folder_id, filename, content)
+                uploaded += 1
+            elif hasattr(content, 'read'):
+                await self.box_service.upload_stream(mirror_folder_id, filename, content)
+                uploaded += 1
+            else:
+                await self.box_service.upload_text_file(mirror_folder_id, filename, content)
+                uploaded += 1
+            if on_uploaded:
+                on_uploaded(filename)
         
-        # File 2: Redline comparison (TXT)
-        await self.box_service.upload_text_file(
-            mirror_folder_id,
-            f"2_clean_redline_comparison.txt",
-            redline_comparison
+        logger.info(
+            f"Uploaded {uploaded} output files for {contract_name} "
+            f"({versioned} as new versions, {skipped} unchanged not uploaded)"
         )
+    
+    async def _existing_output_files(self, mirror_folder_id: str) -> Dict[str, Dict]:
+        """Files already in the mirror folder, by name; empty if it cannot be listed."""
+        try:
+            items = await self.box_service.list_folder_items(mirror_folder_id)
+        except Exception as e:
+            logger.warning(f"Could not list mirror folder {mirror_folder_id}, uploading all outputs: {e}")
+            return {}
+        return {item['name']: item for item in items if item.get('type') == 'file'}
+    
+    def install_signal_handlers(self):
+        """Turn SIGTERM/SIGINT into a graceful shutdown request."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_shutdown, sig.name)
+            except (NotImplementedError, RuntimeError):
+                # Not supported on this platform/thread; fall back to KeyboardInterrupt
+                pass
+    
+    def request_shutdown(self, reason: str = "request"):
+        """Ask the processor to stop taking new work and shut down."""
+        if not self.shutdown_event.is_set():
+            logger.info(f"Shutdown requested ({reason}); no new contracts will be started")
+            self.shutdown_event.set()
+    
+    async def shutdown(self):
+        """
+        Stop intake, let in-flight contracts finish until the deadline, then
+        cancel what is left. Finished steps are already checkpointed, so
+        cancelled contracts resume from there on the next start.
+        """
+        # Stop intake: nothing more moves from the scheduler into the pipeline
+        if self._feeder_task:
+            self._feeder_task.cancel()
+        if self._action_scan_task and not self._action_scan_task.done():
+            self._action_scan_task.cancel()
         
-        # File 3: Negotiation guide (TXT)
-        await self.box_service.upload_text_file(
-            mirror_folder_id,
-            f"3_negotiation_guide.txt",
-            negotiation_guide
-        )
+        in_flight = len(self.pipeline.in_flight)
+        if in_flight:
+            logger.info(f"Waiting up to {self.shutdown_deadline:.0f}s for {in_flight} in-flight contract(s)")
+            if not await self.pipeline.drain(self.shutdown_deadline):
+                logger.warning(
+                    f"Deadline reached with {len(self.pipeline.in_flight)} contract(s) unfinished; "
+                    "they will resume from their checkpoints"
+                )
         
-        logger.info(f"Uploaded 3 plain text output files for {contract_name}")
+        await self.pipeline.stop()
+        if self.leases:
+            await self.leases.release_all()
+        self.render_pool.shutdown()
+        if isinstance(self.box_service, StorageBackend):
+            # Test doubles and replayed services hold no local resources
+            self.box_service.close()
+        self.pipeline.log_metrics()
+        self.render_pool.log_metrics()
+        logger.info("Shutdown complete")
     
     async def run_continuous_monitoring(self, check_interval: int = 60, action_item_check_interval: int = 3600):
         """Continuously monitor for new contracts and check for action items."""
@@ -682,26 +1450,62 @@ This document will be replaced with AI-generated content once Box AI permissions
         iteration_count = 0
         iterations_per_action_check = action_item_check_interval // check_interval
         
-        while True:
+        while not self.shutdown_event.is_set():
             try:
                 iteration_count += 1
                 
-                # Check for new contracts
-                await self.process_new_contracts()
+                # Revalidate interests on their slow interval (may queue reprocessing)
+                await self.get_user_interests()
                 
-                # Check for action items periodically
+                # Check for new contracts (the pipeline processes them in the background)
+                await self.process_new_contracts(wait=False)
+                
+                # Check for action items periodically, in the background so a
+                # long scan does not hold up new-contract processing
                 if iteration_count >= iterations_per_action_check:
-                    await self.check_all_contracts_for_action_items()
+                    self.pipeline.log_metrics()
+                    if self._action_scan_task and not self._action_scan_task.done():
+                        logger.info("Previous action item scan still running, skipping this one")
+                    else:
+                        self._action_scan_task = asyncio.create_task(
+                            self.check_all_contracts_for_action_items()
+                        )
                     iteration_count = 0
                     last_action_item_check = time.time()
                 
-                await asyncio.sleep(check_interval)
+                await self._wait_for_next_check(check_interval)
             except KeyboardInterrupt:
                 logger.info("Stopped by user")
                 break
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {e}")
-                await asyncio.sleep(check_interval)
+                await self._sleep_unless_shutdown(check_interval)
+        
+        await self.shutdown()
+    
+    async def _wait_for_next_check(self, seconds: float):
+        """
+        Wait for the next contracts check. Backends with a change feed wake
+        us as soon as the contracts folder changes; shutdown wakes us too.
+        """
+        change = asyncio.create_task(
+            self.box_service.wait_for_changes(self.contracts_folder_id, seconds)
+        )
+        shutdown = asyncio.create_task(self.shutdown_event.wait())
+        done, pending = await asyncio.wait(
+            {change, shutdown}, timeout=seconds, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+        if change in done and not change.cancelled() and change.exception():
+            logger.warning(f"Change feed error, falling back to polling: {change.exception()}")
+    
+    async def _sleep_unless_shutdown(self, seconds: float):
+        """Sleep, waking early if shutdown is requested."""
+        try:
+            await asyncio.wait_for(self.shutdown_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
 
 
 async def main():
@@ -710,12 +1514,15 @@ async def main():
     
     try:
         await processor.initialize()
+        processor.install_signal_handlers()
         
-        # Process any existing contracts first
-        await processor.process_new_contracts()
+        # Queue any existing contracts first (processed in the background)
+        await processor.process_new_contracts(wait=False)
         
         # Check for action items on startup
-        await processor.check_all_contracts_for_action_items()
+        processor._action_scan_task = asyncio.create_task(
+            processor.check_all_contracts_for_action_items()
+        )
         
         # Start continuous monitoring
         # Check for new contracts every 3 seconds (for faster testing)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Contract Structure
+Parses extracted contract text once into a clause tree (preamble, articles,
+numbered sections, definitions, signature blocks) with character offsets,
+so downstream tasks can send only the clauses they need instead of slicing
+the raw text. Parsed structures are cached per file version.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Node kinds
+PREAMBLE = "preamble"
+ARTICLE = "article"
+SECTION = "section"
+HEADING = "heading"  # unnumbered heading line, e.g. "TERM OF EMPLOYMENT:"
+DEFINITIONS = "definitions"
+DEFINITION = "definition"
+SIGNATURE = "signature"
+
+# "1. TERM", "2.3) Rent", "IV. Governing Law", "Section 5: Notices", "Article 2 - Term"
+_NUMBERED_HEADING = re.compile(
+    r'^(?:(?P<keyword>section|article|clause)\s+(?P<kw_number>\d+(?:\.\d+)*|[ivxlc]+)\b[.:)\-–]?'
+    r'|(?P<sub_number>\d+(?:\.\d+)+)[.)]?'
+    r'|(?P<number>\d+|[IVXLC]+)[.)])\s*(?P<title>\S.*)?$',
+    re.IGNORECASE
+)
+# "TERM OF EMPLOYMENT:" / "GOVERNING LAW" - short all-caps heading lines
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z0-9 &/,()'\-]{2,80}:?$")
+# Markdown decoration models like to add around headings
+_DECORATION = re.compile(r'^[#*_\s]+|[*_\s]+$')
+_DEFINITIONS_TITLE = re.compile(r'\b(definitions?|interpretation)\b', re.IGNORECASE)
+_SIGNATURE_TITLE = re.compile(r'\b(signatures?|in witness whereof|execution|signed)\b', re.IGNORECASE)
+# '"Confidential Information" means ...' / '“Term” shall mean ...'
+_DEFINITION_LINE = re.compile(r'^\s*(?:\(?[a-z0-9]+[.)]\s*)?["“](?P<term>[^"”]{1,80})["”]\s+(?:shall\s+)?(?:means?|includes?|refers?)\b')
+
+# Dates and deadline language, for picking clauses relevant to action items
+_DATE = re.compile(
+    r'\b(\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{2}-\d{2}|'
+    r'(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4})\b',
+    re.IGNORECASE
+)
+_DEADLINE_LANGUAGE = re.compile(
+    r'\b(expir\w*|renew\w*|terminat\w*|notice|payments?|payable|due|audit\w*|deadline|'
+    r'commenc\w*|effective date|no later than|within \d+|\d+\s+(?:days|months))\b',
+    re.IGNORECASE
+)
+
+
+def _parse_heading(line: str) -> Optional[Tuple[str, Optional[str], str]]:
+    """Return (kind, number, title) if the line starts a clause."""
+    stripped = _DECORATION.sub('', line.strip())
+    if not stripped:
+        return None
+    match = _NUMBERED_HEADING.match(stripped)
+    if match:
+        number = (match.group('kw_number') or match.group('sub_number') or match.group('number')).rstrip('.')
+        title = _DECORATION.sub('', match.group('title') or '')
+        keyword = (match.group('keyword') or '').lower()
+        kind = ARTICLE if keyword == 'article' or (not keyword and re.fullmatch(r'[IVXLC]+', number)) else SECTION
+        return kind, number, title
+    if _CAPS_HEADING.match(stripped) and sum(c.isalpha() for c in stripped) >= 3 and len(stripped.split()) <= 10:
+        return HEADING, None, stripped.rstrip(':').strip()
+    return None
+
+
+class ContractNode:
+    """One clause in the tree. Offsets index into ContractStructure.text."""
+
+    def __init__(self, structure: "ContractStructure", kind: str, number: Optional[str], title: str, start: int, depth: int):
+        self.structure = structure
+        self.kind = kind
+        self.number = number
+        self.title = title
+        self.start = start
+        self.end = start  # end of this clause including its children
+        self.body_end = start  # end of the clause's own text (before its first child)
+        self.depth = depth
+        self.children: List["ContractNode"] = []
+
+    @property
+    def text(self) -> str:
+        """Full text of the clause, children included."""
+        return self.structure.text[self.start:self.end].strip()
+
+    @property
+    def own_text(self) -> str:
+        """Text of the clause up to its first child."""
+        return self.structure.text[self.start:self.body_end].strip()
+
+    @property
+    def label(self) -> str:
+        parts = [f"§{self.number}" if self.number else None, self.title or None]
+        return " ".join(part for part in parts if part) or self.kind
+
+    def walk(self) -> Iterable["ContractNode"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class ContractStructure:
+    """Clause tree of one contract."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.nodes: List[ContractNode] = []  # top-level nodes
+        self._parse()
+
+    def _level(self, kind: str, number: Optional[str], parents: List[ContractNode]) -> int:
+        """Nesting level of a new heading given the open parents."""
+        if kind == ARTICLE:
+            return 0
+        if kind == SIGNATURE:
+            return 0
+        if kind == SECTION:
+            # "2.1" nests under "2"; other sections under the open article, if any
+            for node in reversed(parents):
+                if node.kind == SECTION and number.startswith(f"{node.number}."):
+                    return node.depth + 1
+                if node.kind == ARTICLE:
+                    return node.depth + 1
+            return 0
+        if kind == DEFINITION:
+            for node in reversed(parents):
+                if node.kind != DEFINITION:
+                    return node.depth + 1
+            return 0
+        # Unnumbered headings nest under an open numbered section or signature block
+        for node in reversed(parents):
+            if node.kind in (SECTION, ARTICLE, SIGNATURE):
+                return node.depth + 1
+        return 0
+
+    def _parse(self):
+        headings: List[Tuple[int, str, Optional[str], str]] = []
+        offset = 0
+        in_definitions = False
+        for line in self.text.splitlines(keepends=True):
+            parsed = _parse_heading(line)
+            if parsed is not None:
+                kind, number, title = parsed
+                if _SIGNATURE_TITLE.search(title) and kind == HEADING:
+                    kind = SIGNATURE
+                in_definitions = bool(_DEFINITIONS_TITLE.search(title))
+                if in_definitions:
+                    kind = DEFINITIONS if kind == HEADING else kind
+                headings.append((offset, kind, number, title))
+            elif line.strip().lower().startswith("in witness whereof"):
+                in_definitions = False
+                headings.append((offset, SIGNATURE, None, "Signatures"))
+            elif in_definitions:
+                definition = _DEFINITION_LINE.match(line)
+                if definition:
+                    headings.append((offset, DEFINITION, None, definition.group('term')))
+            offset += len(line)
+
+        # Text before the first heading (or a leading title line) is the preamble
+        if headings and headings[0][0] == 0 and headings[0][1] == HEADING:
+            _, _, _, title = headings.pop(0)
+            headings.insert(0, (0, PREAMBLE, None, title))
+        elif not headings or headings[0][0] > 0:
+            first_line = self.text.strip().split("\n", 1)[0] if self.text.strip() else ""
+            headings.insert(0, (0, PREAMBLE, None, first_line[:80]))
+
+        parents: List[ContractNode] = []
+        flat: List[ContractNode] = []
+        for start, kind, number, title in headings:
+            level = 0 if kind == PREAMBLE else self._level(kind, number, parents)
+            while parents and parents[-1].depth >= level:
+                parents.pop()
+            node = ContractNode(self, kind, number, title, start, level)
+            (parents[-1].children if parents else self.nodes).append(node)
+            parents.append(node)
+            flat.append(node)
+
+        # Offsets: own text runs to the next heading; a clause ends where the
+        # next heading at the same or a higher level starts
+        for position, node in enumerate(flat):
+            node.body_end = flat[position + 1].start if position + 1 < len(flat) else len(self.text)
+        for position, node in enumerate(flat):
+            node.end = len(self.text)
+            for later in flat[position + 1:]:
+                if later.depth <= node.depth:
+                    node.end = later.start
+                    break
+        self._flat = [node for node in flat if node.own_text]
+
+    def clauses(self) -> List[ContractNode]:
+        """Every clause in document order (each with its own text)."""
+        return list(self._flat)
+
+    def find(self, *kinds: str) -> List[ContractNode]:
+        return [node for node in self._flat if node.kind in kinds]
+
+    def outline(self, max_depth: int = 1) -> str:
+        """Indented list of clause headings."""
+        return "\n".join(
+            f"{'  ' * node.depth}{node.label}"
+            for node in self._flat
+            if node.depth <= max_depth and node.kind != DEFINITION
+        )
+
+    def excerpt(self, nodes: Iterable[ContractNode], max_chars: Optional[int] = None) -> str:
+        """Own text of the given clauses in document order, optionally truncated."""
+        ordered = sorted(set(nodes), key=lambda node: node.start)
+        text = "\n\n".join(node.own_text for node in ordered)
+        if max_chars and len(text) > max_chars:
+            text = text[:max_chars] + "..."
+        return text
+
+    def classification_excerpt(self, max_chars: int = 3000) -> str:
+        """Title, preamble and clause outline - enough to tell the contract type."""
+        preamble = self.excerpt(self.find(PREAMBLE), max_chars // 2)
+        outline = self.outline(max_depth=1)
+        return f"{preamble}\n\nSECTIONS:\n{outline}"[:max_chars]
+
+    def deadline_clauses(self) -> List[ContractNode]:
+        """The preamble plus clauses mentioning a date or deadline language."""
+        return [
+            node for node in self._flat
+            if node.kind == PREAMBLE or _DATE.search(node.own_text) or _DEADLINE_LANGUAGE.search(node.own_text)
+        ]
+
+    def action_item_excerpt(self) -> str:
+        """Clauses that can carry action items; the full text when they are most of it."""
+        excerpt = self.excerpt(self.deadline_clauses())
+        return excerpt if len(excerpt) < 0.8 * len(self.text) else self.text
+
+
+class StructureCache:
+    """Parsed contract structures, keyed by file version (LRU)."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv("CONTRACT_STRUCTURE_CACHE_SIZE", "256"))
+        self._entries: "OrderedDict[str, ContractStructure]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str, version_key: Optional[str] = None) -> ContractStructure:
+        """
+        Parsed structure of a contract.
+
+        Args:
+            text: Extracted contract text
+            version_key: File ID and version (e.g. "123:<sha1>"); defaults to a
+                         hash of the text
+        """
+        key = version_key or hashlib.sha1(text.encode('utf-8')).hexdigest()
+        structure = self._entries.get(key)
+        if structure is not None and structure.text == text:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return structure
+        self.misses += 1
+        structure = ContractStructure(text)
+        self._entries[key] = structure
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return structure
@@ -2,15 +2,25 @@
 """
 Document Generator
 Creates properly formatted DOCX and PDF files from text content.
+
+Styles, fonts and the branded DOCX/PDF templates are built once per process
+by a DocumentRenderer (see get_renderer()) and reused for every document.
+Documents are written as a stream: text can arrive in chunks (e.g. from a
+streaming model response) and is written paragraph by paragraph into the
+output file, so memory stays flat regardless of document size.
 """
 
 import io
 import logging
-from typing import Optional
+import os
+import re
+import zipfile
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape
 
 try:
     from docx import Document
-    from docx.shared import Pt, RGBColor
+    from docx.shared import Pt, RGBColor, Inches
     from docx.enum.text import WD_ALIGN_PARAGRAPH
     DOCX_AVAILABLE = True
 except ImportError:
@@ -18,6 +28,7 @@ except ImportError:
     logging.warning("python-docx not available. DOCX files will be created as plain text.")
 
 try:
+    from reportlab.lib import colors
     from reportlab.lib.pagesizes import letter
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.units import inch
@@ -31,152 +42,389 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_BRAND = "Contract Protection System"
 
-def create_docx_from_text(content: str, title: Optional[str] = None) -> bytes:
+# Text as a whole or in chunks
+TextChunks = Union[str, Iterable[str]]
+
+DOCUMENT_PART = 'word/document.xml'
+
+# Timestamp of every DOCX package entry (the ZIP format's earliest date)
+DOCX_ENTRY_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Characters WordprocessingML cannot contain
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def iter_paragraphs(chunks: TextChunks) -> Iterator[str]:
     """
-    Create a DOCX file from text content.
-    
+    Paragraphs (separated by a blank line) of text arriving in chunks; the
+    same split as text.split('\\n\\n'), without joining the whole text first.
+    """
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    pending = ""
+    for chunk in chunks:
+        # A separator may straddle the previous chunk and this one
+        search_from = max(len(pending) - 1, 0)
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find('\n\n', max(start, search_from))
+            if end < 0:
+                break
+            yield pending[start:end]
+            start = end + 2
+        pending = pending[start:]
+    yield pending
+
+
+def _is_caps_heading(text: str) -> bool:
+    """Short all-caps paragraphs are rendered as headings."""
+    return text.isupper() and len(text) < 100
+
+
+def _pdf_markup(text: str) -> str:
+    """Paragraph markup for plain text: escaped, with its line breaks kept."""
+    return escape(text).replace('\n', '<br/>')
+
+
+def docx_run_content(text: str, text_tag: str = 'w:t') -> str:
+    """
+    WordprocessingML run content for text, with its line breaks and tabs
+    (text_tag is w:delText inside a tracked deletion).
+    """
+    content = []
+    text = _XML_ILLEGAL.sub('', text.replace('\r\n', '\n').replace('\r', '\n'))
+    for line_number, line in enumerate(text.split('\n')):
+        if line_number:
+            content.append('<w:br/>')
+        for tab_number, part in enumerate(line.split('\t')):
+            if tab_number:
+                content.append('<w:tab/>')
+            if part:
+                content.append(f'<{text_tag} xml:space="preserve">{escape(part)}</{text_tag}>')
+    return ''.join(content)
+
+
+def _docx_paragraph(text: str, style: Optional[str] = None, centered: bool = False) -> str:
+    """WordprocessingML for one paragraph, with its line breaks and tabs."""
+    properties = ""
+    if style or centered:
+        properties = "<w:pPr>{}{}</w:pPr>".format(
+            f'<w:pStyle w:val="{style}"/>' if style else "", '<w:jc w:val="center"/>' if centered else ""
+        )
+    return f"<w:p>{properties}<w:r>{docx_run_content(text)}</w:r></w:p>"
+
+
+class _FlowableFeed(list):
+    """
+    Flowable list for reportlab's build(), which consumes it from the front:
+    it refills itself from a generator as it drains, so the document is never
+    held as flowables all at once.
+    """
+
+    # Flowables kept ahead, so keep-with-next headings still see what follows
+    LOOKAHEAD = 16
+
+    def __init__(self, source: Iterator):
+        super().__init__()
+        self._source: Optional[Iterator] = source
+
+    def __len__(self) -> int:
+        while self._source is not None and list.__len__(self) < self.LOOKAHEAD:
+            flowable = next(self._source, None)
+            if flowable is None:
+                self._source = None
+            else:
+                self.append(flowable)
+        return list.__len__(self)
+
+
+class DocumentRenderer:
+    """
+    Renders text content as DOCX or PDF.
+
+    The DOCX template (fonts, margins, branded footer) and the PDF paragraph
+    styles are built on first use and reused, so keep one renderer per
+    process (get_renderer()).
+
     Args:
-        content: The text content to convert
-        title: Optional title for the document
-        
-    Returns:
-        bytes: The DOCX file as bytes
+        brand: Footer text of every document (DOCUMENT_BRAND)
     """
-    if not DOCX_AVAILABLE:
-        # Fallback: return plain text as bytes
-        logger.warning("python-docx not available, returning plain text")
-        return content.encode('utf-8')
-    
-    try:
-        # Create a new Document
-        doc = Document()
-        
+
+    def __init__(self, brand: Optional[str] = None):
+        self.brand = brand if brand is not None else os.getenv("DOCUMENT_BRAND", DEFAULT_BRAND)
+        # Template package parts, and its document.xml before and after the body content
+        self._docx_template: Optional[Tuple[List[Tuple[zipfile.ZipInfo, bytes]], bytes, bytes]] = None
+        self._pdf_styles: Optional[Dict[str, "ParagraphStyle"]] = None
+
+    def _template(self) -> Tuple[List[Tuple[zipfile.ZipInfo, bytes]], bytes, bytes]:
+        """Blank branded DOCX package: its parts and the document.xml around the body content."""
+        if self._docx_template is None:
+            doc = Document()
+            normal = doc.styles['Normal']
+            normal.font.name = 'Calibri'
+            normal.font.size = Pt(11)
+            normal.paragraph_format.space_after = Pt(6)
+            for level in (1, 2, 3):
+                doc.styles[f'Heading {level}'].font.color.rgb = RGBColor(0x1F, 0x3A, 0x5F)
+            for section in doc.sections:
+                section.left_margin = section.right_margin = Inches(1)
+                section.top_margin = section.bottom_margin = Inches(1)
+                if self.brand:
+                    footer = section.footer.paragraphs[0]
+                    footer.text = self.brand
+                    footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+            package = io.BytesIO()
+            doc.save(package)
+            with zipfile.ZipFile(package) as template:
+                parts = [(info, template.read(info)) for info in template.infolist()]
+            # Fixed entry timestamps, so the same content always gives the same
+            # file (and SHA-1) and unchanged outputs can be recognized
+            for info, _ in parts:
+                info.date_time = DOCX_ENTRY_DATE_TIME
+            document = dict((info.filename, data) for info, data in parts)[DOCUMENT_PART]
+            body = document.index(b'<w:body>') + len(b'<w:body>')
+            section_properties = document.index(b'<w:sectPr', body)
+            self._docx_template = (parts, document[:body], document[section_properties:])
+        return self._docx_template
+
+    def _styles(self) -> Dict[str, "ParagraphStyle"]:
+        """PDF paragraph styles by role."""
+        if self._pdf_styles is None:
+            sample = getSampleStyleSheet()
+            self._pdf_styles = {
+                'title': ParagraphStyle(
+                    'CustomTitle',
+                    parent=sample['Heading1'],
+                    fontSize=16,
+                    textColor=colors.black,
+                    spaceAfter=12,
+                    alignment=TA_CENTER
+                ),
+                'heading1': sample['Heading1'],
+                'heading2': sample['Heading2'],
+                'heading3': sample['Heading3'],
+                'body': sample['Normal'],
+                'footer': ParagraphStyle('Footer', parent=sample['Normal'], fontSize=8, textColor=colors.grey),
+            }
+        return self._pdf_styles
+
+    def write_docx(self, chunks: TextChunks, out: BinaryIO, title: Optional[str] = None):
+        """
+        Write text as a DOCX file. The template's parts are copied and the
+        document body is written paragraph by paragraph into the package.
+        """
+        self.write_docx_body(self._docx_paragraphs(chunks, title), out)
+
+    def write_docx_body(self, paragraphs: Iterable[str], out: BinaryIO):
+        """Write a DOCX file from the template with the given body paragraphs (WordprocessingML)."""
+        parts, document_start, document_end = self._template()
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as package:
+            for info, data in parts:
+                if info.filename != DOCUMENT_PART:
+                    package.writestr(info, data)
+                    continue
+                with package.open(info, 'w') as document:
+                    document.write(document_start)
+                    for xml in paragraphs:
+                        document.write(xml.encode('utf-8'))
+                    document.write(document_end)
+
+    def _docx_paragraphs(self, chunks: TextChunks, title: Optional[str]) -> Iterator[str]:
         # Add title if provided
         if title:
-            title_para = doc.add_heading(title, 0)
-            title_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Split content into paragraphs
-        paragraphs = content.split('\n\n')
-        
-        for para_text in paragraphs:
-            if not para_text.strip():
+            yield _docx_paragraph(title, 'Title', centered=True)
+        for para_text in iter_paragraphs(chunks):
+            para_text_stripped = para_text.strip()
+            if not para_text_stripped:
                 continue
-            
+
             # Check if it's a heading (starts with # or is all caps)
-            para_text_stripped = para_text.strip()
             if para_text_stripped.startswith('#'):
                 # Markdown-style heading
                 level = len(para_text_stripped) - len(para_text_stripped.lstrip('#'))
-                heading_text = para_text_stripped.lstrip('#').strip()
-                doc.add_heading(heading_text, level=min(level, 3))
-            elif para_text_stripped.isupper() and len(para_text_stripped) < 100:
-                # Likely a heading in all caps
-                doc.add_heading(para_text_stripped, level=2)
+                yield _docx_paragraph(para_text_stripped.lstrip('#').strip(), f'Heading{min(level, 3)}')
+            elif _is_caps_heading(para_text_stripped):
+                yield _docx_paragraph(para_text_stripped, 'Heading2')
             else:
-                # Regular paragraph
-                para = doc.add_paragraph(para_text.strip())
-                para_format = para.paragraph_format
-                para_format.space_after = Pt(6)
-        
-        # Save to bytes
-        doc_bytes = io.BytesIO()
-        doc.save(doc_bytes)
-        doc_bytes.seek(0)
-        return doc_bytes.read()
-        
+                yield _docx_paragraph(para_text_stripped)
+
+    def _draw_footer(self, canvas, doc):
+        canvas.saveState()
+        footer = self._styles()['footer']
+        canvas.setFont(footer.fontName, footer.fontSize)
+        canvas.setFillColor(footer.textColor)
+        text = f"{self.brand}  ·  Page {doc.page}" if self.brand else f"Page {doc.page}"
+        canvas.drawCentredString(doc.pagesize[0] / 2, 0.5 * inch, text)
+        canvas.restoreState()
+
+    def _flowables(self, chunks: TextChunks, title: Optional[str]) -> Iterator:
+        styles = self._styles()
+        # Add title if provided
+        if title:
+            yield Paragraph(escape(title), styles['title'])
+            yield Spacer(1, 0.2 * inch)
+
+        for para_text in iter_paragraphs(chunks):
+            if not para_text.strip():
+                yield Spacer(1, 0.1 * inch)
+                continue
+
+            para_text_stripped = para_text.strip()
+
+            # Check if it's a heading (on the plain text; the markup is escaped below)
+            if para_text_stripped.startswith('#'):
+                level = len(para_text_stripped) - len(para_text_stripped.lstrip('#'))
+                yield Paragraph(_pdf_markup(para_text_stripped.lstrip('#').strip()), styles[f'heading{min(level, 3)}'])
+            elif _is_caps_heading(para_text_stripped):
+                yield Paragraph(_pdf_markup(para_text_stripped), styles['heading2'])
+            else:
+                yield Paragraph(_pdf_markup(para_text_stripped), styles['body'])
+            yield Spacer(1, 0.1 * inch)
+
+    def write_pdf(self, chunks: TextChunks, out: BinaryIO, title: Optional[str] = None):
+        """Write text as a PDF file; paragraphs are laid out as they arrive."""
+        doc = SimpleDocTemplate(
+            out,
+            pagesize=letter,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=54,
+            invariant=True  # same content, same bytes: no creation date or random file ID
+        )
+        doc.build(
+            _FlowableFeed(self._flowables(chunks, title)),
+            onFirstPage=self._draw_footer,
+            onLaterPages=self._draw_footer
+        )
+
+    def docx(self, content: str, title: Optional[str] = None) -> bytes:
+        """Render content as a DOCX file."""
+        buffer = io.BytesIO()
+        self.write_docx(content, buffer, title)
+        return buffer.getvalue()
+
+    def pdf(self, content: str, title: Optional[str] = None) -> bytes:
+        """Render content as a PDF file."""
+        buffer = io.BytesIO()
+        self.write_pdf(content, buffer, title)
+        return buffer.getvalue()
+
+
+_renderer: Optional[DocumentRenderer] = None
+
+
+def get_renderer() -> DocumentRenderer:
+    """The renderer of this process (render pool workers each keep their own)."""
+    global _renderer
+    if _renderer is None:
+        _renderer = DocumentRenderer()
+    return _renderer
+
+
+def write_document(chunks: TextChunks, file_format: str, out: BinaryIO, title: Optional[str] = None):
+    """
+    Write text (whole or in chunks) into a binary file as DOCX, PDF or plain
+    text. Complete text falls back to plain text if the document cannot be
+    created; chunked text cannot be replayed, so the error is raised.
+
+    Args:
+        chunks: The text content, or an iterable of chunks of it
+        file_format: "docx", "pdf" or "txt"
+        out: Binary file to write to (e.g. a SpooledTemporaryFile)
+        title: Optional title for the document
+    """
+    file_format = file_format.lower().lstrip('.')
+    available = {'docx': DOCX_AVAILABLE, 'pdf': PDF_AVAILABLE}
+    if file_format not in available:
+        if file_format != 'txt':
+            logger.warning(f"Unknown document format {file_format!r}, using plain text")
+        for chunk in ([chunks] if isinstance(chunks, str) else chunks):
+            out.write(chunk.encode('utf-8'))
+        return
+    if not available[file_format]:
+        # Fallback: write plain text
+        logger.warning(f"{'python-docx' if file_format == 'docx' else 'reportlab'} not available, returning plain text")
+        write_document(chunks, 'txt', out)
+        return
+
+    start = out.tell()
+    try:
+        if file_format == 'docx':
+            get_renderer().write_docx(chunks, out, title)
+        else:
+            get_renderer().write_pdf(chunks, out, title)
     except Exception as e:
-        logger.error(f"Error creating DOCX: {e}")
+        logger.error(f"Error creating {file_format.upper()}: {e}")
+        if not isinstance(chunks, str):
+            raise
         # Fallback to plain text
-        return content.encode('utf-8')
+        out.seek(start)
+        out.truncate()
+        out.write(chunks.encode('utf-8'))
+
+
+def create_docx_from_text(content: str, title: Optional[str] = None) -> bytes:
+    """
+    Create a DOCX file from text content.
+
+    Args:
+        content: The text content to convert
+        title: Optional title for the document
+
+    Returns:
+        bytes: The DOCX file as bytes
+    """
+    buffer = io.BytesIO()
+    write_document(content, 'docx', buffer, title)
+    return buffer.getvalue()
 
 
 def create_pdf_from_text(content: str, title: Optional[str] = None) -> bytes:
     """
     Create a PDF file from text content.
-    
+
     Args:
         content: The text content to convert
         title: Optional title for the document
-        
+
     Returns:
         bytes: The PDF file as bytes
     """
-    if not PDF_AVAILABLE:
-        # Fallback: return plain text as bytes
-        logger.warning("reportlab not available, returning plain text")
-        return content.encode('utf-8')
-    
-    try:
-        # Create a BytesIO buffer
-        buffer = io.BytesIO()
-        
-        # Create PDF document
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=18
-        )
-        
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Define styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=RGBColor(0, 0, 0),
-            spaceAfter=12,
-            alignment=TA_CENTER
-        )
-        
-        # Add title if provided
-        if title:
-            elements.append(Paragraph(title, title_style))
-            elements.append(Spacer(1, 0.2 * inch))
-        
-        # Split content into paragraphs
-        paragraphs = content.split('\n\n')
-        
-        for para_text in paragraphs:
-            if not para_text.strip():
-                elements.append(Spacer(1, 0.1 * inch))
-                continue
-            
-            # Clean up the text
-            para_text_clean = para_text.strip().replace('\n', '<br/>')
-            
-            # Check if it's a heading
-            if para_text_clean.startswith('#'):
-                level = len(para_text_clean) - len(para_text_clean.lstrip('#'))
-                heading_text = para_text_clean.lstrip('#').strip()
-                style = styles[f'Heading{min(level, 3)}']
-                elements.append(Paragraph(heading_text, style))
-                elements.append(Spacer(1, 0.1 * inch))
-            elif para_text_clean.isupper() and len(para_text_clean) < 100:
-                elements.append(Paragraph(para_text_clean, styles['Heading2']))
-                elements.append(Spacer(1, 0.1 * inch))
-            else:
-                elements.append(Paragraph(para_text_clean, styles['Normal']))
-                elements.append(Spacer(1, 0.1 * inch))
-        
-        # Build PDF
-        doc.build(elements)
-        
-        # Get the PDF bytes
-        pdf_bytes = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_bytes
-        
-    except Exception as e:
-        logger.error(f"Error creating PDF: {e}")
-        # Fallback to plain text
-        return content.encode('utf-8')
+    buffer = io.BytesIO()
+    write_document(content, 'pdf', buffer, title)
+    return buffer.getvalue()
+
+
+def render_document(content: str, file_format: str, title: Optional[str] = None) -> bytes:
+    """
+    Render text content as a file of the given format.
+
+    Args:
+        content: The text content to convert
+        file_format: "docx", "pdf" or "txt"
+        title: Optional title for the document
 
+    Returns:
+        bytes: The file as bytes
+    """
+    buffer = io.BytesIO()
+    write_document(content, file_format, buffer, title)
+    return buffer.getvalue()
+
+
+def render_document_file(content: str, file_format: str, path: str, title: Optional[str] = None) -> int:
+    """
+    Render text content straight into a file on disk (for documents too large
+    to hand back from a worker process as bytes).
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    with open(path, 'wb') as out:
+        write_document(content, file_format, out, title)
+        return out.tell()
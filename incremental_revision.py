@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Incremental Revision
+Reprocesses a revised draft of an already processed contract by clause
+diff: the new version is aligned against the previously processed one, only
+added and modified clauses are sent to Bedrock, and the rewritten clauses
+are spliced into the existing mirror contract and negotiation guide.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from checkpoint_store import CheckpointStore
+from clause_diff import (
+    ADDED, DELETED, MODIFIED, RENUMBERED, UNCHANGED, Clause, ClauseChange, align_clauses, renumber, split_clauses
+)
+from contract_structure import ContractStructure
+
+logger = logging.getLogger(__name__)
+
+REVISED_CLAUSES_TOOL = {
+    "name": "record_revised_clauses",
+    "description": "Record the protected rewrite of each changed contract clause.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "clauses": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "text": {"type": "string"},
+                        "guide_note": {"type": "string"},
+                    },
+                    "required": ["id", "text", "guide_note"],
+                },
+            },
+        },
+        "required": ["clauses"],
+    },
+}
+
+GUIDE_UPDATE_HEADING = "REVISED DRAFT UPDATE"
+
+
+def guidance_fingerprint(
+    contract_category: Optional[str],
+    user_interests: Optional[str],
+    per_contract_instructions: Optional[str]
+) -> str:
+    """Hash of everything besides the contract text that shaped the outputs."""
+    payload = "\x00".join([contract_category or "", user_interests or "", per_contract_instructions or ""])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class RevisionStore(CheckpointStore):
+    """
+    Last processed revision of each contract: its version, text, category,
+    guidance fingerprint and generated artifacts. One JSON file per contract
+    key; unlike a checkpoint it is kept after the contract is processed.
+    """
+
+    DEFAULT_DIRECTORY = Path(__file__).parent / "revisions"
+
+    def __init__(self, directory: Optional[str] = None):
+        super().__init__(directory or os.getenv("REVISION_DIR", str(self.DEFAULT_DIRECTORY)))
+
+    def load(self, key: str, version: Optional[str] = None) -> Dict:
+        """Load the last processed revision of a contract (of any version)."""
+        return super().load(key)
+
+
+def _map_to_mirror(original: List[Clause], mirror: List[Clause]) -> Tuple[Dict[int, Clause], Dict[int, List[Clause]]]:
+    """
+    Map each original clause to its rewrite in the mirror contract.
+
+    Returns:
+        (original index -> mirror clause, original index -> mirror-only
+        clauses that follow it); mirror-only clauses before the first mapped
+        clause are keyed -1
+    """
+    changes = align_clauses(original, mirror)
+
+    # A rewrite too different to pair by similarity shows up as a deleted
+    # original clause next to an added mirror clause; pair those by number
+    paired: List[ClauseChange] = []
+    pending_deleted: List[ClauseChange] = []
+    for change in changes:
+        if change.status == DELETED:
+            pending_deleted.append(change)
+            continue
+        if change.status == ADDED:
+            match = next(
+                (deleted for deleted in pending_deleted if (deleted.original.number or "") == (change.revised.number or "")),
+                None
+            )
+            if match is not None:
+                pending_deleted.remove(match)
+                paired.append(ClauseChange(MODIFIED, match.original, change.revised, 0.0))
+                continue
+        paired.append(change)
+        pending_deleted = []
+
+    rewrites: Dict[int, Clause] = {}
+    extras: Dict[int, List[Clause]] = {}
+    anchor = -1
+    for change in paired:
+        if change.original is not None and change.revised is not None:
+            rewrites[change.original.index] = change.revised
+            anchor = change.original.index
+        elif change.revised is not None:
+            extras.setdefault(anchor, []).append(change.revised)
+    return rewrites, extras
+
+
+class RevisionPlan:
+    """
+    Clause-level plan for reprocessing a revised draft.
+
+    Args:
+        previous_text: Contract text of the previously processed version
+        previous_mirror: Mirror contract generated for that version
+        new_text: Contract text of the revised draft
+        new_structure: Already parsed structure of new_text, if available
+    """
+
+    def __init__(
+        self,
+        previous_text: str,
+        previous_mirror: str,
+        new_text: str,
+        new_structure: Optional[ContractStructure] = None
+    ):
+        previous_clauses = split_clauses(previous_text)
+        self.changes = align_clauses(previous_clauses, split_clauses(new_text, new_structure))
+        self.rewrites, self.extras = _map_to_mirror(previous_clauses, split_clauses(previous_mirror))
+        # Clauses that need a new rewrite, by request ID
+        self.pending: Dict[int, ClauseChange] = {
+            position: change
+            for position, change in enumerate(self.changes)
+            if change.status in (ADDED, MODIFIED)
+        }
+        changed_chars = sum(len(change.revised.text) for change in self.pending.values())
+        self.change_ratio = changed_chars / max(len(new_text), 1)
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in (MODIFIED, ADDED, DELETED, RENUMBERED, UNCHANGED)}
+        for change in self.changes:
+            counts[change.status] += 1
+        return counts
+
+    def excerpt(self) -> str:
+        """The changed clauses, with their previous text and rewrite, for the model."""
+        blocks = []
+        for clause_id, change in self.pending.items():
+            lines = [f"[Clause {clause_id}] {change.revised.label} ({change.status.upper()})"]
+            if change.original is not None:
+                previous_rewrite = self.rewrites.get(change.original.index)
+                lines += [
+                    "PREVIOUS DRAFT:", change.original.text, "",
+                    "YOUR PREVIOUS REWRITE:", previous_rewrite.text if previous_rewrite else "(clause was removed)", "",
+                ]
+            lines += ["REVISED DRAFT:", change.revised.text]
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+
+    def parse_response(self, response: Dict) -> Optional[Dict[int, Dict[str, str]]]:
+        """
+        Rewrites from a REVISED_CLAUSES_TOOL response, keyed by clause ID.
+
+        Returns:
+            None unless every pending clause got a non-empty rewrite
+        """
+        rewritten = {}
+        for entry in response.get('clauses') or []:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                # Models sometimes send the integer ID as a string
+                clause_id = int(entry.get('id'))
+            except (TypeError, ValueError):
+                continue
+            text = entry.get('text')
+            if clause_id in self.pending and isinstance(text, str) and text.strip():
+                rewritten[clause_id] = {'text': text.strip(), 'guide_note': str(entry.get('guide_note') or "").strip()}
+        missing = set(self.pending) - set(rewritten)
+        if missing:
+            logger.warning(f"Revision response is missing {len(missing)} of {len(self.pending)} clause(s)")
+            return None
+        return rewritten
+
+    def splice_mirror(self, rewritten: Dict[int, Dict[str, str]]) -> str:
+        """New mirror contract: kept rewrites for unchanged clauses, new ones for changed clauses."""
+        parts = [clause.text for clause in self.extras.get(-1, [])]
+        for position, change in enumerate(self.changes):
+            before, after = change.original, change.revised
+            if position in rewritten:
+                parts.append(rewritten[position]['text'])
+            elif change.status != DELETED:
+                rewrite = self.rewrites.get(before.index)
+                if rewrite is not None:
+                    text = rewrite.text
+                    if before.number and after.number and before.number != after.number and rewrite.number == before.number:
+                        text = renumber(text, before.number, after.number)
+                    parts.append(text)
+            # Clauses the mirror added after this one (e.g. extra protections) stay in place
+            if before is not None:
+                parts.extend(clause.text for clause in self.extras.get(before.index, []))
+        return "\n\n".join(parts) + "\n"
+
+    def update_guide(self, previous_guide: str, rewritten: Dict[int, Dict[str, str]]) -> str:
+        """The previous negotiation guide with a section for this revision appended."""
+        heading = f"{GUIDE_UPDATE_HEADING} ({datetime.now().strftime('%Y-%m-%d')})"
+        lines = [heading, "=" * len(heading), ""]
+        counts = self.counts
+        lines += [
+            f"The counterparty's revised draft changed {counts[MODIFIED]} clause(s), added {counts[ADDED]} "
+            f"and removed {counts[DELETED]}. The mirror contract was updated for these clauses only; "
+            f"the guidance above still applies to the rest.",
+            "",
+        ]
+        for position, change in enumerate(self.changes):
+            if position in rewritten:
+                lines += [f"{change.revised.label} [{change.status.upper()}]", rewritten[position]['guide_note'] or "-", ""]
+            elif change.status == DELETED:
+                lines += [
+                    f"{change.original.label} [DELETED]",
+                    "The counterparty removed this clause. Decide whether you need it back before signing.",
+                    "",
+                ]
+        return f"{previous_guide.rstrip()}\n\n\n" + "\n".join(lines).rstrip() + "\n"
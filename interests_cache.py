@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Interests Cache
+Keeps MY_INTERESTS.txt in memory and only re-downloads it when its Box
+version (sha1/etag) changes.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InterestsCache:
+    """Change-aware cache for the user's general interests file."""
+
+    def __init__(
+        self,
+        box_service,
+        filename: str,
+        folder_id: Optional[str] = None,
+        revalidate_interval: Optional[int] = None,
+        on_change: Optional[Callable[[Optional[str], Optional[str]], Awaitable[None]]] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            box_service: Service used to list the folder and read the file
+            filename: Name of the interests file (MY_INTERESTS.txt)
+            folder_id: Box folder holding the file (can be set after creation)
+            revalidate_interval: Seconds between version checks against Box
+            on_change: Async callback (old_text, new_text) run when the interests change
+        """
+        self.box_service = box_service
+        self.filename = filename
+        self.folder_id = folder_id
+        self.revalidate_interval = revalidate_interval if revalidate_interval is not None else int(
+            os.getenv("INTERESTS_REVALIDATE_INTERVAL", "900")
+        )
+        self.on_change = on_change
+
+        self.text: Optional[str] = None
+        self.version: Optional[str] = None  # sha1 (or etag) of the cached text
+        self.loaded = False
+        self.last_validated = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Change event: force a version check on the next get()."""
+        self.last_validated = 0.0
+
+    def is_stale(self) -> bool:
+        return not self.loaded or time.monotonic() - self.last_validated >= self.revalidate_interval
+
+    async def get(self) -> Optional[str]:
+        """Return the interests text, revalidating against Box when stale."""
+        if self.is_stale():
+            async with self._lock:
+                # Another caller may have revalidated while we waited
+                if self.is_stale():
+                    await self.revalidate()
+        return self.text
+
+    async def revalidate(self) -> bool:
+        """
+        Compare the Box version of the file with the cached one and reload
+        the text only if it differs.
+
+        Returns:
+            True if the interests changed
+        """
+        items = await self.box_service.list_folder_items(self.folder_id)
+        entry = next(
+            (item for item in items if item['type'] == 'file' and item['name'] == self.filename),
+            None
+        )
+        self.last_validated = time.monotonic()
+
+        if entry is None:
+            new_version, new_text = None, None
+        else:
+            new_version = entry.get('sha1') or entry.get('etag')
+            if self.loaded and new_version and new_version == self.version:
+                return False
+            new_text = await self.box_service.read_file(entry['id'])
+
+        first_load = not self.loaded
+        old_text = self.text
+        changed = new_version != self.version or new_text != old_text
+        self.text, self.version, self.loaded = new_text, new_version, True
+
+        if first_load:
+            if new_text is None:
+                logger.info(f"{self.filename} not found. Will make contract fairer without user interests.")
+            else:
+                logger.info("Loaded user interests from Box")
+            return False
+
+        if not changed:
+            return False
+
+        logger.info(f"{self.filename} changed (version {new_version})")
+        if self.on_change:
+            await self.on_change(old_text, new_text)
+        return True
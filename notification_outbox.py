@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Notification Outbox
+Deduplicates action item notifications, batches them into digests and
+publishes them asynchronously with retries. Delivery state is persisted so a
+restarted processor never sends the same alert twice.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Entry states
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+
+
+def _parse_thresholds(value: str) -> List[int]:
+    """Parse a comma-separated list of day thresholds (e.g. "14,10,5,1,0")."""
+    thresholds = set()
+    for part in value.split(','):
+        part = part.strip()
+        if part:
+            thresholds.add(int(part))
+    return sorted(thresholds)
+
+
+class NotificationOutbox:
+    """Persistent outbox for action item notifications."""
+
+    DEFAULT_STATE_FILE = Path(__file__).parent / "notification_outbox.json"
+
+    def __init__(
+        self,
+        publisher: Callable[[str, str], str],
+        message_builder: Callable[[List[Dict]], str],
+        state_file: Optional[str] = None,
+        thresholds: Optional[List[int]] = None,
+        digest_interval: Optional[int] = None,
+        digest_max_items: Optional[int] = None,
+        immediate_days: Optional[int] = None,
+        max_attempts: int = 3,
+        retry_base_delay: float = 2.0
+    ):
+        """
+        Initialize the outbox.
+
+        Args:
+            publisher: Blocking callable (subject, message) -> message ID
+            message_builder: Builds the digest body from a list of action items
+            state_file: Path of the JSON delivery-state file
+            thresholds: Day thresholds; an item is notified once per threshold it crosses
+            digest_interval: Minimum seconds between two digests
+            digest_max_items: Flush early once this many items are pending
+            immediate_days: Items due within this many days bypass the digest interval
+            max_attempts: Publish attempts per digest before giving up until next flush
+            retry_base_delay: Base delay in seconds for exponential retry backoff
+        """
+        self.publisher = publisher
+        self.message_builder = message_builder
+        self.state_file = Path(
+            state_file or os.getenv("NOTIFICATION_OUTBOX_FILE", str(self.DEFAULT_STATE_FILE))
+        )
+        self.thresholds = thresholds if thresholds is not None else _parse_thresholds(
+            os.getenv("NOTIFICATION_THRESHOLDS", "0,1,5,10,14")
+        )
+        self.digest_interval = digest_interval if digest_interval is not None else int(
+            os.getenv("NOTIFICATION_DIGEST_INTERVAL", "21600")
+        )
+        self.digest_max_items = digest_max_items or int(
+            os.getenv("NOTIFICATION_DIGEST_MAX_ITEMS", "25")
+        )
+        self.immediate_days = immediate_days if immediate_days is not None else int(
+            os.getenv("NOTIFICATION_IMMEDIATE_DAYS", "1")
+        )
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+
+        self.entries: Dict[str, Dict] = {}
+        self.last_digest_at = 0.0
+        self._lock = asyncio.Lock()
+        self._load_state()
+
+    def _load_state(self):
+        """Load delivery state from disk."""
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.entries = state.get('entries', {})
+            self.last_digest_at = state.get('last_digest_at', 0.0)
+
+            # A crash between publish and bookkeeping leaves entries in SENDING.
+            # Treat them as delivered: a missed duplicate is better than a resend.
+            for entry in self.entries.values():
+                if entry['status'] == SENDING:
+                    logger.warning(f"Outbox entry {entry['key']} was in flight at shutdown, marking as sent")
+                    entry['status'] = SENT
+            logger.info(f"Loaded notification outbox with {len(self.entries)} entries")
+        except Exception as e:
+            logger.error(f"Error loading notification outbox state: {e}")
+            self.entries = {}
+
+    def _save_state(self):
+        """Atomically persist delivery state."""
+        state = {
+            'entries': self.entries,
+            'last_digest_at': self.last_digest_at,
+        }
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def _threshold_for(self, days_until: Optional[int]) -> Optional[int]:
+        """Return the smallest threshold the item has crossed (None if above all)."""
+        if days_until is None:
+            return None
+        for threshold in self.thresholds:
+            if days_until <= threshold:
+                return threshold
+        return None
+
+    def _dedup_key(self, item: Dict, threshold: Optional[int]) -> str:
+        """Build the (contract, item, threshold) deduplication key."""
+        # Due date + type identify an item across runs; descriptions are
+        # rephrased by the model on every analysis so they are not used.
+        identity = item.get('due_date') or item.get('description', '')
+        raw = f"{item.get('contract', '')}|{item.get('type', '')}|{identity}|{threshold}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _serializable(item: Dict) -> Dict:
+        """Drop non-JSON fields (e.g. datetime objects) from an action item."""
+        return {k: v for k, v in item.items() if not isinstance(v, datetime)}
+
+    def enqueue(self, action_items: List[Dict]) -> int:
+        """
+        Add urgent action items to the outbox, skipping ones already queued or sent.
+
+        Returns:
+            Number of newly queued items
+        """
+        added = 0
+        for item in action_items:
+            threshold = self._threshold_for(item.get('days_until_due'))
+            key = self._dedup_key(item, threshold)
+            if key in self.entries:
+                continue
+            self.entries[key] = {
+                'key': key,
+                'status': PENDING,
+                'threshold': threshold,
+                'item': self._serializable(item),
+                'enqueued_at': time.time(),
+                'attempts': 0,
+            }
+            added += 1
+
+        if added:
+            self._save_state()
+            logger.info(f"Queued {added} new notification(s) ({len(action_items) - added} duplicate(s) skipped)")
+        else:
+            logger.info("No new action items to notify (all already queued or sent)")
+        return added
+
+    @staticmethod
+    def _refresh_days_until_due(item: Dict):
+        """Recompute days_until_due from the due date; the count stored at enqueue goes stale while an item waits."""
+        try:
+            due = datetime.strptime(item['due_date'], '%Y-%m-%d').date()
+        except (KeyError, TypeError, ValueError):
+            return
+        item['days_until_due'] = (due - datetime.now().date()).days
+
+    def pending_entries(self) -> List[Dict]:
+        """Entries waiting to be delivered, most urgent first (days until due as of now)."""
+        pending = [e for e in self.entries.values() if e['status'] == PENDING]
+        for entry in pending:
+            self._refresh_days_until_due(entry['item'])
+        pending.sort(key=lambda e: (
+            e['item'].get('days_until_due') if e['item'].get('days_until_due') is not None else 10 ** 6
+        ))
+        return pending
+
+    def _digest_due(self, pending: List[Dict]) -> bool:
+        """Decide whether the pending items should be sent now."""
+        if not pending:
+            return False
+        if time.time() - self.last_digest_at >= self.digest_interval:
+            return True
+        if len(pending) >= self.digest_max_items:
+            return True
+        return any(
+            e['item'].get('days_until_due') is not None
+            and e['item']['days_until_due'] <= self.immediate_days
+            for e in pending
+        )
+
+    async def flush(self, force: bool = False) -> bool:
+        """
+        Publish pending items as one digest if a digest is due.
+
+        Args:
+            force: Send regardless of the digest interval
+
+        Returns:
+            True if nothing needed sending or the digest was delivered
+        """
+        async with self._lock:
+            pending = self.pending_entries()
+            if not pending:
+                return True
+            if not force and not self._digest_due(pending):
+                logger.info(f"{len(pending)} notification(s) pending until next digest")
+                return True
+
+            batch = pending[:self.digest_max_items]
+            items = [e['item'] for e in batch]
+            subject = f"⚠️ Contract Action Items - {len(items)} Urgent Item(s)"
+            message = self.message_builder(items)
+
+            for entry in batch:
+                entry['status'] = SENDING
+                entry['attempts'] += 1
+            self._save_state()
+
+            message_id = None
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    # SNS publish is blocking - keep it off the event loop
+                    message_id = await asyncio.to_thread(self.publisher, subject, message)
+                    break
+                except Exception as e:
+                    logger.warning(f"Notification publish attempt {attempt}/{self.max_attempts} failed: {e}")
+                    if attempt < self.max_attempts:
+                        await asyncio.sleep(self.retry_base_delay * (2 ** (attempt - 1)))
+
+            if message_id is None:
+                for entry in batch:
+                    entry['status'] = PENDING
+                self._save_state()
+                logger.error(f"Could not deliver digest of {len(batch)} item(s); will retry on next flush")
+                return False
+
+            sent_at = time.time()
+            for entry in batch:
+                entry['status'] = SENT
+                entry['sent_at'] = sent_at
+                entry['message_id'] = message_id
+            self.last_digest_at = sent_at
+            self._prune()
+            self._save_state()
+            logger.info(f"Notification digest sent ({len(batch)} item(s)): {message_id}")
+            return True
+
+    def _prune(self, retention_days: int = 90):
+        """Forget delivered entries whose deadline passed long ago."""
+        # Items are only queued within the largest threshold of their deadline,
+        # so anything sent this long ago refers to a deadline that has passed.
+        cutoff = time.time() - retention_days * 86400
+        stale = [
+            key for key, e in self.entries.items()
+            if e['status'] == SENT and e.get('sent_at', 0) < cutoff
+        ]
+        for key in stale:
+            del self.entries[key]
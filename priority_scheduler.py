@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Priority Scheduler
+Orders contracts waiting for processing by user-marked urgency, file size,
+estimated token cost and time spent in the queue (aging prevents starvation).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Urgency levels a user can set in a .instructions file, e.g. "Priority: urgent"
+URGENCY_LEVELS = {"urgent": 3, "high": 2, "normal": 1, "low": 0}
+DEFAULT_URGENCY = "normal"
+
+_URGENCY_LINE = re.compile(r'^\s*(?:priority|urgency)\s*[:=]\s*(\w+)', re.IGNORECASE | re.MULTILINE)
+_URGENT_WORD = re.compile(r'\bURGENT\b')
+
+# Rough bytes per model token for each contract format (PDF/DOCX are compressed)
+BYTES_PER_TOKEN = {".txt": 4, ".doc": 8, ".docx": 12, ".pdf": 16}
+
+
+def urgency_from_instructions(instructions: Optional[str]) -> str:
+    """
+    Read the urgency a user marked in a .instructions file.
+
+    Recognizes a "Priority: <level>" / "Urgency: <level>" line, or the word
+    URGENT in capitals anywhere in the file.
+    """
+    if not instructions:
+        return DEFAULT_URGENCY
+    match = _URGENCY_LINE.search(instructions)
+    if match and match.group(1).lower() in URGENCY_LEVELS:
+        return match.group(1).lower()
+    if _URGENT_WORD.search(instructions):
+        return "urgent"
+    return DEFAULT_URGENCY
+
+
+def estimate_tokens(filename: str, size_bytes: Optional[int]) -> int:
+    """Estimate the input tokens of a contract from its file size and format."""
+    if not size_bytes:
+        return 0
+    return int(size_bytes / BYTES_PER_TOKEN.get(Path(filename).suffix.lower(), 8))
+
+
+class PriorityScheduler:
+    """
+    Priority queue of contract jobs.
+
+    Score (higher runs first):
+        urgency_weight * urgency level
+        - size_weight * file size in MB
+        - token_weight * estimated tokens / 1000
+        + aging_weight * minutes waited
+
+    Every entry ages at the same rate, so ordering by the score at enqueue
+    time minus aging_weight * enqueue minute is equivalent at any later time.
+    That makes the ordering time-invariant and lets a heap hold it.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        defaults = {
+            "urgency": 100.0,
+            "size": 5.0,
+            "token": 1.0,
+            "aging": 2.0,
+        }
+        self.weights = {
+            name: float(os.getenv(f"SCHEDULER_WEIGHT_{name.upper()}", str(value)))
+            for name, value in defaults.items()
+        }
+        if weights:
+            self.weights.update(weights)
+
+        self._heap: List[tuple] = []
+        self._entries: Dict[str, Dict] = {}
+        self._counter = itertools.count()
+        self._changed = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def _base_score(self, urgency: str, size_bytes: Optional[int], est_tokens: int) -> float:
+        return (
+            self.weights["urgency"] * URGENCY_LEVELS.get(urgency, URGENCY_LEVELS[DEFAULT_URGENCY])
+            - self.weights["size"] * (size_bytes or 0) / 1_000_000
+            - self.weights["token"] * est_tokens / 1000
+        )
+
+    def score(self, key: str, now: Optional[float] = None) -> float:
+        """Current score of a queued contract (including aging)."""
+        entry = self._entries[key]
+        waited_minutes = ((now or time.time()) - entry['enqueued_at']) / 60
+        return entry['base_score'] + self.weights["aging"] * waited_minutes
+
+    async def add(
+        self,
+        job,
+        urgency: str = DEFAULT_URGENCY,
+        size_bytes: Optional[int] = None,
+        enqueued_at: Optional[float] = None
+    ):
+        """Queue a contract job with its scheduling signals."""
+        if job.key in self._entries:
+            return
+        enqueued_at = enqueued_at or time.time()
+        est_tokens = estimate_tokens(job.filename, size_bytes)
+        base_score = self._base_score(urgency, size_bytes, est_tokens)
+        # Time-invariant sort key (see class docstring); heapq is a min-heap
+        sort_key = -(base_score - self.weights["aging"] * enqueued_at / 60)
+
+        entry = {
+            'job': job,
+            'urgency': urgency,
+            'size_bytes': size_bytes,
+            'est_tokens': est_tokens,
+            'base_score': base_score,
+            'enqueued_at': enqueued_at,
+            'sort_key': sort_key,
+        }
+        self._entries[job.key] = entry
+        heapq.heappush(self._heap, (sort_key, next(self._counter), job.key))
+
+        async with self._changed:
+            self._changed.notify_all()
+
+        logger.info(
+            f"Queued {job.filename} (urgency={urgency}, ~{est_tokens} tokens) "
+            f"at position {self.position(job.key)}/{len(self)}"
+        )
+
+    async def get(self):
+        """Wait for and remove the highest-priority job."""
+        async with self._changed:
+            while not self._entries:
+                await self._changed.wait()
+            while True:
+                _, _, key = heapq.heappop(self._heap)
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    break
+            self._changed.notify_all()
+            return entry['job']
+
+    async def remove(self, key: str) -> bool:
+        """Drop a queued contract (its heap slot is skipped lazily)."""
+        async with self._changed:
+            if self._entries.pop(key, None) is None:
+                return False
+            # Wakes join() when this was the last queued contract
+            self._changed.notify_all()
+            return True
+
+    async def join(self):
+        """Wait until the queue is empty."""
+        async with self._changed:
+            while self._entries:
+                await self._changed.wait()
+
+    def position(self, key: str) -> Optional[int]:
+        """1-based queue position of a contract, or None if not queued."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        ahead = sum(1 for other in self._entries.values() if other['sort_key'] < entry['sort_key'])
+        return ahead + 1
+
+    def snapshot(self) -> List[Dict]:
+        """Queued contracts in processing order with their signals and scores."""
+        now = time.time()
+        ordered = sorted(self._entries.values(), key=lambda e: e['sort_key'])
+        return [
+            {
+                'position': index,
+                'contract': entry['job'].filename,
+                'key': entry['job'].key,
+                'urgency': entry['urgency'],
+                'size_bytes': entry['size_bytes'],
+                'est_tokens': entry['est_tokens'],
+                'waited_seconds': now - entry['enqueued_at'],
+                'score': self.score(entry['job'].key, now),
+            }
+            for index, entry in enumerate(ordered, 1)
+        ]
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Render Pool
+Renders generated artifacts into DOCX and PDF files in a process pool, so
+CPU-bound python-docx/reportlab work never runs on the event loop, and keeps
+render-time metrics per format. Rendered files come back as spooled
+temporary files (in memory when small, on disk when large) that are
+uploaded as streams.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TXT = "txt"
+DOCX = "docx"
+PDF = "pdf"
+FORMATS = (TXT, DOCX, PDF)
+
+# Output formats per artifact (the redline DOCX carries tracked changes,
+# the PDF the readable comparison)
+DEFAULT_OUTPUT_FORMATS = {
+    "mirror": [DOCX],
+    "redline": [DOCX, PDF],
+    "guide": [DOCX],
+}
+
+
+def output_formats_from_env() -> Dict[str, List[str]]:
+    """Formats per artifact, overridable with OUTPUT_FORMATS_<ARTIFACT> (e.g. "docx,txt")."""
+    formats = {}
+    for artifact, default in DEFAULT_OUTPUT_FORMATS.items():
+        value = os.getenv(f"OUTPUT_FORMATS_{artifact.upper()}", ",".join(default))
+        chosen = [name.strip().lower().lstrip('.') for name in value.split(",") if name.strip()]
+        unknown = [name for name in chosen if name not in FORMATS]
+        if unknown:
+            logger.warning(f"Ignoring unknown output format(s) for {artifact}: {', '.join(unknown)}")
+        formats[artifact] = [name for name in chosen if name in FORMATS] or list(default)
+    return formats
+
+
+class RenderPool:
+    """
+    Process pool for document rendering.
+
+    Args:
+        processes: Worker processes (RENDER_PROCESSES, default up to 2); the
+                   pool is started on first use
+        spool_max_memory: Documents up to this many characters come back
+                          from the workers in memory; larger ones are written
+                          to disk by the worker (RENDER_SPOOL_MAX_MEMORY, 8 MB)
+    """
+
+    def __init__(self, processes: Optional[int] = None, spool_max_memory: Optional[int] = None):
+        self.processes = processes or int(os.getenv("RENDER_PROCESSES", str(min(2, os.cpu_count() or 1))))
+        self.spool_max_memory = spool_max_memory or int(os.getenv("RENDER_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._stats: Dict[str, Dict] = {}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    async def render(self, content: str, file_format: str, title: Optional[str] = None) -> BinaryIO:
+        """
+        Render text into a DOCX or PDF file.
+
+        Returns:
+            The file, positioned at its start (close it when done): a
+            SpooledTemporaryFile, or for large documents the file the worker
+            wrote, already unlinked
+        """
+        # Imported here: document_generator configures logging on import
+        from document_generator import render_document, render_document_file
+
+        return await self._render(
+            file_format, len(content),
+            partial(render_document, content, file_format, title),
+            partial(render_document_file, content, file_format, title=title)
+        )
+
+    async def render_redline(self, original_text: str, revised_text: str, title: Optional[str] = None) -> BinaryIO:
+        """Render the tracked-changes redline DOCX of two contract versions (returned like render())."""
+        from redline_docx import render_redline_docx, render_redline_docx_file
+
+        return await self._render(
+            DOCX, len(original_text) + len(revised_text),
+            partial(render_redline_docx, original_text, revised_text, title),
+            partial(render_redline_docx_file, original_text, revised_text, title=title)
+        )
+
+    async def _render(
+        self, file_format: str, length: int, to_bytes: Callable[[], bytes], to_file: Callable[[str], int]
+    ) -> BinaryIO:
+        """
+        Run a render in a worker: to_bytes() for documents up to
+        spool_max_memory characters, otherwise to_file(path), which returns
+        the size written.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            if length <= self.spool_max_memory:
+                data = await loop.run_in_executor(self._pool(), to_bytes)
+                rendered = tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory)
+                rendered.write(data)
+                size = len(data)
+            else:
+                # Written to disk by the worker instead of pickled back as bytes
+                descriptor, path = tempfile.mkstemp(suffix=f".{file_format}")
+                os.close(descriptor)
+                try:
+                    size = await loop.run_in_executor(self._pool(), to_file, path)
+                    rendered = open(path, 'rb')
+                finally:
+                    os.unlink(path)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for later renders
+            logger.error(f"Render pool broke while rendering {file_format.upper()}; restarting it")
+            self._executor = None
+            raise
+        rendered.seek(0)
+        self._record(file_format, time.perf_counter() - started, size)
+        return rendered
+
+    def _record(self, file_format: str, seconds: float, size: int):
+        stats = self._stats.setdefault(file_format, {'rendered': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0})
+        stats['rendered'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['bytes'] += size
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Render counts, times and output sizes per format."""
+        return {
+            file_format: dict(
+                stats,
+                avg_seconds=stats['total_seconds'] / stats['rendered'],
+                avg_bytes=stats['bytes'] // stats['rendered']
+            )
+            for file_format, stats in self._stats.items()
+        }
+
+    def log_metrics(self):
+        """Log a one-line summary per format."""
+        for file_format, m in self.metrics().items():
+            logger.info(
+                f"Render {file_format:<5} done={m['rendered']} avg={m['avg_seconds']:.2f}s "
+                f"max={m['max_seconds']:.2f}s avg_size={m['avg_bytes'] / 1024:.0f}KB"
+            )
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Retry Queue
+Persistent retry queue for failed contracts: per-item exponential backoff,
+a maximum number of attempts, transient vs. permanent error classification
+and a dead-letter list that an operator can requeue from.
+
+Operator usage:
+    python retry_queue.py list
+    python retry_queue.py requeue <contract_key>
+    python retry_queue.py requeue --all
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# AWS error codes that clear up on their own
+TRANSIENT_AWS_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "InternalServerException",
+    "RequestTimeout",
+}
+
+# Network error classes of the HTTP clients under the Box SDK and boto3,
+# matched by name so those libraries need not be imported here
+TRANSIENT_ERROR_NAMES = {
+    "ConnectionError",          # requests, botocore (incl. EndpointConnectionError)
+    "Timeout",                  # requests (ConnectTimeout, ReadTimeout)
+    "ConnectTimeoutError",      # botocore, urllib3
+    "ReadTimeoutError",         # botocore, urllib3
+    "ProtocolError",            # urllib3 (connection dropped mid-response)
+    "RemoteDisconnected",       # http.client
+}
+
+# Error messages that indicate a temporary condition; status codes only as
+# whole numbers, so IDs and byte counts containing them do not match
+TRANSIENT_MESSAGE_PATTERN = re.compile(
+    r"throttl|rate exceeded|too many requests|timeout|timed out|temporarily"
+    r"|service unavailable|connection reset|\b(?:429|503)\b"
+)
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Classify an exception as TRANSIENT (retry later) or PERMANENT.
+
+    Wrapped exceptions are unwrapped through __cause__, so a ValueError raised
+    from a botocore ClientError is classified by the AWS error code. Only
+    recognized temporary conditions are TRANSIENT; anything else (e.g. a
+    KeyError from a bug) is PERMANENT, so callers use their fallback instead
+    of retrying until the contract is dead-lettered.
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+
+        # botocore ClientError
+        response = getattr(current, 'response', None)
+        if isinstance(response, dict) and 'Error' in response:
+            code = response['Error'].get('Code', '')
+            return TRANSIENT if code in TRANSIENT_AWS_CODES else PERMANENT
+
+        # Box SDK errors carry the HTTP status
+        status = getattr(current, 'status', None)
+        if status is None:
+            status = getattr(getattr(current, 'response_info', None), 'status_code', None)
+        if isinstance(status, int):
+            return TRANSIENT if status == 429 or status >= 500 else PERMANENT
+
+        if isinstance(current, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+            return TRANSIENT
+        if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(current).__mro__):
+            return TRANSIENT
+
+        current = current.__cause__
+
+    if TRANSIENT_MESSAGE_PATTERN.search(str(error).lower()):
+        return TRANSIENT
+    return PERMANENT
+
+
+class RetryQueue:
+    """Failed contracts waiting for another attempt, persisted to JSON."""
+
+    DEFAULT_STATE_FILE = Path(__file__).parent / "retry_queue.json"
+
+    def __init__(
+        self,
+        state_file: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None
+    ):
+        """
+        Initialize the retry queue.
+
+        Args:
+            state_file: Path of the JSON state file
+            max_attempts: Attempts before a contract is dead-lettered
+            base_delay: Delay in seconds before the first retry
+            max_delay: Upper bound for the backoff delay in seconds
+        """
+        self.state_file = Path(
+            state_file or os.getenv("RETRY_QUEUE_FILE", str(self.DEFAULT_STATE_FILE))
+        )
+        self.max_attempts = max_attempts or int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+        self.base_delay = base_delay or float(os.getenv("RETRY_BASE_DELAY", "60"))
+        self.max_delay = max_delay or float(os.getenv("RETRY_MAX_DELAY", "3600"))
+
+        self.items: Dict[str, Dict] = {}
+        self.dead_letter: Dict[str, Dict] = {}
+        self._mtime = None
+        self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        """Reload state if the file was modified (e.g. by the operator CLI)."""
+        try:
+            mtime = self.state_file.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.items = state.get('items', {})
+            self.dead_letter = state.get('dead_letter', {})
+            self._mtime = mtime
+        except Exception as e:
+            logger.error(f"Error loading retry queue state: {e}")
+
+    def _save_state(self):
+        """Atomically persist the queue."""
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump({'items': self.items, 'dead_letter': self.dead_letter}, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+        self._mtime = self.state_file.stat().st_mtime
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with jitter so failed contracts don't retry in lockstep."""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def record_failure(self, key: str, job_info: Dict, error: BaseException) -> str:
+        """
+        Record a failed attempt.
+
+        Args:
+            key: Contract key
+            job_info: Data needed to resubmit the contract (file_id, filename, contract_name)
+            error: The exception that failed the attempt
+
+        Returns:
+            "retry" if the contract will be retried, "dead" if it was dead-lettered
+        """
+        self._reload_if_changed()
+        error_class = classify_error(error)
+        entry = self.items.pop(key, None) or {'key': key, 'attempts': 0, 'first_failed_at': time.time()}
+        entry.update(job_info)
+        entry['attempts'] += 1
+        entry['last_error'] = str(error)
+        entry['error_class'] = error_class
+        entry['last_failed_at'] = time.time()
+
+        if error_class == PERMANENT or entry['attempts'] >= self.max_attempts:
+            reason = "permanent error" if error_class == PERMANENT else f"{entry['attempts']} attempts"
+            entry['dead_lettered_at'] = time.time()
+            self.dead_letter[key] = entry
+            self._save_state()
+            logger.error(f"☠️  {job_info.get('filename', key)} moved to dead-letter list ({reason}): {error}")
+            return "dead"
+
+        delay = self._backoff(entry['attempts'])
+        entry['next_attempt_at'] = time.time() + delay
+        self.items[key] = entry
+        self._save_state()
+        logger.warning(
+            f"🔁 {job_info.get('filename', key)} failed ({error_class}), "
+            f"retry {entry['attempts']}/{self.max_attempts - 1} in {delay:.0f}s"
+        )
+        return "retry"
+
+    def record_success(self, key: str):
+        """Forget a contract after it was processed successfully."""
+        self._reload_if_changed()
+        if self.items.pop(key, None) is not None or self.dead_letter.pop(key, None) is not None:
+            self._save_state()
+
+    def is_blocked(self, key: str, now: Optional[float] = None) -> bool:
+        """True if the contract is dead-lettered or still backing off."""
+        self._reload_if_changed()
+        if key in self.dead_letter:
+            return True
+        entry = self.items.get(key)
+        return entry is not None and entry['next_attempt_at'] > (now or time.time())
+
+    def due_items(self, now: Optional[float] = None) -> List[Dict]:
+        """Queued contracts whose backoff has expired."""
+        self._reload_if_changed()
+        now = now or time.time()
+        return [entry for entry in self.items.values() if entry['next_attempt_at'] <= now]
+
+    def requeue(self, key: Optional[str] = None) -> int:
+        """
+        Move dead-lettered contracts back into the queue for an immediate retry.
+
+        Args:
+            key: Contract key to requeue, or None for the whole dead-letter list
+
+        Returns:
+            Number of requeued contracts
+        """
+        self._reload_if_changed()
+        keys = list(self.dead_letter) if key is None else [key]
+        requeued = 0
+        for dead_key in keys:
+            entry = self.dead_letter.pop(dead_key, None)
+            if entry is None:
+                continue
+            entry['attempts'] = 0
+            entry['next_attempt_at'] = time.time()
+            entry.pop('dead_lettered_at', None)
+            self.items[dead_key] = entry
+            requeued += 1
+        if requeued:
+            self._save_state()
+        return requeued
+
+
+def main():
+    """Operator command line."""
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    queue = RetryQueue()
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+
+    if command == "list":
+        logger.info(f"Retry queue ({len(queue.items)}):")
+        for entry in queue.items.values():
+            wait = max(0, entry['next_attempt_at'] - time.time())
+            logger.info(f"  {entry['key']}: attempt {entry['attempts']}, next in {wait:.0f}s - {entry['last_error']}")
+        logger.info(f"Dead-letter list ({len(queue.dead_letter)}):")
+        for entry in queue.dead_letter.values():
+            logger.info(f"  {entry['key']}: {entry['attempts']} attempt(s), {entry['error_class']} - {entry['last_error']}")
+    elif command == "requeue" and len(sys.argv) > 2:
+        key = None if sys.argv[2] == "--all" else sys.argv[2]
+        count = queue.requeue(key)
+        logger.info(f"Requeued {count} contract(s)")
+    else:
+        logger.info(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
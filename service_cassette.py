@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Service Cassettes
+Record/replay layer for BoxContractService and BedrockService. In record mode
+every call made through a service is captured (arguments, result or error and
+latency) into a JSON cassette; in replay mode the cassette answers the calls
+offline, with configurable injected latency, so the full pipeline can be run,
+benchmarked and profiled without Box OAuth or AWS credentials.
+
+Usage:
+    python service_cassette.py record cassettes/run.json
+    python service_cassette.py replay cassettes/run.json [--latency-scale 1.0]
+"""
+
+import argparse
+import asyncio
+import builtins
+import hashlib
+import inspect
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BOX = "box"
+BEDROCK = "bedrock"
+
+# Attributes that are part of a service's state rather than its API
+_NOT_RECORDED = {"client", "bedrock_runtime", "region_name", "model_id", "wait_for_changes"}
+
+
+class CassetteMiss(KeyError):
+    """A replayed call has no recorded interaction."""
+
+
+def _recordable(value: Any) -> Any:
+    """Rendered file contents are recorded by size and hash, not byte for byte."""
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes sha1={hashlib.sha1(value).hexdigest()}>"
+    if hasattr(value, 'read') and hasattr(value, 'seek'):
+        if value.closed:
+            return "<stream>"
+        # Hashed from the start in blocks, then put back where it was
+        position = value.tell()
+        value.seek(0)
+        digest, size = hashlib.sha1(), 0
+        for block in iter(lambda: value.read(1024 * 1024), b""):
+            digest.update(block)
+            size += len(block)
+        value.seek(position)
+        return f"<{size} bytes sha1={digest.hexdigest()}>"
+    return value
+
+
+def _fingerprint(service: str, method: str, args: tuple, kwargs: Dict) -> str:
+    """Stable key for a call (arguments are serialized with sorted keys)."""
+    payload = json.dumps([service, method, [_recordable(arg) for arg in args], kwargs], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _first_arg(args: tuple) -> Optional[str]:
+    """First positional argument (usually a file or folder ID) as a looser match key."""
+    return str(args[0]) if args else None
+
+
+class Cassette:
+    """Recorded service interactions, stored as one JSON file."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.interactions: List[Dict] = []
+        self._lock = threading.Lock()
+        self._index: Dict[tuple, List[int]] = {}
+        self._used = set()
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        cassette = cls(path)
+        with open(cassette.path, 'r') as f:
+            cassette.interactions = json.load(f).get('interactions', [])
+        cassette._build_index()
+        logger.info(f"📼 Loaded {len(cassette.interactions)} interactions from {cassette.path}")
+        return cassette
+
+    def _build_index(self):
+        """Index interactions by exact call, by (method, first arg) and by method."""
+        self._index = {}
+        for position, interaction in enumerate(self.interactions):
+            service, method = interaction['service'], interaction['method']
+            for key in (
+                ('exact', interaction['fingerprint']),
+                ('arg', service, method, interaction.get('first_arg')),
+                ('method', service, method),
+            ):
+                self._index.setdefault(key, []).append(position)
+
+    def record(self, interaction: Dict):
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def save(self):
+        """Atomically write the cassette."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'recorded_at': time.time(), 'interactions': self.interactions}, f, indent=1, default=str)
+        os.replace(tmp_path, self.path)
+        logger.info(f"📼 Saved {len(self.interactions)} interactions to {self.path}")
+
+    def match(self, service: str, method: str, args: tuple, kwargs: Dict, strict: bool = False) -> Dict:
+        """
+        Find the recorded interaction for a call.
+
+        Calls are matched exactly first. Unless strict, a call whose arguments
+        differ (e.g. a prompt that contains today's date) falls back to the
+        same method on the same file/folder, then to the same method. Repeated
+        calls consume recordings in order and reuse the last one when exhausted.
+        """
+        keys = [('exact', _fingerprint(service, method, args, kwargs))]
+        if not strict:
+            keys += [('arg', service, method, _first_arg(args)), ('method', service, method)]
+
+        with self._lock:
+            for key in keys:
+                positions = self._index.get(key)
+                if not positions:
+                    continue
+                for position in positions:
+                    if position not in self._used:
+                        self._used.add(position)
+                        return self.interactions[position]
+                return self.interactions[positions[-1]]
+        raise CassetteMiss(f"No recorded {service}.{method} call for {_first_arg(args)!r}")
+
+
+class LatencyModel:
+    """
+    Latency injected into replayed calls.
+
+    delay = fixed[method] if set, else recorded latency * scale; then
+    multiplied by a seeded random factor in [1 - jitter, 1 + jitter].
+    """
+
+    def __init__(
+        self,
+        scale: Optional[float] = None,
+        fixed: Optional[Dict[str, float]] = None,
+        jitter: Optional[float] = None,
+        seed: int = 0
+    ):
+        self.scale = scale if scale is not None else float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))
+        self.fixed = fixed or {}
+        self.jitter = jitter if jitter is not None else float(os.getenv("CASSETTE_LATENCY_JITTER", "0"))
+        self._random = random.Random(seed)
+
+    def delay(self, method: str, recorded: float) -> float:
+        base = self.fixed.get(method, recorded * self.scale)
+        if self.jitter:
+            base *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, base)
+
+
+def _error_from(interaction: Dict) -> Exception:
+    """Rebuild a recorded exception (builtin types keep their class)."""
+    error_class = getattr(builtins, interaction['error_type'], None)
+    if not (isinstance(error_class, type) and issubclass(error_class, Exception)):
+        error_class = RuntimeError
+    return error_class(interaction['error'])
+
+
+class RecordingService:
+    """Wraps a live service and records every public method call into a cassette."""
+
+    def __init__(self, target: Any, cassette: Cassette, service: str):
+        self._target = target
+        self._cassette = cassette
+        self._service = service
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if name.startswith('_') or name in _NOT_RECORDED or not callable(attribute):
+            return attribute
+
+        def record(args, kwargs, started, result=None, error=None):
+            interaction = {
+                'service': self._service,
+                'method': name,
+                'fingerprint': _fingerprint(self._service, name, args, kwargs),
+                'first_arg': _first_arg(args),
+                'args': [_recordable(arg) for arg in args],
+                'kwargs': kwargs,
+                'latency': time.perf_counter() - started,
+            }
+            if error is not None:
+                interaction['error_type'] = type(error).__name__
+                interaction['error'] = str(error)
+            else:
+                interaction['result'] = result
+            self._cassette.record(interaction)
+
+        if inspect.iscoroutinefunction(attribute):
+            async def async_call(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await attribute(*args, **kwargs)
+                except Exception as e:
+                    record(args, kwargs, started, error=e)
+                    raise
+                record(args, kwargs, started, result=result)
+                return result
+            return async_call
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as e:
+                record(args, kwargs, started, error=e)
+                raise
+            record(args, kwargs, started, result=result)
+            return result
+        return call
+
+
+class ReplayService:
+    """Answers service calls from a cassette, sleeping for the injected latency."""
+
+    # BedrockService methods that block (and are normally run in a thread)
+    SYNC_METHODS = {"invoke_model", "invoke_model_with_tool"}
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        service: str,
+        latency: Optional[LatencyModel] = None,
+        strict: bool = False
+    ):
+        self._cassette = cassette
+        self._service = service
+        self._latency = latency or LatencyModel()
+        self._strict = strict
+        self.calls = 0
+
+    async def wait_for_changes(self, folder_id: str, timeout: float) -> bool:
+        """No change feed when replaying; callers poll."""
+        await asyncio.sleep(timeout)
+        return False
+
+    def _answer(self, name: str, args: tuple, kwargs: Dict):
+        interaction = self._cassette.match(self._service, name, args, kwargs, strict=self._strict)
+        self.calls += 1
+        return interaction, self._latency.delay(name, interaction.get('latency', 0.0))
+
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        if name in self.SYNC_METHODS:
+            def call(*args, **kwargs):
+                interaction, delay = self._answer(name, args, kwargs)
+                time.sleep(delay)
+                if 'error' in interaction:
+                    raise _error_from(interaction)
+                return interaction.get('result')
+            return call
+
+        async def async_call(*args, **kwargs):
+            if name == "initialize":
+                return None
+            interaction, delay = self._answer(name, args, kwargs)
+            await asyncio.sleep(delay)
+            if 'error' in interaction:
+                raise _error_from(interaction)
+            return interaction.get('result')
+        return async_call
+
+
+def recording_box_service(cassette: Cassette):
+    """A live BoxContractService (and its BedrockService) that records into the cassette."""
+    # Imported here so replay works without the Box SDK configuration
+    from bedrock_service import BedrockService
+    from box_contract_service import BoxContractService
+
+    box_service = BoxContractService()
+    box_service._bedrock = RecordingService(BedrockService(), cassette, BEDROCK)
+    return RecordingService(box_service, cassette, BOX)
+
+
+def replay_box_service(cassette: Cassette, latency: Optional[LatencyModel] = None, strict: bool = False):
+    """A BoxContractService stand-in that replays the cassette."""
+    return ReplayService(cassette, BOX, latency=latency, strict=strict)
+
+
+def replay_bedrock_service(cassette: Cassette, latency: Optional[LatencyModel] = None, strict: bool = False):
+    """A BedrockService stand-in that replays the cassette."""
+    return ReplayService(cassette, BEDROCK, latency=latency, strict=strict)
+
+
+async def run_processor(box_service):
+    """Run one contract processing pass against the given Box service."""
+    # Keep retry/checkpoint state of offline runs out of the working directory
+    state_dir = tempfile.mkdtemp(prefix="contract_cassette_")
+    os.environ.setdefault("RETRY_QUEUE_FILE", os.path.join(state_dir, "retry_queue.json"))
+    os.environ.setdefault("CHECKPOINT_DIR", os.path.join(state_dir, "checkpoints"))
+    os.environ.setdefault("REVISION_DIR", os.path.join(state_dir, "revisions"))
+    os.environ.setdefault("CLAUSE_LIBRARY_DB", os.path.join(state_dir, "clause_library.db"))
+
+    from contract_processor import ContractProcessor
+
+    processor = ContractProcessor(box_service=box_service)
+    await processor.initialize()
+    started = time.perf_counter()
+    await processor.process_new_contracts()
+    elapsed = time.perf_counter() - started
+    await processor.pipeline.stop()
+    processor.render_pool.shutdown()
+    logger.info(
+        f"Processed {len(processor.processed_contracts)} contract(s) in {elapsed:.2f}s "
+        f"(state in {state_dir})"
+    )
+    return processor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay Box/Bedrock traffic")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("cassette", help="Cassette JSON file")
+    parser.add_argument("--latency-scale", type=float, default=None,
+                        help="Multiplier for recorded latencies (0 = no delay)")
+    parser.add_argument("--latency", action="append", default=[], metavar="METHOD=SECONDS",
+                        help="Fixed latency for a method, e.g. ask_ai_about_file=2.5")
+    parser.add_argument("--jitter", type=float, default=None, help="Random latency variation, e.g. 0.2 = ±20%%")
+    parser.add_argument("--strict", action="store_true", help="Only replay exactly matching calls")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.mode == "record":
+        cassette = Cassette(args.cassette)
+        try:
+            asyncio.run(run_processor(recording_box_service(cassette)))
+        finally:
+            cassette.save()
+        return
+
+    fixed = {}
+    for entry in args.latency:
+        method, _, seconds = entry.partition("=")
+        fixed[method] = float(seconds)
+    latency = LatencyModel(scale=args.latency_scale, fixed=fixed, jitter=args.jitter)
+    box_service = replay_box_service(Cassette.load(args.cassette), latency=latency, strict=args.strict)
+    asyncio.run(run_processor(box_service))
+    logger.info(f"Replayed {box_service.calls} call(s)")
+
+
+if __name__ == "__main__":
+    main()
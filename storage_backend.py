@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Storage Backends
+Interface for where contracts live and outputs go, so ContractProcessor is
+not tied to Box. AWS Bedrock analysis of stored files is shared by every
+backend.
+
+Backends (STORAGE_BACKEND):
+    box   - BoxContractService (default)
+    local - a directory on local disk (LOCAL_STORAGE_ROOT), with inotify
+            change detection when inotify_simple is installed and polling
+            otherwise
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INOTIFY_AVAILABLE = False
+
+from text_extraction import PDF_EXTRACTION_AVAILABLE, TextExtractor
+
+logger = logging.getLogger(__name__)
+
+ROOT_FOLDER_ID = "0"
+
+
+class StorageBackend:
+    """Interface for storage backends, plus Bedrock analysis of stored files."""
+
+    def __init__(self):
+        self._bedrock = None  # Lazily created, shared BedrockService
+        self.text_extractor = TextExtractor()
+
+    async def initialize(self):
+        """Connect to the storage (authenticate, check paths)."""
+
+    async def list_folder_items(self, folder_id: str) -> List[Dict]:
+        """
+        List a folder.
+
+        Returns:
+            Dicts with id, name, type ('file'/'folder') and, for files, the
+            version metadata sha1, etag, size and modified_at
+        """
+        raise NotImplementedError
+
+    async def get_file_info(self, file_id: str) -> Dict:
+        """Version metadata of a file (same keys as list_folder_items)."""
+        raise NotImplementedError
+
+    async def read_file(self, file_id: str) -> str:
+        """Extract the text content of a file."""
+        raise NotImplementedError
+
+    async def upload_text_file(self, folder_id: str, filename: str, content: str) -> str:
+        """Store a text file in a folder. Returns the new file's ID."""
+        raise NotImplementedError
+
+    async def upload_file(self, folder_id: str, filename: str, data: bytes) -> str:
+        """Store an already rendered file (e.g. DOCX or PDF) in a folder. Returns the new file's ID."""
+        raise NotImplementedError
+
+    async def upload_stream(self, folder_id: str, filename: str, stream: BinaryIO) -> str:
+        """
+        Store a file read from a binary stream (positioned at its start).
+        Backends that can send a stream override this; by default it is read
+        into memory and stored with upload_file.
+        """
+        return await self.upload_file(folder_id, filename, stream.read())
+
+    async def upload_new_version(self, file_id: str, filename: str, stream: BinaryIO) -> str:
+        """
+        Replace the content of an existing file with a binary stream
+        (positioned at its start), keeping it the same file. Returns its ID.
+        """
+        raise NotImplementedError
+
+    async def find_or_create_folder(self, parent_folder_id: str, folder_name: str) -> str:
+        """Find a subfolder by name or create it. Returns the folder ID."""
+        raise NotImplementedError
+
+    async def find_file_in_folder(self, folder_id: str, filename: str) -> Optional[str]:
+        """Find a file by name in a folder. Returns file ID or None."""
+        for item in await self.list_folder_items(folder_id):
+            if item['type'] == 'file' and item['name'] == filename:
+                return item['id']
+        return None
+
+    async def wait_for_changes(self, folder_id: str, timeout: float) -> bool:
+        """
+        Change feed: wait until something in the folder changes.
+
+        The default has no change notifications and simply waits out the
+        timeout, so callers fall back to polling.
+
+        Returns:
+            True if a change was seen before the timeout
+        """
+        await asyncio.sleep(timeout)
+        return False
+
+    def close(self):
+        """Release local resources (the text extraction pool) and log extraction metrics."""
+        self.text_extractor.shutdown()
+        self.text_extractor.log_metrics()
+
+    async def get_current_user_email(self) -> Optional[str]:
+        """Email of the storage account owner, if the backend knows it."""
+        return None
+
+    async def ask_ai_about_file(
+        self, file_id: str, prompt: str, contract_text: Optional[str] = None
+    ) -> str:
+        """
+        Use AWS Bedrock to analyze a file.
+        Reads the file from storage and sends it to Bedrock for analysis.
+        Pass contract_text when the caller already has the file content to skip
+        the extra text extraction.
+        """
+        try:
+            # Read the file content first (unless already provided)
+            if contract_text is None:
+                contract_text = await self.read_file(file_id)
+
+            bedrock = self._get_bedrock()
+
+            # Use Bedrock to analyze the contract
+            logger.info(f"Using AWS Bedrock to analyze file {file_id}")
+            result = await bedrock.analyze_contract(
+                contract_text=contract_text,
+                prompt=prompt,
+                max_tokens=8192,
+                temperature=0.7
+            )
+
+            if not result or len(result.strip()) < 10:
+                logger.warning(f"Bedrock returned very short or empty response")
+                raise ValueError("Bedrock returned empty or invalid response")
+
+            return result
+
+        except ImportError:
+            logger.error("BedrockService not found. Please ensure bedrock_service.py exists.")
+            raise
+        except Exception as e:
+            logger.error(f"Error calling Bedrock: {e}")
+            raise
+
+    async def ask_ai_structured(
+        self,
+        file_id: str,
+        prompt: str,
+        tool: Dict,
+        contract_text: Optional[str] = None
+    ) -> Dict:
+        """
+        Use AWS Bedrock tool use to get a JSON answer about a file.
+        The file text is appended to the prompt, as in ask_ai_about_file.
+        """
+        try:
+            if contract_text is None:
+                contract_text = await self.read_file(file_id)
+
+            full_prompt = f"""{prompt}
+
+CONTRACT TEXT:
+{contract_text}"""
+
+            logger.info(f"Using AWS Bedrock (structured output) to analyze file {file_id}")
+            return await self._get_bedrock().generate_structured(full_prompt, tool)
+
+        except Exception as e:
+            logger.error(f"Error calling Bedrock: {e}")
+            raise
+
+    async def generate_structured(self, prompt: str, tool: Dict) -> Dict:
+        """Use AWS Bedrock tool use for a prompt that does not need a file."""
+        return await self._get_bedrock().generate_structured(prompt, tool)
+
+    def _get_bedrock(self):
+        """Get the shared Bedrock service, creating it on first use."""
+        if self._bedrock is None:
+            # Import BedrockService here to avoid circular imports
+            from bedrock_service import BedrockService
+            self._bedrock = BedrockService()
+        return self._bedrock
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Contracts and outputs in a local directory tree.
+
+    IDs are paths relative to the root directory ("0" is the root itself),
+    so the Box folder layout maps onto plain subdirectories.
+    """
+
+    def __init__(self, root: Optional[str] = None, poll_interval: Optional[float] = None):
+        super().__init__()
+        self.root = Path(
+            root or os.getenv("LOCAL_STORAGE_ROOT", str(Path(__file__).parent / "local_storage"))
+        ).resolve()
+        self.poll_interval = poll_interval or float(os.getenv("LOCAL_POLL_INTERVAL", "1"))
+        # path -> (mtime_ns, size, sha1), so unchanged files are not rehashed; one
+        # entry per path, replaced when the file changes
+        self._sha1_cache: Dict[str, Tuple[int, int, str]] = {}
+        # inotify watches by folder ID, each read by one waiter at a time
+        self._watches: Dict[str, "INotify"] = {}
+        self._watch_locks: Dict[str, asyncio.Lock] = {}
+        self._changes_seen: Dict[str, int] = {}  # changes read per folder, for the waiters queued behind
+
+    async def initialize(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        mode = "inotify" if INOTIFY_AVAILABLE else f"polling every {self.poll_interval:g}s"
+        logger.info(f"Local storage initialized at {self.root} (change detection: {mode})")
+
+    def _path(self, item_id: str) -> Path:
+        """Resolve an ID to a path, refusing anything outside the root."""
+        if item_id in (ROOT_FOLDER_ID, "", None):
+            return self.root
+        path = (self.root / item_id).resolve()
+        if path != self.root and self.root not in path.parents:
+            raise ValueError(f"Invalid ID outside local storage root: {item_id}")
+        return path
+
+    def _id(self, path: Path) -> str:
+        if path == self.root:
+            return ROOT_FOLDER_ID
+        return path.relative_to(self.root).as_posix()
+
+    def _sha1(self, path: Path, stat: os.stat_result) -> str:
+        cached = self._sha1_cache.get(str(path))
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(block)
+        digest = sha1.hexdigest()
+        self._sha1_cache[str(path)] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _describe(self, path: Path) -> Dict:
+        stat = path.stat()
+        if path.is_dir():
+            return {'id': self._id(path), 'name': path.name, 'type': 'folder'}
+        return {
+            'id': self._id(path),
+            'name': path.name,
+            'type': 'file',
+            'sha1': self._sha1(path, stat),
+            'etag': str(stat.st_mtime_ns),
+            'size': stat.st_size,
+            'modified_at': datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+        }
+
+    def _list(self, folder_id: str) -> List[Dict]:
+        folder = self._path(folder_id)
+        if not folder.is_dir():
+            raise ValueError(f"Invalid folder_id: {folder_id}. Cannot list folder items.")
+        items = []
+        for path in sorted(folder.iterdir()):
+            # Skip our own in-progress writes
+            if path.name.startswith('.') or path.suffix == '.tmp':
+                continue
+            items.append(self._describe(path))
+        # Forget the hashes of files deleted from the folder
+        listed = {str(folder / item['name']) for item in items}
+        for key in [key for key in self._sha1_cache if Path(key).parent == folder and key not in listed]:
+            del self._sha1_cache[key]
+        return items
+
+    async def list_folder_items(self, folder_id: str) -> List[Dict]:
+        return await asyncio.to_thread(self._list, folder_id)
+
+    async def get_file_info(self, file_id: str) -> Dict:
+        return await asyncio.to_thread(self._describe, self._path(file_id))
+
+    async def read_file(self, file_id: str) -> str:
+        try:
+            path = self._path(file_id)
+            text = await self.text_extractor.extract(await asyncio.to_thread(path.read_bytes), path.name)
+            if text is None:
+                hint = " (PDF text needs pypdf)" if not PDF_EXTRACTION_AVAILABLE else ""
+                raise ValueError(f"Cannot extract text from {path.name}{hint}")
+            return text
+        except Exception as e:
+            logger.error(f"Error reading file {file_id}: {e}")
+            raise
+
+    def _write(self, folder_id: str, filename: str, data: bytes) -> str:
+        path = self._path(folder_id) / filename
+        tmp_path = path.with_name(f".{filename}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return self._id(path)
+
+    async def upload_text_file(self, folder_id: str, filename: str, content: str) -> str:
+        file_id = await asyncio.to_thread(self._write, folder_id, filename, content.encode('utf-8'))
+        logger.info(f"Uploaded file: {filename}")
+        return file_id
+
+    async def upload_file(self, folder_id: str, filename: str, data: bytes) -> str:
+        file_id = await asyncio.to_thread(self._write, folder_id, filename, data)
+        logger.info(f"Uploaded file: {filename}")
+        return file_id
+
+    def _write_stream(self, folder_id: str, filename: str, stream: BinaryIO) -> str:
+        path = self._path(folder_id) / filename
+        tmp_path = path.with_name(f".{filename}.tmp")
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(stream, f)
+        os.replace(tmp_path, path)
+        return self._id(path)
+
+    async def upload_stream(self, folder_id: str, filename: str, stream: BinaryIO) -> str:
+        file_id = await asyncio.to_thread(self._write_stream, folder_id, filename, stream)
+        logger.info(f"Uploaded file: {filename}")
+        return file_id
+
+    async def upload_new_version(self, file_id: str, filename: str, stream: BinaryIO) -> str:
+        # Local files have no version history: the new content replaces the old
+        folder_id = self._id(self._path(file_id).parent)
+        new_file_id = await asyncio.to_thread(self._write_stream, folder_id, filename, stream)
+        logger.info(f"Uploaded new version of {filename}")
+        return new_file_id
+
+    async def upload_document_file(
+        self, folder_id: str, filename: str, content: str, file_type: str = "docx"
+    ) -> str:
+        """Write a formatted document file (DOCX or PDF)."""
+        from document_generator import create_docx_from_text, create_pdf_from_text
+
+        if filename.endswith('.docx') or file_type.lower() == 'docx':
+            file_bytes = await asyncio.to_thread(create_docx_from_text, content, None)
+        elif filename.endswith('.pdf') or file_type.lower() == 'pdf':
+            file_bytes = await asyncio.to_thread(create_pdf_from_text, content, None)
+        else:
+            logger.warning(f"Unknown file type for {filename}, using plain text")
+            file_bytes = content.encode('utf-8')
+        file_id = await asyncio.to_thread(self._write, folder_id, filename, file_bytes)
+        logger.info(f"Uploaded formatted document: {filename}")
+        return file_id
+
+    async def find_or_create_folder(self, parent_folder_id: str, folder_name: str) -> str:
+        path = self._path(parent_folder_id) / folder_name
+        await asyncio.to_thread(path.mkdir, parents=True, exist_ok=True)
+        return self._id(path)
+
+    async def find_file_in_folder(self, folder_id: str, filename: str) -> Optional[str]:
+        path = self._path(folder_id) / filename
+        return self._id(path) if path.is_file() else None
+
+    def close(self):
+        """Close the inotify watches, then the shared resources."""
+        for watcher in self._watches.values():
+            watcher.close()
+        self._watches.clear()
+        self._watch_locks.clear()
+        super().close()
+
+    def _snapshot(self, folder: Path) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in folder.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[path.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _watcher(self, folder_id: str) -> "INotify":
+        watcher = self._watches.get(folder_id)
+        if watcher is None:
+            watcher = INotify()
+            mask = (
+                inotify_flags.CREATE | inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO
+                | inotify_flags.MOVED_FROM | inotify_flags.DELETE
+            )
+            watcher.add_watch(str(self._path(folder_id)), mask)
+            self._watches[folder_id] = watcher
+        return watcher
+
+    async def _wait_inotify(self, folder_id: str) -> bool:
+        """
+        Wait for a change event on the folder's watch. The inotify descriptor
+        is read on the event loop (no blocking thread is left behind when the
+        wait is cancelled), and by one waiter at a time; a change read while
+        a waiter was queued counts for it too.
+        """
+        watcher = self._watcher(folder_id)
+        loop = asyncio.get_running_loop()
+        seen = self._changes_seen.get(folder_id, 0)
+        async with self._watch_locks.setdefault(folder_id, asyncio.Lock()):
+            while True:
+                if self._changes_seen.get(folder_id, 0) != seen:
+                    return True
+                readable = loop.create_future()
+                loop.add_reader(watcher.fileno(), lambda: readable.done() or readable.set_result(None))
+                try:
+                    await readable
+                finally:
+                    loop.remove_reader(watcher.fileno())
+                # Our own atomic writes show up as dotfile temp names
+                if any(not event.name.startswith('.') for event in watcher.read(timeout=0)):
+                    self._changes_seen[folder_id] = self._changes_seen.get(folder_id, 0) + 1
+                    return True
+
+    async def wait_for_changes(self, folder_id: str, timeout: float) -> bool:
+        if INOTIFY_AVAILABLE:
+            try:
+                return await asyncio.wait_for(self._wait_inotify(folder_id), timeout)
+            except asyncio.TimeoutError:
+                return False
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"inotify unavailable ({e}), polling instead")
+
+        folder = self._path(folder_id)
+        before = await asyncio.to_thread(self._snapshot, folder)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(min(self.poll_interval, deadline - loop.time()))
+            if await asyncio.to_thread(self._snapshot, folder) != before:
+                return True
+        return False
+
+
+def create_storage_backend() -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND."""
+    backend = os.getenv("STORAGE_BACKEND", "box").lower()
+    if backend == "box":
+        # Imported here so the local backend works without the Box SDK setup
+        from box_contract_service import BoxContractService
+        return BoxContractService()
+    if backend == "local":
+        return LocalStorageBackend()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
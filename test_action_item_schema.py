@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for schema-validated action item extraction: the compiled item
+validator and the repair round-trip that sends only malformed items back to
+the model. Runs offline.
+
+Usage:
+    python -m pytest test_action_item_schema.py
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import date, timedelta
+
+from action_item_detector import ACTION_ITEMS_TOOL, ActionItemDetector, _validate_action_item
+
+DUE = (date.today() + timedelta(days=7)).isoformat()
+VALID = {
+    'type': "payment_due",
+    'description': "Invoice 12 is due",
+    'due_date': DUE,
+    'priority': "high",
+    'action_required': "Pay invoice 12",
+}
+
+
+class FakeModel:
+    """Answers the extraction call and each repair call with canned tool input."""
+
+    def __init__(self, extracted, repairs=()):
+        self.extracted = extracted
+        self.repairs = list(repairs)
+        self.repair_prompts = []
+
+    async def ask_ai_structured(self, file_id, prompt, tool, contract_text=None):
+        assert tool is ACTION_ITEMS_TOOL
+        return self.extracted
+
+    async def generate_structured(self, prompt, tool):
+        self.repair_prompts.append(prompt)
+        repair = self.repairs.pop(0)
+        if isinstance(repair, Exception):
+            raise repair
+        return repair
+
+
+def analyze(model: FakeModel) -> list:
+    with tempfile.TemporaryDirectory() as directory:
+        saved = os.environ.get("NOTIFICATION_OUTBOX_FILE")
+        os.environ["NOTIFICATION_OUTBOX_FILE"] = os.path.join(directory, "outbox.json")
+        try:
+            detector = ActionItemDetector()
+        finally:
+            if saved is None:
+                del os.environ["NOTIFICATION_OUTBOX_FILE"]
+            else:
+                os.environ["NOTIFICATION_OUTBOX_FILE"] = saved
+        return asyncio.run(detector.analyze_contract_for_action_items(model, "1", "lease.pdf", "1. Rent"))
+
+
+def test_validator_accepts_schema_items():
+    assert _validate_action_item(VALID) == []
+    assert _validate_action_item(dict(VALID, due_date=None)) == []
+
+
+def test_validator_reports_each_problem():
+    assert _validate_action_item(["not", "an", "object"]) == ["item is not an object"]
+    assert _validate_action_item({k: v for k, v in VALID.items() if k != 'priority'}) == [
+        "missing required field 'priority'"
+    ]
+    assert _validate_action_item(dict(VALID, type="deadline")) == [
+        "'type' must be one of ['audit_due', 'expiration', 'notice_period', 'other', 'payment_due', 'renewal']"
+    ]
+    assert _validate_action_item(dict(VALID, due_date="March 3, 2026")) == [
+        r"'due_date' does not match ^\d{4}-\d{2}-\d{2}$"
+    ]
+    assert _validate_action_item(dict(VALID, due_date="2026-02-30")) == ["'due_date' is not a valid calendar date"]
+    assert _validate_action_item(dict(VALID, description="  ")) == ["'description' is empty"]
+    assert _validate_action_item(dict(VALID, priority=1)) == ["'priority' has wrong type int"]
+
+
+def test_only_malformed_items_are_repaired():
+    broken = dict(VALID, description="Audit window opens", type="audit", due_date="2026/03/01")
+    fixed = dict(broken, type="audit_due", due_date=DUE)
+    model = FakeModel({'action_items': [VALID, broken]}, repairs=[{'action_items': [fixed]}])
+    items = analyze(model)
+
+    assert len(model.repair_prompts) == 1
+    assert "Audit window opens" in model.repair_prompts[0] and "Invoice 12" not in model.repair_prompts[0]
+    assert [item['type'] for item in items] == ["payment_due", "audit_due"]
+    assert {item['contract'] for item in items} == {"lease.pdf"}
+    # Days until due are computed locally from the validated date
+    assert {item['days_until_due'] for item in items} == {7}
+
+
+def test_unrepairable_items_are_dropped():
+    broken = dict(VALID, priority="critical")
+    items = analyze(FakeModel({'action_items': [VALID, broken]}, repairs=[{'action_items': [broken]}]))
+    assert [item['description'] for item in items] == ["Invoice 12 is due"]
+
+    # A failed repair call keeps the valid items
+    items = analyze(FakeModel({'action_items': [VALID, broken]}, repairs=[ConnectionError("throttled")]))
+    assert [item['description'] for item in items] == ["Invoice 12 is due"]
+
+
+def test_valid_response_needs_no_repair_and_malformed_response_gives_nothing():
+    model = FakeModel({'action_items': [dict(VALID, due_date=None)]})
+    items = analyze(model)
+    assert model.repair_prompts == []
+    assert 'days_until_due' not in items[0]
+    assert analyze(FakeModel({'action_items': "none"})) == []
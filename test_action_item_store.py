@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar action item store: urgency and due-date window
+queries against the dict-based filters they replaced, and growing the
+store. Runs offline.
+
+Usage:
+    python -m pytest test_action_item_store.py
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from action_item_detector import ACTION_ITEM_TYPES
+from action_item_store import ANY_ITEM_URGENT_DAYS, URGENCY_WINDOWS, ActionItemStore
+from benchmark_action_items import dict_path_urgent, dict_path_window, generate_items
+
+TODAY = date(2026, 3, 10)
+
+
+def make_item(item_type: str, days_until_due, contract: str = "lease.pdf") -> dict:
+    item = {'type': item_type, 'description': f"{item_type} deadline", 'priority': "high", 'contract': contract}
+    if days_until_due is not None:
+        item['due_date'] = (TODAY + timedelta(days=days_until_due)).isoformat()
+        item['days_until_due'] = days_until_due
+    return item
+
+
+def edge_items() -> list:
+    """Every type at and around its urgency window edges, plus undated items."""
+    items = [make_item(item_type, None) for item_type in ACTION_ITEM_TYPES]
+    for item_type in ACTION_ITEM_TYPES:
+        window = URGENCY_WINDOWS.get(item_type, ANY_ITEM_URGENT_DAYS)
+        for days in sorted({-30, -1, 0, 1, ANY_ITEM_URGENT_DAYS, ANY_ITEM_URGENT_DAYS + 1, window, window + 1, 60}):
+            items.append(make_item(item_type, days))
+    return items
+
+
+def test_urgent_indices_match_dict_filter():
+    items = edge_items()
+    store = ActionItemStore.from_items(items)
+    assert [items[i] for i in store.urgent_indices(TODAY).tolist()] == dict_path_urgent(items)
+
+
+def test_urgent_indices_match_dict_filter_on_portfolio():
+    items = generate_items(200, 5, seed=7)
+    store = ActionItemStore.from_items(items)
+    today = date.today()
+    assert [items[i] for i in store.urgent_indices(today).tolist()] == dict_path_urgent(items)
+    assert [items[i] for i in store.due_within(30, ['renewal', 'expiration'], today).tolist()] == \
+        dict_path_window(items, 30, ['renewal', 'expiration'])
+
+
+def test_overdue_and_undated_items():
+    items = [make_item('renewal', -3), make_item('renewal', -30), make_item('other', None)]
+    store = ActionItemStore.from_items(items)
+    # Overdue items stay urgent; items without a due date never are
+    assert store.urgent_indices(TODAY).tolist() == [0, 1]
+    assert store.due_within(365, today=TODAY).tolist() == []
+
+
+def test_due_within_window_edges():
+    items = [make_item('payment_due', days) for days in (-1, 0, 7, 8, None)]
+    store = ActionItemStore.from_items(items)
+    # Today and the last day of the window are both inside it
+    assert store.due_within(7, today=TODAY).tolist() == [1, 2]
+    assert store.due_within(0, today=TODAY).tolist() == [1]
+    assert store.due_within(-1, today=TODAY).tolist() == []
+
+
+def test_due_within_by_type():
+    items = [make_item('renewal', 3), make_item('audit_due', 3), make_item('other', 3)]
+    store = ActionItemStore.from_items(items)
+    assert store.due_within(5, ['renewal', 'audit_due'], TODAY).tolist() == [0, 1]
+    # Unknown type names select nothing rather than raising
+    assert store.due_within(5, ['no_such_type'], TODAY).tolist() == []
+    assert store.due_within(5, [], TODAY).tolist() == [0, 1, 2]
+
+
+def test_extend_grows_the_store():
+    store = ActionItemStore(capacity=2)
+    store.extend([])
+    assert len(store) == 0
+    assert store.urgent_indices(TODAY).tolist() == []
+
+    store.extend(make_item('renewal', days, contract=f"c{days % 3}.pdf") for days in range(5))
+    store.extend([make_item('expiration', 40, contract="c0.pdf")])
+    assert len(store) == 6
+    assert len(store.due_ordinal) >= 6
+    assert store.contracts == ["c0.pdf", "c1.pdf", "c2.pdf"]
+    assert store.due_within(4, today=TODAY).tolist() == [0, 1, 2, 3, 4]
+
+    items = store.to_items(store.due_within(365, ['expiration'], TODAY), TODAY)
+    assert items == [{
+        'type': 'expiration', 'description': "expiration deadline", 'priority': "high",
+        'action_required': '', 'contract': "c0.pdf",
+        'due_date': (TODAY + timedelta(days=40)).isoformat(), 'days_until_due': 40,
+    }]
+
+
+def test_unknown_type_and_priority_fall_back():
+    store = ActionItemStore.from_items([{'type': 'lunch', 'priority': 'whenever', 'due_date': "not a date"}])
+    item = store.to_items(np.arange(len(store)), TODAY)[0]
+    assert (item['type'], item['priority'], item['contract']) == ('other', 'medium', 'Unknown')
+    assert 'due_date' not in item
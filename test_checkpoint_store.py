@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for contract checkpoints: saving and loading, discarding a checkpoint
+of another file version, and resuming an interrupted contract against the
+benchmark's in-memory Box without generating its artifacts again. Runs
+offline.
+
+Usage:
+    python -m pytest test_checkpoint_store.py
+"""
+
+import asyncio
+import os
+import tempfile
+
+from benchmark_pipeline import FakeBox, generate_corpus
+from checkpoint_store import CheckpointStore
+
+KEY = "lease_1001"
+
+
+def test_save_and_load():
+    with tempfile.TemporaryDirectory() as directory:
+        store = CheckpointStore(directory)
+        assert store.load(KEY) == {}
+        store.save(KEY, {'version': "abc", 'contract_category': "Lease and Rent Agreement"})
+        assert CheckpointStore(directory).load(KEY, "abc") == {
+            'version': "abc", 'contract_category': "Lease and Rent Agreement", 'key': KEY
+        }
+        # Written atomically: no temporary file is left behind
+        assert [path.suffix for path in store.directory.iterdir()] == [".json"]
+        store.delete(KEY)
+        store.delete(KEY)
+        assert store.load(KEY) == {}
+
+
+def test_checkpoint_of_another_version_is_discarded():
+    with tempfile.TemporaryDirectory() as directory:
+        store = CheckpointStore(directory)
+        store.save(KEY, {'version': "abc", 'artifacts': {'mirror': "..."}})
+        # Without a known current version the checkpoint is used as is
+        assert store.load(KEY)['artifacts'] == {'mirror': "..."}
+        assert store.load(KEY, "def") == {}
+        assert store.load(KEY, "abc") == {}
+
+
+def test_unreadable_checkpoint_is_ignored():
+    with tempfile.TemporaryDirectory() as directory:
+        store = CheckpointStore(directory)
+        store.save(KEY, {'version': "abc"})
+        store._path(KEY).write_text("{not json")
+        assert store.load(KEY, "abc") == {}
+
+
+def make_processor(directory: str):
+    """A processor on a FakeBox holding one contract, uploading plain text outputs."""
+    from contract_processor import ContractProcessor
+    settings = {
+        "RETRY_QUEUE_FILE": os.path.join(directory, "retry_queue.json"),
+        "CHECKPOINT_DIR": os.path.join(directory, "checkpoints"),
+        "REVISION_DIR": os.path.join(directory, "revisions"),
+        "OUTPUT_FORMATS_MIRROR": "txt",
+        "OUTPUT_FORMATS_REDLINE": "txt",
+        "OUTPUT_FORMATS_GUIDE": "txt",
+    }
+    saved = {name: os.environ.get(name) for name in settings}
+    os.environ.update(settings)
+    try:
+        box = FakeBox(generate_corpus(1), time_scale=0)
+        processor = ContractProcessor(box_service=box)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return processor, box
+
+
+def test_interrupted_contract_resumes_from_checkpoint():
+    with tempfile.TemporaryDirectory() as directory:
+        processor, box = make_processor(directory)
+        asyncio.run(processor.initialize())
+        contract = next(item for item in box.items[box.contracts_folder_id] if item['id'] in box.categories)
+        file_id, filename = contract['id'], contract['name']
+        contract_name = filename.rsplit(".", 1)[0]
+
+        upload_text_file = box.upload_text_file
+        uploads = []
+        failures = [2]  # the second upload fails once
+
+        async def flaky_upload(folder_id, name, content):
+            uploads.append(name)
+            if len(uploads) in failures:
+                failures.clear()
+                raise ConnectionError("connection reset")
+            return await upload_text_file(folder_id, name, content)
+
+        box.upload_text_file = flaky_upload
+        try:
+            asyncio.run(processor.process_contract(file_id, filename, contract_name))
+            raise AssertionError("processing should have failed")
+        except ConnectionError:
+            pass
+        checkpoint = processor.checkpoints.load(f"{contract_name}_{file_id}")
+        assert {'mirror', 'guide'} <= set(checkpoint['artifacts'])
+        assert checkpoint['uploaded'] == [uploads[0]]
+        bedrock_calls = box.tokens[file_id]['calls']
+
+        # The restarted run generates nothing again and uploads only what is missing
+        uploads.clear()
+        asyncio.run(processor.process_contract(file_id, filename, contract_name))
+        assert box.tokens[file_id]['calls'] == bedrock_calls
+        assert len(uploads) == 2 and checkpoint['uploaded'][0] not in uploads
+        processor.render_pool.shutdown()
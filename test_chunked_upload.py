@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for chunked uploads against an in-memory stand-in for Box's upload
+session API: part upload and commit, resume after an interrupted upload,
+restart of a stale session and commit retries. Runs offline.
+
+Usage:
+    python -m pytest test_chunked_upload.py
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import tempfile
+from types import SimpleNamespace
+
+from box_sdk_gen import UploadPart
+
+import chunked_upload
+from chunked_upload import ChunkedUploader, UploadSessionStore
+
+PART_SIZE = 1000
+DATA = bytes(range(256)) * 15  # 3840 bytes: three full parts and a short one
+
+
+class FakeChunkedUploads:
+    """Box's chunked_uploads manager, holding sessions and their parts in memory."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.created = 0
+        self.part_calls = []
+        self.aborted = []
+        self.commits = []
+        self.fail_part_at = set()
+        self.pending_commits = 0
+
+    def _create(self, size: int) -> SimpleNamespace:
+        self.created += 1
+        session_id = f"s{self.created}"
+        self.sessions[session_id] = {}
+        return SimpleNamespace(
+            id=session_id, part_size=PART_SIZE, total_parts=-(-size // PART_SIZE), session_expires_at=None
+        )
+
+    def create_file_upload_session(self, folder_id, size, filename):
+        return self._create(size)
+
+    def create_file_upload_session_for_existing_file(self, file_id, size, file_name=None):
+        return self._create(size)
+
+    def get_file_upload_session_parts(self, session_id, offset=0, limit=1000):
+        if session_id not in self.sessions:
+            raise RuntimeError("404 session not found")
+        parts = sorted(self.sessions[session_id].values(), key=lambda part: part.offset)
+        return SimpleNamespace(entries=parts[offset:offset + limit], total_count=len(parts))
+
+    def upload_file_part(self, session_id, stream, digest, content_range):
+        offset = int(content_range.split()[1].split("-")[0])
+        self.part_calls.append((session_id, offset))
+        if offset in self.fail_part_at:
+            self.fail_part_at.discard(offset)
+            raise ConnectionError("connection reset")
+        chunk = stream.read()
+        assert digest == "sha=" + base64.b64encode(hashlib.sha1(chunk).digest()).decode('ascii')
+        part = UploadPart(part_id=f"p{offset}", offset=offset, size=len(chunk), sha_1=hashlib.sha1(chunk).hexdigest())
+        self.sessions[session_id][offset] = part
+        return SimpleNamespace(part=part)
+
+    def delete_file_upload_session_by_id(self, session_id):
+        self.aborted.append(session_id)
+        self.sessions.pop(session_id, None)
+
+    def create_file_upload_session_commit(self, session_id, parts, digest):
+        self.commits.append((session_id, [part.offset for part in parts], digest))
+        if self.pending_commits:
+            # Box answers 202 while it is still processing the parts
+            self.pending_commits -= 1
+            return None
+        return SimpleNamespace(entries=[SimpleNamespace(id="file-1")])
+
+
+def make_uploader(directory: str, concurrency: int = 2):
+    uploads = FakeChunkedUploads()
+    client = SimpleNamespace(chunked_uploads=uploads)
+    return ChunkedUploader(client, UploadSessionStore(directory), concurrency=concurrency), uploads
+
+
+def upload(uploader: ChunkedUploader, data: bytes = DATA, size: int = None) -> str:
+    return asyncio.run(uploader.upload("folder-1", "contract.pdf", io.BytesIO(data), size or len(data)))
+
+
+def test_upload_sends_every_part_and_commits():
+    with tempfile.TemporaryDirectory() as directory:
+        uploader, uploads = make_uploader(directory)
+        assert upload(uploader) == "file-1"
+        assert sorted(offset for _, offset in uploads.part_calls) == [0, 1000, 2000, 3000]
+        session_id, offsets, digest = uploads.commits[0]
+        assert offsets == [0, 1000, 2000, 3000]
+        assert digest == "sha=" + base64.b64encode(hashlib.sha1(DATA).digest()).decode('ascii')
+        # A committed session is forgotten
+        assert list(uploader.sessions.directory.glob("*.json")) == []
+
+
+def test_interrupted_upload_resumes_with_uploaded_parts():
+    with tempfile.TemporaryDirectory() as directory:
+        uploader, uploads = make_uploader(directory, concurrency=1)
+        uploads.fail_part_at = {2000}
+        try:
+            upload(uploader)
+            raise AssertionError("upload should have failed")
+        except ConnectionError:
+            pass
+        assert uploads.aborted == []
+        assert len(list(uploader.sessions.directory.glob("*.json"))) == 1
+
+        # The next attempt (e.g. after a restart) only sends the missing part
+        uploads.part_calls.clear()
+        resumed = ChunkedUploader(uploader.client, UploadSessionStore(directory), concurrency=1)
+        assert upload(resumed) == "file-1"
+        assert uploads.part_calls == [("s1", 2000)]
+        assert uploads.commits[0][:2] == ("s1", [0, 1000, 2000, 3000])
+
+
+def test_stale_session_is_restarted():
+    with tempfile.TemporaryDirectory() as directory:
+        uploader, uploads = make_uploader(directory)
+        uploads.fail_part_at = {3000}
+        try:
+            upload(uploader)
+        except ConnectionError:
+            pass
+
+        # Same name and size, different content: the old parts must not be reused
+        changed = bytes(reversed(DATA))
+        uploads.part_calls.clear()
+        assert upload(uploader, changed) == "file-1"
+        assert uploads.aborted == ["s1"]
+        assert sorted(uploads.part_calls) == [("s2", 0), ("s2", 1000), ("s2", 2000), ("s2", 3000)]
+        assert uploads.commits[0][2] == "sha=" + base64.b64encode(hashlib.sha1(changed).digest()).decode('ascii')
+
+
+def test_short_stream_aborts_the_session():
+    with tempfile.TemporaryDirectory() as directory:
+        uploader, uploads = make_uploader(directory, concurrency=1)
+        try:
+            upload(uploader, DATA, size=len(DATA) + PART_SIZE)
+            raise AssertionError("upload should have failed")
+        except ValueError as e:
+            assert "ended after 3840" in str(e)
+        assert uploads.aborted == ["s1"]
+        assert list(uploader.sessions.directory.glob("*.json")) == []
+
+
+def test_commit_is_retried_while_box_processes_parts():
+    delay = chunked_upload.COMMIT_RETRY_DELAY
+    chunked_upload.COMMIT_RETRY_DELAY = 0
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            uploader, uploads = make_uploader(directory)
+            uploads.pending_commits = 2
+            assert upload(uploader) == "file-1"
+            assert len(uploads.commits) == 3
+
+            uploads.pending_commits = chunked_upload.COMMIT_ATTEMPTS
+            try:
+                upload(uploader)
+                raise AssertionError("commit should have failed")
+            except RuntimeError as e:
+                assert "not committed" in str(e)
+    finally:
+        chunked_upload.COMMIT_RETRY_DELAY = delay
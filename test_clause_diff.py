@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for the clause diff: clause alignment (renumbered, modified, added,
+deleted and moved clauses) and word-level diff segments. Runs offline.
+
+Usage:
+    python -m pytest test_clause_diff.py
+"""
+
+from clause_diff import (
+    ADDED, DELETE, DELETED, EQUAL, INSERT, MODIFIED, RENUMBERED, UNCHANGED, align_clauses, split_clauses,
+    summarize, word_diff, word_segments
+)
+
+DEFINITIONS = "Definitions\nIn this Agreement, Services means the consulting services described in Schedule A."
+PAYMENT = "Payment\nThe Client shall pay each invoice within thirty days of receipt."
+CONFIDENTIALITY = "Confidentiality\nEach party shall keep the other party's confidential information secret."
+TERMINATION = "Termination\nEither party may terminate this Agreement on ninety days written notice."
+
+
+def contract(*clauses: str) -> str:
+    """Number the clauses 1., 2., ... in order."""
+    return "\n\n".join(f"{number}. {clause}" for number, clause in enumerate(clauses, 1)) + "\n"
+
+
+def align(original: str, revised: str):
+    return align_clauses(split_clauses(original), split_clauses(revised))
+
+
+def statuses(changes) -> list:
+    return [(change.status, change.moved) for change in changes]
+
+
+def test_split_clauses_at_numbered_headings():
+    clauses = split_clauses(contract(DEFINITIONS, PAYMENT))
+    assert [clause.number for clause in clauses] == ["1", "2"]
+    assert [clause.heading for clause in clauses] == ["Definitions", "Payment"]
+    assert clauses[1].body == "The Client shall pay each invoice within thirty days of receipt."
+
+
+def test_identical_contracts():
+    text = contract(DEFINITIONS, PAYMENT, TERMINATION)
+    assert statuses(align(text, text)) == [(UNCHANGED, False)] * 3
+
+
+def test_inserted_clause_renumbers_the_rest():
+    changes = align(
+        contract(DEFINITIONS, PAYMENT, TERMINATION),
+        contract(DEFINITIONS, CONFIDENTIALITY, PAYMENT, TERMINATION)
+    )
+    assert statuses(changes) == [(UNCHANGED, False), (ADDED, False), (RENUMBERED, False), (RENUMBERED, False)]
+    assert changes[2].original.number == "2" and changes[2].revised.number == "3"
+
+
+def test_modified_clause_is_paired():
+    changes = align(
+        contract(DEFINITIONS, PAYMENT),
+        contract(DEFINITIONS, PAYMENT.replace("thirty", "sixty"))
+    )
+    assert statuses(changes) == [(UNCHANGED, False), (MODIFIED, False)]
+    assert changes[1].original.heading == changes[1].revised.heading == "Payment"
+
+
+def test_deleted_clause_stays_in_place():
+    changes = align(
+        contract(DEFINITIONS, PAYMENT, CONFIDENTIALITY, TERMINATION),
+        contract(DEFINITIONS, PAYMENT, TERMINATION)
+    )
+    assert [change.status for change in changes] == [UNCHANGED, UNCHANGED, DELETED, RENUMBERED]
+    assert changes[2].original.heading == "Confidentiality"
+    assert summarize(changes)[DELETED] == 1
+
+
+def test_moved_clause_is_detected():
+    changes = align(
+        contract(DEFINITIONS, PAYMENT, CONFIDENTIALITY, TERMINATION),
+        contract(DEFINITIONS, TERMINATION, PAYMENT, CONFIDENTIALITY)
+    )
+    # Only the clause out of order relative to the rest counts as moved
+    assert [(change.revised.heading, change.moved) for change in changes] == [
+        ("Definitions", False), ("Termination", True), ("Payment", False), ("Confidentiality", False),
+    ]
+    assert summarize(changes)['moved'] == 1
+
+
+def test_moved_and_modified_clause():
+    changes = align(
+        contract(DEFINITIONS, PAYMENT, CONFIDENTIALITY, TERMINATION),
+        contract(DEFINITIONS, TERMINATION.replace("ninety", "thirty"), PAYMENT, CONFIDENTIALITY)
+    )
+    moved = [change for change in changes if change.moved]
+    assert len(moved) == 1
+    assert moved[0].status == MODIFIED and moved[0].revised.heading == "Termination"
+
+
+def test_unrelated_clauses_are_not_paired():
+    changes = align(contract(PAYMENT), contract(CONFIDENTIALITY))
+    assert sorted(change.status for change in changes) == [ADDED, DELETED]
+
+
+def test_word_segments_accept_and_reject():
+    original = "The Client shall pay within thirty days.\nLate fees apply."
+    revised = "The Client shall pay within fifteen days.\nNo late fees apply."
+    segments = word_segments(original, revised)
+    accepted = "".join(text for kind, text in segments if kind != DELETE)
+    rejected = "".join(text for kind, text in segments if kind != INSERT)
+    assert accepted == revised
+    assert rejected == original
+    assert (DELETE, "thirty") in segments and (INSERT, "fifteen") in segments
+    # The shared space after the replaced word is not part of the change
+    assert (EQUAL, " ") in segments
+
+
+def test_word_segments_keep_line_break_before_deleted_line():
+    original = "Pay within thirty days.\nLate fees apply."
+    revised = "Pay within thirty days."
+    segments = word_segments(original, revised)
+    assert "".join(text for kind, text in segments if kind != INSERT) == original
+    assert "".join(text for kind, text in segments if kind != DELETE) == revised
+    assert segments[:2] == [(EQUAL, "Pay within thirty days."), (DELETE, "\n")]
+
+
+def test_word_diff_markup():
+    assert word_diff("pay in thirty days", "pay in sixty days") == "pay in [-thirty-] {+sixty+} days"
+    assert word_diff("pay in days", "pay in thirty days") == "pay in {+thirty+} days"
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the clause library: transferring value substitutions into stored
+rewrites, exact and near matches, minimum coverage and learning rewrites
+from a processed contract. Runs offline.
+
+Usage:
+    python -m pytest test_clause_library.py
+"""
+
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+from clause_diff import split_clauses
+from clause_library import EXACT, NEAR, ClauseLibrary, transfer_edits
+
+PRICE = "The Supplier shall give Acme Corp written notice thirty days before any price increase takes effect under this Agreement."
+PRICE_REWRITE = (
+    "The Supplier shall give Acme Corp written notice at least thirty days before any price increase takes effect "
+    "under this Agreement, and may not increase prices more than once a year."
+)
+LIABILITY = "The Supplier is liable for all direct losses caused by its breach of this Agreement, without limit."
+LIABILITY_REWRITE = "The Supplier is liable for all direct and indirect losses caused by its breach of this Agreement, without any limit."
+AUDIT = "The Client may audit the records of the Supplier once in each contract year on reasonable written notice."
+AUDIT_REWRITE = "The Client may audit the records of the Supplier at any time on reasonable written notice, at the Supplier's cost."
+
+
+@contextmanager
+def clause_library(**kwargs):
+    with tempfile.TemporaryDirectory() as directory:
+        yield ClauseLibrary(os.path.join(directory, "clause_library.db"), **kwargs)
+
+
+def clause(number: str, heading: str, body: str):
+    return split_clauses(f"{number}. {heading}\n{body}\n")[0]
+
+
+def stored_pairs(library: ClauseLibrary) -> dict:
+    rows = sqlite3.connect(library.path).execute("SELECT heading, original, rewrite FROM clauses").fetchall()
+    return {heading: (original.split("\n", 1)[1], rewrite.split("\n", 1)[1]) for heading, original, rewrite in rows}
+
+
+def test_transfer_edits_substitutes_values():
+    adapted, score = transfer_edits(PRICE, PRICE_REWRITE, PRICE.replace("thirty", "sixty"))
+    assert adapted == PRICE_REWRITE.replace("thirty", "sixty")
+    assert abs(score - 18 / 19) < 1e-9
+
+    # Several substitutions, one of them a different number of words
+    adapted, _ = transfer_edits(
+        PRICE, PRICE_REWRITE, PRICE.replace("Acme Corp", "Beta Holdings Ltd").replace("thirty", "sixty")
+    )
+    assert adapted == PRICE_REWRITE.replace("Acme Corp", "Beta Holdings Ltd").replace("thirty", "sixty")
+
+
+def test_transfer_edits_refuses_unsafe_adaptations():
+    new_clause = PRICE.replace("thirty", "sixty")
+    # The model changed the substituted word itself
+    assert transfer_edits(PRICE, PRICE_REWRITE.replace("thirty", "forty-five"), new_clause) is None
+    # The old value also appears where it would not be substituted
+    assert transfer_edits(PRICE, PRICE_REWRITE + " Notices from thirty days back stay valid.", new_clause) is None
+    # More than substitutions: the new clause adds words
+    assert transfer_edits(PRICE, PRICE_REWRITE, PRICE.replace("notice", "notice by email")) is None
+    assert transfer_edits(PRICE, PRICE_REWRITE, new_clause, min_similarity=0.95) is None
+
+
+def test_exact_match_is_renumbered():
+    with clause_library(min_words=5) as library:
+        assert library.add(clause("4", "Liability", LIABILITY), f"4. Liability\n{LIABILITY_REWRITE}", "supply", "i1")
+        match = library.lookup(clause("7", "Liability", LIABILITY), "supply", "i1")
+        assert (match.kind, match.score) == (EXACT, 1.0)
+        assert match.rewrite == f"7. Liability\n{LIABILITY_REWRITE}"
+        # Rewrites are only served for the same category and guidance
+        assert library.lookup(clause("7", "Liability", LIABILITY), "lease", "i1") is None
+        assert library.lookup(clause("7", "Liability", LIABILITY), "supply", "i2") is None
+        assert (library.hits, library.misses) == ({EXACT: 1, NEAR: 0}, 2)
+
+
+def test_near_match_adapts_the_rewrite():
+    with clause_library(min_words=5) as library:
+        library.add(clause("1", "Price Changes", PRICE), f"1. Price Changes\n{PRICE_REWRITE}", "supply", "i1")
+        match = library.lookup(clause("2", "Price Changes", PRICE.replace("thirty", "sixty")), "supply", "i1")
+        assert match.kind == NEAR and match.score > library.near_match
+        assert match.rewrite == f"2. Price Changes\n{PRICE_REWRITE.replace('thirty', 'sixty')}"
+
+        # Too many substitutions for the similarity threshold
+        changed = PRICE.replace("Acme Corp", "Beta Ltd").replace("thirty", "sixty")
+        assert library.lookup(clause("2", "Price Changes", changed), "supply", "i1") is None
+        uses = sqlite3.connect(library.path).execute("SELECT uses FROM clauses").fetchone()[0]
+        assert uses == 1
+
+
+def test_short_clauses_are_not_stored():
+    with clause_library(min_words=12) as library:
+        assert not library.add(clause("9", "Notices", "Notices must be in writing."), "9. Notices\nIn writing.", "supply", "i1")
+        assert not library.add(clause("4", "Liability", LIABILITY), "   ", "supply", "i1")
+        assert stored_pairs(library) == {}
+
+
+def test_lookup_all_min_coverage():
+    with clause_library(min_words=5) as library:
+        library.add(clause("1", "Liability", LIABILITY), f"1. Liability\n{LIABILITY_REWRITE}", "supply", "i1")
+        clauses = split_clauses(f"1. Liability\n{LIABILITY}\n\n2. Audit\n{AUDIT}\n\n3. Price Changes\n{PRICE}\n")
+        assert list(library.lookup_all(clauses, "supply", "i1")) == [0]
+        # One clause of three is about a third of the text
+        assert list(library.lookup_all(clauses, "supply", "i1", min_coverage=0.3)) == [0]
+        assert library.lookup_all(clauses, "supply", "i1", min_coverage=0.5) == {}
+
+
+def test_learn_pairs_clauses_of_a_renumbered_mirror():
+    original = f"1. Price Changes\n{PRICE}\n\n2. Liability\n{LIABILITY}\n\n3. Audit\n{AUDIT}\n\n4. Notices\nShort clause.\n"
+    # The mirror added a clause, so the clause numbers after it moved
+    mirror = (
+        f"1. Price Changes\n{PRICE_REWRITE}\n\n"
+        "2. Service Levels\nThe Supplier shall meet the service levels in Schedule B or credit the fees for the month.\n\n"
+        f"3. Liability\n{LIABILITY_REWRITE}\n\n4. Audit\n{AUDIT_REWRITE}\n\n5. Notices\nShort.\n"
+    )
+    with clause_library(min_words=5) as library:
+        assert library.learn(original, mirror, "supply", "i1") == 3
+        assert stored_pairs(library) == {
+            "price changes": (PRICE, PRICE_REWRITE),
+            "liability": (LIABILITY, LIABILITY_REWRITE),
+            "audit": (AUDIT, AUDIT_REWRITE),
+        }
+        # Learned rewrites are served with the contract's own numbering
+        match = library.lookup(clause("2", "Liability", LIABILITY), "supply", "i1")
+        assert match.rewrite == f"2. Liability\n{LIABILITY_REWRITE}"
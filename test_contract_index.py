@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the contracts folder index: grouping files by contract name,
+detecting added, edited and removed .instructions files between listings,
+and reading instructions once per file version. Runs offline.
+
+Usage:
+    python -m pytest test_contract_index.py
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from benchmark_pipeline import FakeBox
+from contract_index import ContractFolderIndex
+
+CONTRACT_EXTENSIONS = ('.pdf', '.doc', '.docx', '.txt')
+
+
+def make_index() -> ContractFolderIndex:
+    return ContractFolderIndex(
+        lambda name: not name.endswith('.instructions') and name.lower().endswith(CONTRACT_EXTENSIONS),
+        lambda name: Path(name).stem
+    )
+
+
+def file_item(file_id: str, name: str, sha1: str = "v1", modified_at: str = "2025-01-01T00:00:00") -> dict:
+    return {'id': file_id, 'name': name, 'type': 'file', 'sha1': sha1, 'modified_at': modified_at}
+
+
+def test_files_are_grouped_by_contract_name():
+    index = make_index()
+    index.rebuild([
+        file_item("1", "lease.pdf", modified_at="2025-01-01T00:00:00"),
+        file_item("2", "lease.docx", modified_at="2025-02-01T00:00:00"),
+        file_item("3", "lease.pdf.instructions"),
+        file_item("4", "nda.txt"),
+        file_item("5", "notes.xlsx"),
+        {'id': "6", 'name': "archive", 'type': 'folder'},
+    ])
+    assert sorted(index.entries) == ["lease", "nda"]
+    assert index.get("lease").contract_file['id'] == "2"  # most recently modified first
+    assert index.instructions_file("lease")['id'] == "3"
+    assert index.instructions_file("nda") is None
+    assert sorted(item['id'] for item in index.contract_files()) == ["1", "2", "4"]
+
+
+def test_rebuild_reports_changed_instructions():
+    index = make_index()
+    listing = [file_item("1", "lease.pdf"), file_item("2", "nda.pdf"), file_item("3", "lease.instructions")]
+    # Nothing counts as changed on the first build
+    assert index.rebuild(listing) == set()
+    assert index.rebuild(listing) == set()
+
+    edited = [file_item("1", "lease.pdf"), file_item("2", "nda.pdf"), file_item("3", "lease.instructions", "v2")]
+    assert index.rebuild(edited) == {"lease"}
+    added = edited + [file_item("4", "nda.instructions")]
+    assert index.rebuild(added) == {"nda"}
+    assert index.rebuild(added[:2] + added[3:]) == {"lease"}
+    # Instructions without a contract file have nothing to reprocess
+    assert index.rebuild(added[:2] + added[3:] + [file_item("5", "draft.instructions")]) == set()
+
+
+def test_instructions_text_is_cached_per_version():
+    index = make_index()
+    instructions = file_item("3", "lease.instructions")
+    assert index.cached_instructions(instructions) is None
+    index.cache_instructions(instructions, "Priority: urgent")
+    assert index.cached_instructions(dict(instructions)) == "Priority: urgent"
+    assert index.cached_instructions(dict(instructions, sha1="v2")) is None
+
+
+def test_edited_instructions_are_read_again_and_the_contract_reprocessed():
+    from contract_processor import ContractProcessor
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings = {
+            "RETRY_QUEUE_FILE": os.path.join(directory, "retry_queue.json"),
+            "CHECKPOINT_DIR": os.path.join(directory, "checkpoints"),
+            "REVISION_DIR": os.path.join(directory, "revisions"),
+        }
+        saved = {name: os.environ.get(name) for name in settings}
+        os.environ.update(settings)
+        try:
+            box = FakeBox([], time_scale=0)
+            processor = ContractProcessor(box_service=box)
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        async def run():
+            await processor.initialize()
+            contract_id = box._add_file(box.contracts_folder_id, "lease.pdf", "1. Term")
+            instructions_id = box._add_file(box.contracts_folder_id, "lease.instructions", "Priority: low")
+            await processor._refresh_contract_index()
+            processor.processed_contracts.add(f"lease_{contract_id}")
+
+            first = await processor.get_per_contract_instructions("lease")
+            again = await processor.get_per_contract_instructions("lease")
+            reads = box.calls['read_file']
+
+            await box.upload_new_version(instructions_id, "lease.instructions", io.BytesIO(b"Priority: urgent"))
+            await processor._refresh_contract_index()
+            edited = await processor.get_per_contract_instructions("lease")
+            return first, again, reads, edited, box.calls['read_file'], processor.processed_contracts
+
+        first, again, reads, edited, reads_after_edit, processed = asyncio.run(run())
+        processor.render_pool.shutdown()
+        assert first == again == "Priority: low"
+        assert reads == 1
+        assert edited == "Priority: urgent" and reads_after_edit == 2
+        assert processed == set()
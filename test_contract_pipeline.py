@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for the contract pipeline: jobs flowing through the stages,
+backpressure from a slow stage, error and completion callbacks, and
+draining. Runs offline.
+
+Usage:
+    python -m pytest test_contract_pipeline.py
+"""
+
+import asyncio
+
+from contract_pipeline import ContractJob, ContractPipeline
+
+
+def make_job(number: int) -> ContractJob:
+    return ContractJob(str(number), f"contract_{number}.txt", f"contract_{number}")
+
+
+def make_pipeline(handlers, **kwargs) -> ContractPipeline:
+    workers = {name: 1 for name, _ in handlers}
+    return ContractPipeline(handlers, workers=workers, queue_size=kwargs.pop('queue_size', 1), **kwargs)
+
+
+def test_jobs_pass_every_stage_in_order():
+    async def run():
+        visited = []
+
+        def stage(name):
+            async def handler(job):
+                visited.append((job.file_id, name))
+            return name, handler
+
+        completed = []
+
+        async def on_complete(job):
+            completed.append(job.file_id)
+
+        pipeline = make_pipeline([stage("extract"), stage("generate"), stage("upload")], on_complete=on_complete)
+        for number in range(3):
+            assert await pipeline.submit(make_job(number))
+        await pipeline.join()
+        await pipeline.stop()
+        return pipeline, visited, completed
+
+    pipeline, visited, completed = asyncio.run(run())
+    assert sorted(completed) == ["0", "1", "2"]
+    for file_id in completed:
+        assert [name for job, name in visited if job == file_id] == ["extract", "generate", "upload"]
+    assert all(m['processed'] == 3 and m['failed'] == 0 for m in pipeline.metrics().values())
+    assert pipeline.in_flight == {}
+
+
+def test_slow_stage_holds_back_submissions():
+    async def run():
+        gate = asyncio.Event()
+
+        async def fast(job):
+            pass
+
+        async def slow(job):
+            await gate.wait()
+
+        pipeline = make_pipeline([("extract", fast), ("generate", slow)])
+        submissions = [asyncio.create_task(pipeline.submit(make_job(number))) for number in range(6)]
+        await asyncio.sleep(0.05)
+        # generate holds one job and queues one; extract is blocked handing over
+        # its next job and has one more queued, so the rest wait in submit()
+        blocked = [task for task in submissions if not task.done()]
+        extracted = pipeline.metrics()['extract']['processed']
+        max_depth = max(m['max_queue_depth'] for m in pipeline.metrics().values())
+
+        gate.set()
+        await asyncio.gather(*submissions)
+        await pipeline.join()
+        await pipeline.stop()
+        return len(blocked), extracted, max_depth, pipeline.metrics()['generate']['processed']
+
+    blocked, extracted, max_depth, generated = asyncio.run(run())
+    assert blocked == 2
+    assert extracted == 3
+    assert max_depth == 1
+    assert generated == 6
+
+
+def test_failed_job_calls_on_error_and_skips_later_stages():
+    async def run():
+        uploaded, errors, completed = [], [], []
+
+        async def extract(job):
+            if job.file_id == "1":
+                raise ValueError("unreadable file")
+
+        async def upload(job):
+            uploaded.append(job.file_id)
+
+        def on_error(job, error):
+            errors.append((job.file_id, str(error)))
+
+        pipeline = make_pipeline(
+            [("extract", extract), ("upload", upload)],
+            on_error=on_error,
+            on_complete=lambda job: completed.append(job.file_id)
+        )
+        for number in range(3):
+            await pipeline.submit(make_job(number))
+        await pipeline.join()
+        await pipeline.stop()
+        return pipeline, uploaded, errors, completed
+
+    pipeline, uploaded, errors, completed = asyncio.run(run())
+    assert errors == [("1", "unreadable file")]
+    assert sorted(uploaded) == sorted(completed) == ["0", "2"]
+    assert pipeline.metrics()['extract']['failed'] == 1
+    assert pipeline.in_flight == {}
+
+
+def test_failing_callback_does_not_stop_the_worker():
+    async def run():
+        completed = []
+
+        async def handler(job):
+            if job.file_id == "0":
+                raise RuntimeError("stage failed")
+
+        def on_error(job, error):
+            raise KeyError("callback bug")
+
+        def on_complete(job):
+            completed.append(job.file_id)
+            if job.file_id == "1":
+                raise KeyError("callback bug")
+
+        pipeline = make_pipeline([("extract", handler)], on_error=on_error, on_complete=on_complete)
+        for number in range(3):
+            await pipeline.submit(make_job(number))
+        await asyncio.wait_for(pipeline.join(), timeout=1)
+        await pipeline.stop()
+        return completed
+
+    assert asyncio.run(run()) == ["1", "2"]
+
+
+def test_duplicate_jobs_are_rejected_and_drain_times_out():
+    async def run():
+        gate = asyncio.Event()
+
+        async def handler(job):
+            await gate.wait()
+
+        pipeline = make_pipeline([("extract", handler)])
+        first = await pipeline.submit(make_job(1))
+        duplicate = await pipeline.submit(make_job(1))
+        drained_early = await pipeline.drain(timeout=0.05)
+        gate.set()
+        drained = await pipeline.drain(timeout=1)
+        await pipeline.stop()
+        return first, duplicate, drained_early, drained, pipeline.running
+
+    assert asyncio.run(run()) == (True, False, False, True, False)
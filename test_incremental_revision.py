@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental revision: which clauses of a revised draft need a new
+rewrite, and splicing the rewrites into the previous mirror contract and
+negotiation guide. Runs offline.
+
+Usage:
+    python -m pytest test_incremental_revision.py
+"""
+
+import tempfile
+
+from clause_diff import ADDED, MODIFIED, UNCHANGED
+from incremental_revision import GUIDE_UPDATE_HEADING, RevisionPlan, RevisionStore, guidance_fingerprint
+
+PREVIOUS = """1. Definitions
+In this Agreement, Services means the consulting services described in Schedule A.
+
+2. Payment
+The Client shall pay each invoice within thirty days of receipt.
+
+3. Termination
+Either party may terminate this Agreement on ninety days written notice.
+"""
+
+MIRROR = """1. Definitions
+In this Agreement, Services means only the consulting services expressly listed in Schedule A.
+
+2. Payment
+The Client shall pay each undisputed invoice within forty-five days of receipt.
+
+3. Termination
+Either party may terminate this Agreement on thirty days written notice.
+
+4. Limitation of Liability
+Neither party is liable for indirect or consequential damages of any kind.
+"""
+
+LIABILITY = "4. Limitation of Liability\nNeither party is liable for indirect or consequential damages of any kind."
+
+
+def test_only_changed_clauses_are_pending():
+    plan = RevisionPlan(PREVIOUS, MIRROR, PREVIOUS.replace("thirty days", "sixty days"))
+    assert plan.counts[MODIFIED] == 1 and plan.counts[UNCHANGED] == 2
+    assert list(plan.pending) == [1]
+    assert plan.pending[1].revised.heading == "Payment"
+    assert 0 < plan.change_ratio < 1
+    # The clause the mirror added follows the clause it was added after
+    assert [clause.text for clause in plan.extras[2]] == [LIABILITY]
+
+
+def test_excerpt_shows_previous_rewrite():
+    plan = RevisionPlan(PREVIOUS, MIRROR, PREVIOUS.replace("thirty days", "sixty days"))
+    excerpt = plan.excerpt()
+    assert excerpt.startswith("[Clause 1] ")
+    assert "forty-five days" in excerpt and "sixty days" in excerpt
+    assert "Termination" not in excerpt
+
+
+def test_splice_keeps_unchanged_rewrites_and_mirror_extras():
+    plan = RevisionPlan(PREVIOUS, MIRROR, PREVIOUS.replace("thirty days", "sixty days"))
+    rewritten = plan.parse_response({'clauses': [
+        {'id': 1, 'text': "2. Payment\nPay within 20 days.", 'guide_note': "Hold the payment term."},
+    ]})
+    assert rewritten == {1: {'text': "2. Payment\nPay within 20 days.", 'guide_note': "Hold the payment term."}}
+
+    spliced = plan.splice_mirror(rewritten)
+    assert spliced == (
+        "1. Definitions\nIn this Agreement, Services means only the consulting services expressly listed in Schedule A.\n\n"
+        "2. Payment\nPay within 20 days.\n\n"
+        "3. Termination\nEither party may terminate this Agreement on thirty days written notice.\n\n"
+        f"{LIABILITY}\n"
+    )
+
+
+def test_splice_renumbers_kept_rewrites():
+    revised = PREVIOUS.replace(
+        "2. Payment",
+        "2. Audit\nThe Client may audit the Supplier's records once a year on reasonable notice.\n\n3. Payment"
+    ).replace("3. Termination", "4. Termination")
+    plan = RevisionPlan(PREVIOUS, MIRROR, revised)
+    added = [position for position, change in plan.pending.items() if change.status == ADDED]
+    assert len(added) == 1
+
+    rewritten = plan.parse_response({'clauses': [
+        {'id': position, 'text': f"{change.revised.number}. {change.revised.heading}\nRewritten.", 'guide_note': ""}
+        for position, change in plan.pending.items()
+    ]})
+    spliced = plan.splice_mirror(rewritten)
+    assert "2. Audit\nRewritten." in spliced
+    # The kept Termination rewrite follows the new numbering
+    assert "4. Termination\nEither party may terminate this Agreement on thirty days written notice." in spliced
+    assert "3. Termination" not in spliced
+
+
+def test_incomplete_response_is_rejected():
+    plan = RevisionPlan(PREVIOUS, MIRROR, PREVIOUS.replace("thirty days", "sixty days"))
+    assert plan.parse_response({'clauses': []}) is None
+    assert plan.parse_response({}) is None
+    # Unknown IDs and blank rewrites don't count
+    assert plan.parse_response({'clauses': [
+        {'id': 0, 'text': "1. Definitions\nRewritten.", 'guide_note': ""},
+        {'id': 1, 'text': "  ", 'guide_note': ""},
+    ]}) is None
+
+
+def test_string_clause_ids_are_accepted():
+    plan = RevisionPlan(PREVIOUS, MIRROR, PREVIOUS.replace("thirty days", "sixty days"))
+    rewritten = plan.parse_response({'clauses': [
+        {'id': "one", 'text': "2. Payment\nIgnored.", 'guide_note': ""},
+        {'id': None, 'text': "2. Payment\nIgnored.", 'guide_note': ""},
+        {'id': " 1", 'text': "2. Payment\nPay within 20 days.", 'guide_note': "Hold the payment term."},
+    ]})
+    assert rewritten == {1: {'text': "2. Payment\nPay within 20 days.", 'guide_note': "Hold the payment term."}}
+
+
+def test_update_guide_appends_revision_section():
+    plan = RevisionPlan(PREVIOUS, MIRROR, PREVIOUS.replace("thirty days", "sixty days"))
+    rewritten = plan.parse_response({'clauses': [
+        {'id': 1, 'text': "2. Payment\nPay within 20 days.", 'guide_note': "Hold the payment term."},
+    ]})
+    guide = plan.update_guide("NEGOTIATION GUIDE\n\nKeep the notice period.\n", rewritten)
+    assert guide.startswith("NEGOTIATION GUIDE\n\nKeep the notice period.\n\n\n" + GUIDE_UPDATE_HEADING)
+    assert "changed 1 clause(s), added 0 and removed 0" in guide
+    assert "[MODIFIED]\nHold the payment term." in guide
+
+
+def test_revision_store_and_fingerprint():
+    assert guidance_fingerprint("lease", None, None) == guidance_fingerprint("lease", "", "")
+    assert guidance_fingerprint("lease", None, None) != guidance_fingerprint("lease", "tenant", None)
+    with tempfile.TemporaryDirectory() as directory:
+        store = RevisionStore(directory)
+        assert store.load("lease_1") == {}
+        store.save("lease_1", {'version': "v1", 'text': PREVIOUS})
+        # Unlike a checkpoint, the last revision survives a new file version
+        assert store.load("lease_1", version="v2")['text'] == PREVIOUS
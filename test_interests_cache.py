@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the MY_INTERESTS.txt cache against the benchmark's in-memory Box:
+one download per version, revalidation by sha1, change callbacks and a
+removed file. Runs offline.
+
+Usage:
+    python -m pytest test_interests_cache.py
+"""
+
+import asyncio
+import io
+
+from benchmark_pipeline import FakeBox
+from interests_cache import InterestsCache
+
+FILENAME = "MY_INTERESTS.txt"
+
+
+def make_cache(**kwargs):
+    box = FakeBox([], time_scale=0)
+    changes = []
+
+    async def on_change(old_text, new_text):
+        changes.append((old_text, new_text))
+
+    options = dict(revalidate_interval=900, on_change=on_change)
+    options.update(kwargs)
+    return InterestsCache(box, FILENAME, box.interests_folder_id, **options), box, changes
+
+
+def interests_file(box: FakeBox) -> dict:
+    return next(item for item in box.items[box.interests_folder_id] if item['name'] == FILENAME)
+
+
+def test_file_is_read_once_until_stale():
+    async def run():
+        cache, box, changes = make_cache()
+        first = await asyncio.gather(cache.get(), cache.get(), cache.get())
+        second = await cache.get()
+        return first, second, box.calls, changes
+
+    first, second, calls, changes = asyncio.run(run())
+    assert first == [second] * 3 and second.startswith("Protect against unlimited liability")
+    # Concurrent callers share one revalidation
+    assert calls == {'list_folder_items': 1, 'read_file': 1}
+    assert changes == []
+
+
+def test_unchanged_version_is_not_downloaded_again():
+    async def run():
+        cache, box, changes = make_cache()
+        await cache.get()
+        cache.invalidate()
+        text = await cache.get()
+        return text, box.calls, changes
+
+    text, calls, changes = asyncio.run(run())
+    assert text.startswith("Protect against unlimited liability")
+    assert calls == {'list_folder_items': 2, 'read_file': 1}
+    assert changes == []
+
+
+def test_changed_version_is_reloaded_and_reported():
+    async def run():
+        cache, box, changes = make_cache(revalidate_interval=0)
+        old = await cache.get()
+        await box.upload_new_version(interests_file(box)['id'], FILENAME, io.BytesIO(b"Cap liability at fees paid."))
+        new = await cache.get()
+        again = await cache.get()
+        return old, new, again, cache.version == interests_file(box)['sha1'], changes
+
+    old, new, again, version_matches, changes = asyncio.run(run())
+    assert new == again == "Cap liability at fees paid."
+    assert version_matches
+    assert changes == [(old, new)]
+
+
+def test_removed_file_clears_the_interests():
+    async def run():
+        cache, box, changes = make_cache()
+        old = await cache.get()
+        box.items[box.interests_folder_id].remove(interests_file(box))
+        cache.invalidate()
+        return old, await cache.get(), await cache.revalidate(), changes
+
+    old, text, changed_again, changes = asyncio.run(run())
+    assert text is None
+    assert changes == [(old, None)]
+    assert not changed_again
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for the notification outbox: deduplication per threshold, digest
+timing, publish retries, crash recovery and pruning. Runs offline.
+
+Usage:
+    python -m pytest test_notification_outbox.py
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from notification_outbox import PENDING, SENDING, SENT, NotificationOutbox
+
+
+class FakePublisher:
+    """Records published digests; fails the first `failures` calls."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.published = []
+
+    def __call__(self, subject: str, message: str) -> str:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("SNS unreachable")
+        self.published.append((subject, message))
+        return f"msg-{len(self.published)}"
+
+
+def make_outbox(directory: str, publisher=None, **kwargs) -> NotificationOutbox:
+    options = dict(thresholds=[0, 1, 5, 10, 14], digest_interval=3600, immediate_days=1, retry_base_delay=0)
+    options.update(kwargs)
+    return NotificationOutbox(
+        publisher or FakePublisher(),
+        lambda items: "\n".join(item['description'] for item in items),
+        state_file=os.path.join(directory, "outbox.json"),
+        **options
+    )
+
+
+def make_item(days_until_due: int, contract: str = "lease.pdf", item_type: str = "renewal", **fields) -> dict:
+    item = {
+        'contract': contract,
+        'type': item_type,
+        'description': f"{item_type} of {contract}",
+        'due_date': (date.today() + timedelta(days=days_until_due)).isoformat(),
+        'days_until_due': days_until_due,
+    }
+    item.update(fields)
+    return item
+
+
+def test_dedup_per_contract_type_due_date_and_threshold():
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        assert outbox.enqueue([make_item(9)]) == 1
+        # Rephrased by the model on the next scan: still the same item
+        assert outbox.enqueue([make_item(9, description="Renew the lease")]) == 0
+        # Same threshold crossed again a day later
+        assert outbox.enqueue([make_item(8, due_date=make_item(9)['due_date'])]) == 0
+        # Next threshold, another type, another contract
+        assert outbox.enqueue([make_item(4, due_date=make_item(9)['due_date'])]) == 1
+        assert outbox.enqueue([make_item(9, item_type="payment_due")]) == 1
+        assert outbox.enqueue([make_item(9, contract="nda.pdf")]) == 1
+        assert len(outbox.pending_entries()) == 4
+
+
+def test_empty_thresholds_are_honoured():
+    os.environ["NOTIFICATION_THRESHOLDS"] = "5"
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            outbox = make_outbox(directory, thresholds=[])
+            assert outbox.thresholds == []
+            outbox.enqueue([make_item(3)])
+            assert [entry['threshold'] for entry in outbox.pending_entries()] == [None]
+            # Without thresholds an item is notified once, not again as it gets closer
+            assert outbox.enqueue([make_item(0, due_date=make_item(3)['due_date'])]) == 0
+    finally:
+        del os.environ["NOTIFICATION_THRESHOLDS"]
+
+
+def test_days_until_due_is_computed_at_send_time():
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        outbox.last_digest_at = time.time()
+        # Queued eleven days ago, when the item was not yet due within immediate_days
+        stale = make_item(1)
+        stale['days_until_due'] = 12
+        outbox.enqueue([stale])
+        assert outbox.pending_entries()[0]['item']['days_until_due'] == 1
+        assert outbox._digest_due(outbox.pending_entries())
+
+        publisher = FakePublisher()
+        outbox.publisher = publisher
+        assert asyncio.run(outbox.flush())
+        assert len(publisher.published) == 1
+
+
+def test_digest_waits_for_interval():
+    with tempfile.TemporaryDirectory() as directory:
+        publisher = FakePublisher()
+        outbox = make_outbox(directory, publisher, digest_max_items=3)
+        outbox.last_digest_at = time.time()
+        outbox.enqueue([make_item(9), make_item(9, contract="nda.pdf")])
+        assert asyncio.run(outbox.flush())
+        assert publisher.published == []
+
+        # A full batch goes out early, most urgent first
+        outbox.enqueue([make_item(4, contract="msa.pdf")])
+        assert asyncio.run(outbox.flush())
+        assert publisher.published[0][1].splitlines()[0] == "renewal of msa.pdf"
+        assert {entry['status'] for entry in outbox.entries.values()} == {SENT}
+
+
+def test_flush_retries_then_keeps_entries_pending():
+    with tempfile.TemporaryDirectory() as directory:
+        publisher = FakePublisher(failures=3)
+        outbox = make_outbox(directory, publisher, max_attempts=3)
+        outbox.enqueue([make_item(0)])
+        assert not asyncio.run(outbox.flush())
+        entry = outbox.pending_entries()[0]
+        assert (entry['status'], entry['attempts']) == (PENDING, 1)
+
+        # Delivered on the next flush, after one more failed attempt
+        publisher.failures = 1
+        assert asyncio.run(outbox.flush())
+        entry = next(iter(outbox.entries.values()))
+        assert (entry['status'], entry['attempts'], entry['message_id']) == (SENT, 2, "msg-1")
+        assert asyncio.run(outbox.flush())
+        assert len(publisher.published) == 1
+
+
+def test_sending_entries_are_not_resent_after_a_crash():
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        outbox.enqueue([make_item(0), make_item(0, contract="nda.pdf")])
+        key = next(iter(outbox.entries))
+        outbox.entries[key]['status'] = SENDING
+        outbox._save_state()
+
+        publisher = FakePublisher()
+        restarted = make_outbox(directory, publisher)
+        assert restarted.entries[key]['status'] == SENT
+        asyncio.run(restarted.flush(force=True))
+        assert publisher.published[0][1] == "renewal of nda.pdf"
+
+
+def test_old_sent_entries_are_pruned():
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        outbox.enqueue([make_item(0), make_item(0, contract="nda.pdf")])
+        old_key, new_key = list(outbox.entries)
+        outbox.entries[old_key].update(status=SENT, sent_at=time.time() - 91 * 86400)
+        asyncio.run(outbox.flush(force=True))
+        assert list(outbox.entries) == [new_key]
+        with open(os.path.join(directory, "outbox.json")) as f:
+            assert list(json.load(f)['entries']) == [new_key]
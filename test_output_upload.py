@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for uploading a contract's output files against the benchmark's
+in-memory Box: unchanged outputs are not uploaded again and changed ones
+become a new version of the existing file. Runs offline.
+
+Usage:
+    python -m pytest test_output_upload.py
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+
+from benchmark_pipeline import FakeBox
+
+MIRROR = "1_mirror_contract_protecting_YOUR_interests.txt"
+GUIDE = "3_negotiation_guide.docx"
+
+
+def make_processor(directory: str):
+    """A processor on an empty FakeBox with its state in directory, and a mirror folder."""
+    from contract_processor import ContractProcessor
+    state = {
+        "RETRY_QUEUE_FILE": os.path.join(directory, "retry_queue.json"),
+        "CHECKPOINT_DIR": os.path.join(directory, "checkpoints"),
+        "REVISION_DIR": os.path.join(directory, "revisions"),
+    }
+    saved = {name: os.environ.get(name) for name in state}
+    os.environ.update(state)
+    try:
+        box = FakeBox([], time_scale=0)
+        processor = ContractProcessor(box_service=box)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return processor, box, box._folder("0", "lease")
+
+
+def outputs(mirror: str, guide: bytes) -> dict:
+    # Rendered documents arrive as spooled binary files
+    return {MIRROR: mirror, GUIDE: io.BytesIO(guide)}
+
+
+def files(box: FakeBox, folder_id: str) -> dict:
+    return {item['name']: item for item in box.items[folder_id]}
+
+
+def test_outputs_are_uploaded_then_skipped_when_unchanged():
+    with tempfile.TemporaryDirectory() as directory:
+        processor, box, folder_id = make_processor(directory)
+        asyncio.run(processor._upload_output_files(folder_id, "lease", outputs("Mirror v1", b"guide v1")))
+        assert sorted(files(box, folder_id)) == [MIRROR, GUIDE]
+        assert box.calls["upload_text_file"] == 1 and box.calls["upload_file"] == 1
+
+        # An identical re-render is not uploaded again
+        box.calls.clear()
+        asyncio.run(processor._upload_output_files(folder_id, "lease", outputs("Mirror v1", b"guide v1")))
+        assert "upload_text_file" not in box.calls and "upload_file" not in box.calls
+        assert len(box.items[folder_id]) == 2
+
+
+def test_changed_output_is_uploaded_as_new_version():
+    with tempfile.TemporaryDirectory() as directory:
+        processor, box, folder_id = make_processor(directory)
+        asyncio.run(processor._upload_output_files(folder_id, "lease", outputs("Mirror v1", b"guide v1")))
+        before = {name: item['id'] for name, item in files(box, folder_id).items()}
+
+        box.calls.clear()
+        uploaded = []
+        asyncio.run(processor._upload_output_files(
+            folder_id, "lease", outputs("Mirror v2", b"guide v1"), on_uploaded=uploaded.append
+        ))
+        after = files(box, folder_id)
+        assert {name: item['id'] for name, item in after.items()} == before
+        assert box.texts[after[MIRROR]['id']] == "Mirror v2"
+        # Only the changed mirror is sent; both count as uploaded for the checkpoint
+        assert box.calls.get("upload_file") == 1 and "upload_text_file" not in box.calls
+        assert uploaded == [MIRROR, GUIDE]
+
+
+def test_already_uploaded_outputs_are_not_listed_again():
+    with tempfile.TemporaryDirectory() as directory:
+        processor, box, folder_id = make_processor(directory)
+        asyncio.run(processor._upload_output_files(
+            folder_id, "lease", outputs("Mirror v1", b"guide v1"), already_uploaded={MIRROR, GUIDE}
+        ))
+        assert box.items[folder_id] == [] and "list_folder_items" not in box.calls
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the priority scheduler: urgency parsing, ordering by the
+scheduling signals and aging of waiting contracts. Runs offline.
+
+Usage:
+    python -m pytest test_priority_scheduler.py
+"""
+
+import asyncio
+import time
+
+from contract_pipeline import ContractJob
+from priority_scheduler import PriorityScheduler, estimate_tokens, urgency_from_instructions
+
+WEIGHTS = {"urgency": 100.0, "size": 5.0, "token": 1.0, "aging": 2.0}
+
+
+def make_job(name: str) -> ContractJob:
+    return ContractJob(file_id=name, filename=f"{name}.txt", contract_name=name)
+
+
+def drain(scheduler: PriorityScheduler) -> list:
+    async def take_all():
+        return [(await scheduler.get()).contract_name for _ in range(len(scheduler))]
+    return asyncio.run(take_all())
+
+
+def test_urgency_from_instructions():
+    assert urgency_from_instructions(None) == "normal"
+    assert urgency_from_instructions("Priority: high\nKeep the notice period.") == "high"
+    assert urgency_from_instructions("urgency = LOW") == "low"
+    assert urgency_from_instructions("Please review, this is URGENT.") == "urgent"
+    # An unknown level and a lowercase "urgent" are not urgency markers
+    assert urgency_from_instructions("Priority: whenever") == "normal"
+    assert urgency_from_instructions("not urgent at all") == "normal"
+
+
+def test_estimate_tokens_by_format():
+    assert estimate_tokens("a.txt", 4000) == 1000
+    assert estimate_tokens("a.pdf", 4000) == 250
+    assert estimate_tokens("a.pdf", None) == 0
+
+
+def test_urgent_and_small_contracts_first():
+    scheduler = PriorityScheduler(WEIGHTS)
+    now = time.time()
+
+    async def fill():
+        await scheduler.add(make_job("large"), size_bytes=4_000_000, enqueued_at=now)
+        await scheduler.add(make_job("small"), size_bytes=10_000, enqueued_at=now)
+        await scheduler.add(make_job("urgent"), urgency="urgent", size_bytes=400_000, enqueued_at=now)
+    asyncio.run(fill())
+
+    assert scheduler.position("urgent") is None  # positions are by contract key
+    assert scheduler.position(make_job("urgent").key) == 1
+    assert drain(scheduler) == ["urgent", "small", "large"]
+
+
+def test_aging_lets_waiting_contracts_overtake():
+    scheduler = PriorityScheduler(WEIGHTS)
+    now = time.time()
+
+    async def fill():
+        # One urgency level is worth 100 points, aging 2 points per minute:
+        # a normal contract waiting an hour outranks a fresh high-priority one
+        await scheduler.add(make_job("waiting"), urgency="normal", enqueued_at=now - 3600)
+        await scheduler.add(make_job("fresh"), urgency="high", enqueued_at=now)
+    asyncio.run(fill())
+
+    waiting = make_job("waiting").key
+    assert abs(scheduler.score(waiting, now + 600) - scheduler.score(waiting, now) - 20.0) < 1e-6
+    assert drain(scheduler) == ["waiting", "fresh"]
+
+
+def test_aging_does_not_overtake_early():
+    scheduler = PriorityScheduler(WEIGHTS)
+    now = time.time()
+
+    async def fill():
+        await scheduler.add(make_job("waiting"), urgency="normal", enqueued_at=now - 600)
+        await scheduler.add(make_job("fresh"), urgency="high", enqueued_at=now)
+    asyncio.run(fill())
+
+    assert drain(scheduler) == ["fresh", "waiting"]
+
+
+def test_duplicates_and_removal():
+    scheduler = PriorityScheduler(WEIGHTS)
+
+    async def fill():
+        await scheduler.add(make_job("a"))
+        await scheduler.add(make_job("a"), urgency="urgent")
+        await scheduler.add(make_job("b"))
+    asyncio.run(fill())
+
+    assert len(scheduler) == 2
+    assert scheduler.snapshot()[0]['urgency'] == "normal"
+    assert asyncio.run(scheduler.remove(make_job("a").key))
+    assert not asyncio.run(scheduler.remove(make_job("a").key))
+    assert make_job("a").key not in scheduler
+    assert drain(scheduler) == ["b"]
+
+
+def test_removing_the_last_contract_ends_join():
+    scheduler = PriorityScheduler(WEIGHTS)
+
+    async def run():
+        await scheduler.add(make_job("a"))
+        joined = asyncio.create_task(scheduler.join())
+        await asyncio.sleep(0)
+        assert not joined.done()
+        await scheduler.remove(make_job("a").key)
+        await asyncio.wait_for(joined, timeout=1)
+    asyncio.run(run())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the tracked-changes redline DOCX: accepting every revision gives
+the mirror contract, rejecting every revision gives the original, and the
+package is well-formed WordprocessingML. Runs offline.
+
+Usage:
+    python -m pytest test_redline_docx.py
+"""
+
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+import docx
+
+from redline_docx import render_redline_docx
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+ORIGINAL = """1. Definitions
+In this Agreement, Services means the consulting services described in Schedule A.
+
+2. Payment
+The Client shall pay each invoice within thirty days of receipt.
+Late payments bear interest at 5% per month.
+
+3. Audit
+The Supplier may audit the Client's records at any time.
+
+4. Termination
+Either party may terminate this Agreement on ninety days written notice.
+"""
+
+MIRROR = """1. Definitions
+In this Agreement, Services means only the consulting services expressly listed in Schedule A.
+
+2. Payment
+The Client shall pay each undisputed invoice within forty-five days of receipt.
+
+3. Termination
+Either party may terminate this Agreement on thirty days written notice.
+
+4. Limitation of Liability
+Neither party is liable for indirect or consequential damages & lost profits.
+"""
+
+
+def document_xml(data: bytes) -> ET.Element:
+    with zipfile.ZipFile(io.BytesIO(data)) as package:
+        assert package.testzip() is None
+        return ET.fromstring(package.read("word/document.xml"))
+
+
+def resolve(body: ET.Element, accept: bool) -> list:
+    """
+    Lines of the document with every revision accepted (or rejected). A
+    paragraph whose mark is removed runs on into the next paragraph.
+    """
+    removed, kept = (f"{W}del", f"{W}ins") if accept else (f"{W}ins", f"{W}del")
+    text, lines = "", []
+    for paragraph in body.iter(f"{W}p"):
+        for child in paragraph:
+            if child.tag == f"{W}r" or child.tag == kept:
+                for element in child.iter():
+                    if element.tag in (f"{W}t", f"{W}delText"):
+                        text += element.text or ""
+                    elif element.tag == f"{W}br":
+                        text += "\n"
+        mark = paragraph.find(f"{W}pPr/{W}rPr")
+        if mark is not None and mark.find(removed) is not None:
+            continue
+        lines.append(text)
+        text = ""
+    if text:
+        lines.append(text)
+    return [line for line in "\n".join(lines).split("\n") if line.strip()]
+
+
+def lines_of(text: str) -> list:
+    return [line for line in text.split("\n") if line.strip()]
+
+
+def test_accept_all_gives_mirror_and_reject_all_gives_original():
+    root = document_xml(render_redline_docx(ORIGINAL, MIRROR))
+    body = root.find(f"{W}body")
+    assert resolve(body, accept=True) == lines_of(MIRROR)
+    assert resolve(body, accept=False) == lines_of(ORIGINAL)
+
+
+def test_deleted_text_uses_del_text():
+    root = document_xml(render_redline_docx(ORIGINAL, MIRROR))
+    for deletion in root.iter(f"{W}del"):
+        assert list(deletion.iter(f"{W}t")) == []
+    for insertion in root.iter(f"{W}ins"):
+        assert list(insertion.iter(f"{W}delText")) == []
+    assert any(True for _ in root.iter(f"{W}delText"))
+
+
+def test_revisions_are_well_formed():
+    data = render_redline_docx(ORIGINAL, MIRROR, title="Redline")
+    root = document_xml(data)
+    revisions = [element for element in root.iter() if element.tag in (f"{W}ins", f"{W}del")]
+    assert revisions
+    ids = [element.get(f"{W}id") for element in revisions]
+    assert len(ids) == len(set(ids))
+    assert all(element.get(f"{W}author") for element in revisions)
+    # Opens in python-docx, title first and clause headings styled
+    document = docx.Document(io.BytesIO(data))
+    assert document.paragraphs[0].text == "Redline"
+    assert document.paragraphs[0].style.name == "Title"
+    assert "Heading 2" in {paragraph.style.name for paragraph in document.paragraphs}
+
+
+def test_same_contracts_give_the_same_file():
+    assert render_redline_docx(ORIGINAL, MIRROR) == render_redline_docx(ORIGINAL, MIRROR)
+    root = document_xml(render_redline_docx(ORIGINAL, ORIGINAL))
+    assert not any(element.tag in (f"{W}ins", f"{W}del") for element in root.iter())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the render pool: output formats from the environment, rendering
+in memory and through a file for large documents, and a fresh pool after a
+worker dies. Runs offline.
+
+Usage:
+    python -m pytest test_render_pool.py
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import docx
+
+from render_pool import DEFAULT_OUTPUT_FORMATS, DOCX, PDF, TXT, RenderPool, output_formats_from_env
+
+CONTRACT = "1. Payment\nThe Client shall pay each invoice within thirty days of receipt.\n"
+
+
+def with_env(values: dict, function):
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        return function()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_output_formats_from_env():
+    formats = with_env({}, output_formats_from_env)
+    assert formats == DEFAULT_OUTPUT_FORMATS and formats['redline'] == [DOCX, PDF]
+
+    formats = with_env(
+        {"OUTPUT_FORMATS_MIRROR": " DOCX, .txt ,rtf", "OUTPUT_FORMATS_GUIDE": "txt"}, output_formats_from_env
+    )
+    assert formats['mirror'] == [DOCX, TXT]
+    assert formats['guide'] == [TXT]
+    # Nothing usable left: the default formats are kept
+    assert with_env({"OUTPUT_FORMATS_REDLINE": "rtf, odt"}, output_formats_from_env)['redline'] == [DOCX, PDF]
+
+
+def test_render_in_memory_and_through_a_file():
+    pool = RenderPool(processes=1, spool_max_memory=len(CONTRACT) + 10)
+    try:
+        small = asyncio.run(pool.render(CONTRACT, DOCX, title="Mirror"))
+        assert isinstance(small, tempfile.SpooledTemporaryFile)
+        assert docx.Document(io.BytesIO(small.read())).paragraphs[0].text == "Mirror"
+        small.close()
+
+        # Above spool_max_memory the worker writes the file, which is already unlinked
+        large = asyncio.run(pool.render(CONTRACT * 3, PDF))
+        assert isinstance(large.name, str) and large.name.endswith(".pdf")
+        assert not os.path.exists(large.name)
+        data = large.read()
+        large.close()
+        assert data.startswith(b"%PDF")
+
+        metrics = pool.metrics()
+        assert metrics[DOCX]['rendered'] == 1
+        assert metrics[PDF]['bytes'] == len(data)
+    finally:
+        pool.shutdown()
+
+
+def test_pool_is_restarted_after_a_worker_dies():
+    pool = RenderPool(processes=1)
+    try:
+        crash = partial(os._exit, 1)
+        try:
+            asyncio.run(pool._render(DOCX, 1, crash, crash))
+            raise AssertionError("render should have failed")
+        except BrokenProcessPool:
+            pass
+        assert pool._executor is None
+        rendered = asyncio.run(pool.render(CONTRACT, TXT))
+        assert rendered.read().decode('utf-8').startswith("1. Payment")
+        rendered.close()
+        assert pool.metrics()[TXT]['rendered'] == 1 and DOCX not in pool.metrics()
+    finally:
+        pool.shutdown()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the retry queue: error classification, exponential backoff,
+dead-lettering, requeueing and persisted state. Runs offline.
+
+Usage:
+    python -m pytest test_retry_queue.py
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from retry_queue import PERMANENT, TRANSIENT, RetryQueue, classify_error
+
+JOB = {'file_id': "1", 'filename': "lease.txt", 'contract_name': "lease"}
+
+
+class FakeClientError(Exception):
+    """Shaped like a botocore ClientError."""
+
+    def __init__(self, code: str):
+        super().__init__(f"An error occurred ({code})")
+        self.response = {'Error': {'Code': code}}
+
+
+class FakeBoxError(Exception):
+    """Shaped like a Box SDK error with an HTTP status."""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def make_queue(directory: str, **kwargs) -> RetryQueue:
+    return RetryQueue(state_file=os.path.join(directory, "retry_queue.json"), **kwargs)
+
+
+def test_classify_error():
+    assert classify_error(FakeClientError("ThrottlingException")) == TRANSIENT
+    assert classify_error(FakeClientError("ValidationException")) == PERMANENT
+    assert classify_error(FakeBoxError(429)) == TRANSIENT
+    assert classify_error(FakeBoxError(503)) == TRANSIENT
+    assert classify_error(FakeBoxError(404)) == PERMANENT
+    assert classify_error(asyncio.TimeoutError()) == TRANSIENT
+    assert classify_error(ConnectionResetError()) == TRANSIENT
+    assert classify_error(ValueError("Bedrock API error: Rate exceeded")) == TRANSIENT
+    # Bugs and unrecognized errors are not retried
+    assert classify_error(KeyError('clauses')) == PERMANENT
+    assert classify_error(RuntimeError("unexpected response")) == PERMANENT
+
+
+def test_classify_error_message():
+    assert classify_error(RuntimeError("Box returned HTTP 503")) == TRANSIENT
+    assert classify_error(RuntimeError("429 Too Many Requests")) == TRANSIENT
+    assert classify_error(RuntimeError("Service Unavailable, try again")) == TRANSIENT
+    # Status codes inside IDs or sizes are not status codes
+    assert classify_error(RuntimeError("File 54291 is not a contract")) == PERMANENT
+    assert classify_error(RuntimeError("Upload of 15030 bytes rejected")) == PERMANENT
+    assert classify_error(ValueError("Field 'category' is unavailable for this model")) == PERMANENT
+
+
+def test_classify_wrapped_error():
+    try:
+        try:
+            raise FakeClientError("ServiceUnavailableException")
+        except FakeClientError as e:
+            raise ValueError("Bedrock API error") from e
+    except ValueError as wrapped:
+        assert classify_error(wrapped) == TRANSIENT
+
+
+def test_backoff_grows_and_is_capped():
+    with tempfile.TemporaryDirectory() as directory:
+        queue = make_queue(directory, base_delay=10, max_delay=40)
+        for attempts, upper in ((1, 10), (2, 20), (3, 40), (4, 40), (10, 40)):
+            for _ in range(20):
+                delay = queue._backoff(attempts)
+                # Jitter keeps the delay between half and all of the step
+                assert upper / 2 <= delay <= upper
+
+
+def test_transient_failures_back_off_then_dead_letter():
+    with tempfile.TemporaryDirectory() as directory:
+        queue = make_queue(directory, max_attempts=3, base_delay=10)
+        error = TimeoutError("read timed out")
+
+        assert queue.record_failure("lease_1", JOB, error) == "retry"
+        assert queue.is_blocked("lease_1")
+        assert queue.due_items() == []
+        assert [entry['key'] for entry in queue.due_items(now=time.time() + 11)] == ["lease_1"]
+        assert not queue.is_blocked("lease_1", now=time.time() + 11)
+
+        assert queue.record_failure("lease_1", JOB, error) == "retry"
+        assert queue.record_failure("lease_1", JOB, error) == "dead"
+        assert "lease_1" not in queue.items
+        assert queue.dead_letter["lease_1"]['attempts'] == 3
+        assert queue.is_blocked("lease_1", now=time.time() + 10 ** 6)
+
+
+def test_permanent_failure_dead_letters_at_once():
+    with tempfile.TemporaryDirectory() as directory:
+        queue = make_queue(directory, max_attempts=5)
+        assert queue.record_failure("lease_1", JOB, KeyError('clauses')) == "dead"
+        assert queue.dead_letter["lease_1"]['error_class'] == PERMANENT
+        assert queue.dead_letter["lease_1"]['filename'] == "lease.txt"
+
+
+def test_requeue_and_success():
+    with tempfile.TemporaryDirectory() as directory:
+        queue = make_queue(directory)
+        queue.record_failure("lease_1", JOB, KeyError('clauses'))
+        queue.record_failure("nda_2", dict(JOB, file_id="2"), KeyError('clauses'))
+
+        assert queue.requeue("lease_1") == 1
+        assert queue.items["lease_1"]['attempts'] == 0
+        assert not queue.is_blocked("lease_1")
+        assert queue.requeue() == 1
+        assert queue.dead_letter == {}
+
+        queue.record_success("lease_1")
+        assert "lease_1" not in queue.items
+
+
+def test_state_survives_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        make_queue(directory).record_failure("lease_1", JOB, TimeoutError())
+        restarted = make_queue(directory)
+        assert restarted.items["lease_1"]['attempts'] == 1
+        assert restarted.is_blocked("lease_1")
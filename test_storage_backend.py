@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the local storage backend: IDs confined to the root, atomic
+writes, version metadata and its hash cache, and change detection by
+polling. Runs offline.
+
+Usage:
+    python -m pytest test_storage_backend.py
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+
+import storage_backend
+from storage_backend import ROOT_FOLDER_ID, LocalStorageBackend
+
+
+def make_backend(directory: str) -> LocalStorageBackend:
+    backend = LocalStorageBackend(os.path.join(directory, "root"), poll_interval=0.01)
+    asyncio.run(backend.initialize())
+    return backend
+
+
+def refused(function, *args) -> bool:
+    try:
+        function(*args)
+    except ValueError:
+        return True
+    return False
+
+
+def test_ids_outside_the_root_are_refused():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = make_backend(directory)
+        os.makedirs(os.path.join(directory, "outside"))
+        os.symlink(os.path.join(directory, "outside"), backend.root / "link")
+        assert backend._path(ROOT_FOLDER_ID) == backend.root
+        assert refused(backend._path, "../outside")
+        assert refused(backend._path, "contracts/../../outside")
+        assert refused(backend._path, os.path.join(directory, "outside"))
+        # A symlink inside the root does not lead out of it either
+        assert refused(backend._path, "link")
+        assert refused(asyncio.run, backend.upload_text_file("..", "escape.txt", "x"))
+        assert not os.path.exists(os.path.join(directory, "escape.txt"))
+
+
+def test_writes_are_atomic_and_temporary_files_are_not_listed():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = make_backend(directory)
+        folder_id = asyncio.run(backend.find_or_create_folder(ROOT_FOLDER_ID, "Smart_Contracts"))
+        file_id = asyncio.run(backend.upload_text_file(folder_id, "lease.txt", "1. Term\nOne year."))
+        assert file_id == "Smart_Contracts/lease.txt"
+        # An interrupted write leaves only its temporary file, which is never listed
+        (backend.root / folder_id / ".nda.txt.tmp").write_text("partial")
+        assert sorted(os.listdir(backend.root / folder_id)) == [".nda.txt.tmp", "lease.txt"]
+        assert [item['name'] for item in asyncio.run(backend.list_folder_items(folder_id))] == ["lease.txt"]
+        assert asyncio.run(backend.read_file(file_id)) == "1. Term\nOne year."
+        assert asyncio.run(backend.find_file_in_folder(folder_id, "nda.txt")) is None
+        backend.close()
+
+
+def test_new_version_updates_sha1_and_keeps_the_id():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = make_backend(directory)
+        file_id = asyncio.run(backend.upload_file(ROOT_FOLDER_ID, "guide.docx", b"version one"))
+        before = asyncio.run(backend.get_file_info(file_id))
+        assert asyncio.run(backend.upload_new_version(file_id, "guide.docx", io.BytesIO(b"version two!"))) == file_id
+        after = asyncio.run(backend.get_file_info(file_id))
+        assert after['sha1'] != before['sha1'] and after['size'] == len(b"version two!")
+        # One cached hash per file, replaced when the file changes
+        assert len(backend._sha1_cache) == 1
+
+        os.remove(backend.root / file_id)
+        asyncio.run(backend.list_folder_items(ROOT_FOLDER_ID))
+        assert backend._sha1_cache == {}
+
+
+def test_polling_detects_changes_without_inotify():
+    available = storage_backend.INOTIFY_AVAILABLE
+    storage_backend.INOTIFY_AVAILABLE = False
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            backend = make_backend(directory)
+
+            async def write_later():
+                await asyncio.sleep(0.03)
+                await backend.upload_text_file(ROOT_FOLDER_ID, "lease.txt", "1. Term")
+
+            async def run():
+                quiet = await backend.wait_for_changes(ROOT_FOLDER_ID, timeout=0.05)
+                writer = asyncio.create_task(write_later())
+                changed = await backend.wait_for_changes(ROOT_FOLDER_ID, timeout=2)
+                await writer
+                return quiet, changed
+
+            assert asyncio.run(run()) == (False, True)
+    finally:
+        storage_backend.INOTIFY_AVAILABLE = available
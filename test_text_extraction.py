@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for local text extraction: format detection from content, DOCX text
+in document order (tables, text boxes, breaks, tracked deletions left out)
+and plain-text decoding. Runs offline.
+
+Usage:
+    python -m pytest test_text_extraction.py
+"""
+
+import asyncio
+import io
+import zipfile
+
+from text_extraction import DOCX, PDF, TXT, TextExtractor, detect_format, extract_text
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def make_docx(body: str) -> bytes:
+    """A minimal DOCX package with the given document body XML."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as package:
+        package.writestr("[Content_Types].xml", "<Types/>")
+        package.writestr(
+            "word/document.xml",
+            f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{W_NS}"><w:body>{body}</w:body></w:document>'
+        )
+    return buffer.getvalue()
+
+
+def paragraph(*runs: str) -> str:
+    return "<w:p>" + "".join(f"<w:r>{run}</w:r>" for run in runs) + "</w:p>"
+
+
+def test_detect_format():
+    assert detect_format(b"%PDF-1.7\n...") == PDF
+    assert detect_format(make_docx(paragraph("<w:t>Term</w:t>"))) == DOCX
+    assert detect_format("1. Term\nThis Agreement starts today.".encode()) == TXT
+    assert detect_format("Term".encode("utf-16")) == TXT
+    # Other zip packages, broken zips, RTF and binaries are not extracted locally
+    other_zip = io.BytesIO()
+    with zipfile.ZipFile(other_zip, "w") as package:
+        package.writestr("xl/workbook.xml", "<workbook/>")
+    assert detect_format(other_zip.getvalue()) is None
+    assert detect_format(b"PK\x03\x04 not really a zip") is None
+    assert detect_format(b"{\\rtf1\\ansi Term}") is None
+    assert detect_format(b"\x7fELF\x02\x01\x01\x00\x00\x00") is None
+
+
+def test_docx_text_in_document_order():
+    body = (
+        paragraph("<w:t>1. Payment</w:t>")
+        + paragraph("<w:t>Pay within</w:t>", '<w:t xml:space="preserve"> thirty </w:t>', "<w:t>days.</w:t>")
+        + "<w:tbl><w:tr><w:tc>" + paragraph("<w:t>Fee</w:t>", "<w:tab/>", "<w:t>$100</w:t>") + "</w:tc></w:tr></w:tbl>"
+        + paragraph("<w:t>Line one</w:t>", "<w:br/>", "<w:t>line two</w:t>", '<w:br w:type="page"/>')
+    )
+    assert extract_text(make_docx(body)) == "1. Payment\nPay within thirty days.\nFee\t$100\nLine one\nline two"
+
+
+def test_docx_text_box_paragraphs_do_not_merge_with_the_outer_paragraph():
+    text_box = "<w:txbxContent>" + paragraph("<w:t>Boxed note</w:t>") + "</w:txbxContent>"
+    body = paragraph("<w:t>Before</w:t>", text_box, "<w:t> after</w:t>")
+    assert extract_text(make_docx(body)).split("\n") == ["Boxed note", "Before after"]
+
+
+def test_docx_tracked_deletions_are_left_out():
+    body = (
+        "<w:p><w:r><w:t>Pay within </w:t></w:r>"
+        "<w:del><w:r><w:delText>thirty</w:delText></w:r></w:del>"
+        "<w:ins><w:r><w:t>sixty</w:t></w:r></w:ins>"
+        "<w:r><w:t xml:space=\"preserve\"> days.</w:t></w:r></w:p>"
+    )
+    assert extract_text(make_docx(body)) == "Pay within sixty days."
+
+
+def test_empty_docx_falls_back():
+    assert extract_text(make_docx(paragraph("<w:t>   </w:t>"))) is None
+
+
+def test_txt_decoding():
+    assert extract_text("\ufeffClause 1 – Fees".encode("utf-8")) == "Clause 1 – Fees"
+    assert extract_text("Clause 1 – Fees".encode("cp1252")) == "Clause 1 – Fees"
+    assert extract_text("Clause 1 – Fees".encode("utf-16")) == "Clause 1 – Fees"
+
+
+def test_extractor_records_metrics_per_format():
+    extractor = TextExtractor(processes=1)
+    try:
+        docx = make_docx(paragraph("<w:t>Term</w:t>"))
+        assert asyncio.run(extractor.extract(docx, "lease.docx")) == "Term"
+        assert asyncio.run(extractor.extract(b"\x00\x01\x02binary", "image.bin")) is None
+        metrics = extractor.metrics()
+        assert (metrics[DOCX]['extracted'], metrics[DOCX]['fallbacks']) == (1, 0)
+        assert (metrics["other"]['extracted'], metrics["other"]['fallbacks']) == (0, 1)
+    finally:
+        extractor.shutdown()
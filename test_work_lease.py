@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for work leases: the in-memory and SQLite lease stores (claiming,
+expiry, renewal, versions, schema migration) and the LeaseManager. Runs
+offline.
+
+Usage:
+    python -m pytest test_work_lease.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+from work_lease import ACQUIRED, DONE, HELD, InMemoryLeaseStore, LeaseManager, SQLiteLeaseStore
+
+TTL = 60
+
+
+@contextmanager
+def lease_stores():
+    """Each local store backend, fresh."""
+    with tempfile.TemporaryDirectory() as directory:
+        yield [InMemoryLeaseStore(), SQLiteLeaseStore(os.path.join(directory, "leases.db"))]
+
+
+def test_one_worker_at_a_time():
+    with lease_stores() as stores:
+        for store in stores:
+            assert store.acquire("lease_1", "a", TTL) == ACQUIRED
+            assert store.acquire("lease_1", "b", TTL) == HELD
+            # Claiming again is how a worker picks its own lease back up
+            assert store.acquire("lease_1", "a", TTL) == ACQUIRED
+            assert store.acquire("nda_2", "b", TTL) == ACQUIRED
+
+
+def test_expired_lease_is_reclaimed():
+    with lease_stores() as stores:
+        for store in stores:
+            assert store.acquire("lease_1", "a", -1) == ACQUIRED
+            assert store.acquire("lease_1", "b", TTL) == ACQUIRED
+            # The crashed worker's lease is gone
+            assert not store.renew("lease_1", "a", TTL)
+            assert store.renew("lease_1", "b", TTL)
+
+
+def test_release():
+    with lease_stores() as stores:
+        for store in stores:
+            store.acquire("lease_1", "a", TTL)
+            store.release("lease_1", "b", done=True)  # not ours: ignored
+            assert store.acquire("lease_1", "b", TTL) == HELD
+
+            store.release("lease_1", "a", done=False)
+            assert store.acquire("lease_1", "b", TTL) == ACQUIRED
+            store.release("lease_1", "b", done=True)
+            assert store.acquire("lease_1", "a", TTL) == DONE
+            assert not store.renew("lease_1", "b", TTL)
+
+            store.forget("lease_1")
+            assert store.acquire("lease_1", "a", TTL) == ACQUIRED
+
+
+def test_done_lease_and_file_versions():
+    with lease_stores() as stores:
+        for store in stores:
+            store.acquire("lease_1", "a", TTL, version="v1")
+            store.release("lease_1", "a", done=True)
+            assert store.acquire("lease_1", "b", TTL, version="v1") == DONE
+            # Without a version to compare, a processed contract stays done
+            assert store.acquire("lease_1", "b", TTL) == DONE
+            # A revised draft is processed again, by one worker
+            assert store.acquire("lease_1", "b", TTL, version="v2") == ACQUIRED
+            assert store.acquire("lease_1", "a", TTL, version="v2") == HELD
+            store.release("lease_1", "b", done=True)
+            assert store.acquire("lease_1", "a", TTL, version="v2") == DONE
+
+
+def test_sqlite_store_shared_between_workers():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "leases.db")
+        first, second = SQLiteLeaseStore(path), SQLiteLeaseStore(path)
+        assert first.acquire("lease_1", "a", TTL) == ACQUIRED
+        assert second.acquire("lease_1", "b", TTL) == HELD
+        first.release("lease_1", "a", done=True)
+        assert second.acquire("lease_1", "b", TTL) == DONE
+
+
+def test_sqlite_migrates_leases_without_versions():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "leases.db")
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute(
+                "CREATE TABLE leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, status TEXT NOT NULL)"
+            )
+            conn.execute("INSERT INTO leases VALUES ('lease_1', 'a', 0, ?)", (DONE,))
+        conn.close()
+
+        store = SQLiteLeaseStore(path)
+        # Done before versions were recorded: not reprocessed on a guess
+        assert store.acquire("lease_1", "b", TTL, version="v2") == DONE
+        assert store.acquire("nda_2", "b", TTL, version="v1") == ACQUIRED
+
+
+def test_lease_manager_claim_and_release():
+    async def run():
+        store = InMemoryLeaseStore()
+        first = LeaseManager(store, ttl=TTL, owner="a")
+        second = LeaseManager(store, ttl=TTL, owner="b")
+
+        assert await first.claim("lease_1", version="v1") == ACQUIRED
+        assert await second.claim("lease_1", version="v1") == HELD
+        await first.release("lease_1", done=True)
+        assert await second.claim("lease_1", version="v1") == DONE
+
+        await first.forget("lease_1")
+        assert await second.claim("lease_1") == ACQUIRED
+        await second.release_all()
+        assert await first.claim("lease_1") == ACQUIRED
+        await first.release_all()
+    asyncio.run(run())
+
+
+def test_lease_manager_notices_lost_lease():
+    async def run():
+        store = InMemoryLeaseStore()
+        slow = LeaseManager(store, ttl=0.06, owner="a")
+        assert await slow.claim("lease_1") == ACQUIRED
+        # Another worker takes the lease before the renewal comes round
+        store._leases["lease_1"]['expires_at'] = 0
+        assert store.acquire("lease_1", "b", TTL) == ACQUIRED
+        await asyncio.sleep(0.1)
+        assert slow.lost("lease_1")
+
+        # Releasing a lost lease leaves the new owner's lease alone
+        await slow.release("lease_1", done=True)
+        assert not slow.lost("lease_1")
+        assert store.acquire("lease_1", "c", TTL) == HELD
+    asyncio.run(run())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Text Extraction
+Extracts contract text locally from downloaded TXT, DOCX and PDF bytes in a
+process pool, so reading a contract needs no remote text extraction (which
+adds a round-trip and returns nothing useful until the storage service has
+built the file's text representation). Callers fall back to the remote
+extraction when a file cannot be extracted locally.
+
+DOCX text is read straight from the package XML (paragraphs, tables and text
+boxes in document order). PDF text needs pypdf; without it, or for PDFs
+without a text layer (scans), extract_text returns None.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+    PDF_EXTRACTION_AVAILABLE = True
+except ImportError:
+    PDF_EXTRACTION_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+TXT = "txt"
+DOCX = "docx"
+PDF = "pdf"
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DOCX_DOCUMENT_PART = 'word/document.xml'
+
+# Files up to this size are extracted on the event loop's thread pool instead
+# of being sent to a worker process
+INLINE_MAX_BYTES = 64 * 1024
+
+
+def detect_format(data: bytes) -> Optional[str]:
+    """
+    File format from the content, not the name (uploads are not always named
+    after their format); None if the file cannot be extracted locally.
+    """
+    if data.startswith(b'%PDF'):
+        return PDF
+    if data.startswith(b'PK\x03\x04'):
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as package:
+                return DOCX if DOCX_DOCUMENT_PART in package.namelist() else None
+        except zipfile.BadZipFile:
+            return None
+    if data.startswith(b'{\\rtf'):
+        return None
+    if data.startswith((b'\xff\xfe', b'\xfe\xff')) or b'\x00' not in data[:8192]:
+        return TXT
+    return None
+
+
+def extract_docx_text(data: bytes) -> str:
+    """Paragraph texts of a DOCX body, one per line; tracked deletions are left out."""
+    paragraphs = []
+    with zipfile.ZipFile(io.BytesIO(data)) as package, package.open(DOCX_DOCUMENT_PART) as document:
+        stack = []  # text parts of the open paragraphs (text boxes nest paragraphs)
+        for event, element in ElementTree.iterparse(document, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                if tag == f'{_W}p':
+                    stack.append([])
+                continue
+            if not stack:
+                continue
+            if tag == f'{_W}t':
+                stack[-1].append(element.text or "")
+            elif tag == f'{_W}tab':
+                stack[-1].append("\t")
+            elif tag == f'{_W}cr' or tag == f'{_W}br' and element.get(f'{_W}type', 'textWrapping') == 'textWrapping':
+                # Page and column breaks are layout, not text
+                stack[-1].append("\n")
+            elif tag == f'{_W}p':
+                paragraphs.append("".join(stack.pop()))
+                element.clear()
+    return "\n".join(paragraphs)
+
+
+def extract_pdf_text(data: bytes) -> Optional[str]:
+    """Text of every page (pypdf); None without pypdf."""
+    if not PDF_EXTRACTION_AVAILABLE:
+        return None
+    reader = PdfReader(io.BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_txt_text(data: bytes) -> str:
+    """Plain text as UTF-16 (with a BOM), UTF-8 or, failing that, Windows-1252."""
+    if data.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return data.decode('utf-16', errors='replace')
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+
+def extract_text(data: bytes) -> Optional[str]:
+    """
+    Extract the text of a TXT, DOCX or PDF file.
+
+    Returns:
+        The text, or None when the file cannot be extracted locally
+        (unsupported format, PDF without pypdf or without a text layer)
+    """
+    file_format = detect_format(data)
+    if file_format == DOCX:
+        text = extract_docx_text(data)
+    elif file_format == PDF:
+        text = extract_pdf_text(data)
+    elif file_format == TXT:
+        return extract_txt_text(data)
+    else:
+        return None
+    return text if text and text.strip() else None
+
+
+class TextExtractor:
+    """
+    Process pool for local text extraction, with per-format metrics.
+
+    Args:
+        processes: Worker processes (EXTRACTION_PROCESSES, default up to 2);
+                   the pool is started on first use
+    """
+
+    def __init__(self, processes: Optional[int] = None):
+        self.processes = processes or int(os.getenv("EXTRACTION_PROCESSES", str(min(2, os.cpu_count() or 1))))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._stats: Dict[str, Dict] = {}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    async def extract(self, data: bytes, filename: Optional[str] = None) -> Optional[str]:
+        """
+        Extract text off the event loop (see extract_text); None means use a
+        fallback. Small files are extracted in a thread, larger ones in the
+        pool. filename is only used in log messages.
+        """
+        started = time.perf_counter()
+        file_format = detect_format(data) or "other"
+        try:
+            if len(data) <= INLINE_MAX_BYTES or file_format == TXT:
+                text = await asyncio.to_thread(extract_text, data)
+            else:
+                text = await asyncio.get_running_loop().run_in_executor(self._pool(), extract_text, data)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for later extractions
+            logger.error(f"Text extraction pool broke while extracting {filename or file_format}; restarting it")
+            self._executor = None
+            raise
+        self._record(file_format, time.perf_counter() - started, text is not None)
+        return text
+
+    def _record(self, file_format: str, seconds: float, extracted: bool):
+        stats = self._stats.setdefault(file_format, {'extracted': 0, 'fallbacks': 0, 'total_seconds': 0.0})
+        stats['extracted' if extracted else 'fallbacks'] += 1
+        stats['total_seconds'] += seconds
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Local extractions, fallbacks and average time per format."""
+        return {
+            file_format: dict(stats, avg_seconds=stats['total_seconds'] / (stats['extracted'] + stats['fallbacks']))
+            for file_format, stats in self._stats.items()
+        }
+
+    def log_metrics(self):
+        """Log a one-line summary per format."""
+        for file_format, m in self.metrics().items():
+            logger.info(
+                f"Extract {file_format:<5} local={m['extracted']} fallback={m['fallbacks']} "
+                f"avg={m['avg_seconds'] * 1000:.0f}ms"
+            )
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Work Leases
+Lets several contract processors share one Box folder without processing a
+contract twice. A worker claims a contract through a time-limited lease in a
+shared store, renews it while working, and marks it done at the end. Leases
+of crashed workers expire and are reclaimed by the others.
+
+Backends (LEASE_BACKEND):
+    memory   - in-process stand-in for tests and single-process runs
+    sqlite   - shared SQLite file, for several workers on one host
+    dynamodb - DynamoDB table with conditional writes, for several hosts
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Results of LeaseStore.acquire
+ACQUIRED = "acquired"
+HELD = "held"   # another worker holds a live lease
+DONE = "done"   # already processed by some worker
+
+LEASED = "leased"
+
+
+def _new_version(done_version: Optional[str], version: Optional[str]) -> bool:
+    """True if a contract done at done_version has since changed (unknown versions never count)."""
+    return bool(done_version and version and done_version != version)
+
+
+class LeaseStore:
+    """Interface for lease storage backends."""
+
+    def acquire(self, key: str, owner: str, ttl: float, version: Optional[str] = None) -> str:
+        """
+        Take the lease on a contract if it is free, expired or already ours.
+        The lease records the file version being processed; a contract done at
+        another version (a revised draft) is free again.
+
+        Returns:
+            ACQUIRED, HELD or DONE
+        """
+        raise NotImplementedError
+
+    def renew(self, key: str, owner: str, ttl: float) -> bool:
+        """Extend our lease. Returns False if it was lost to another worker."""
+        raise NotImplementedError
+
+    def release(self, key: str, owner: str, done: bool):
+        """Give up our lease; done=True records the contract as processed."""
+        raise NotImplementedError
+
+    def forget(self, key: str):
+        """Clear all state for a contract so it is processed again."""
+        raise NotImplementedError
+
+
+class InMemoryLeaseStore(LeaseStore):
+    """Lease store local to one process (tests and single-worker runs)."""
+
+    def __init__(self):
+        self._leases: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, owner: str, ttl: float, version: Optional[str] = None) -> str:
+        now = time.time()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease and lease['status'] == DONE:
+                if not _new_version(lease.get('version'), version):
+                    return DONE
+            elif lease and lease['owner'] != owner and lease['expires_at'] > now:
+                return HELD
+            self._leases[key] = {'owner': owner, 'expires_at': now + ttl, 'status': LEASED, 'version': version}
+            return ACQUIRED
+
+    def renew(self, key: str, owner: str, ttl: float) -> bool:
+        with self._lock:
+            lease = self._leases.get(key)
+            if not lease or lease['owner'] != owner or lease['status'] != LEASED:
+                return False
+            lease['expires_at'] = time.time() + ttl
+            return True
+
+    def release(self, key: str, owner: str, done: bool):
+        with self._lock:
+            lease = self._leases.get(key)
+            if not lease or lease['owner'] != owner:
+                return
+            if done:
+                lease['status'] = DONE
+            else:
+                del self._leases[key]
+
+    def forget(self, key: str):
+        with self._lock:
+            self._leases.pop(key, None)
+
+
+class SQLiteLeaseStore(LeaseStore):
+    """Lease store in a SQLite file shared by workers on one host."""
+
+    # Next to this module, so workers started from any directory share it
+    DEFAULT_PATH = Path(__file__).parent / "contract_leases.db"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or str(self.DEFAULT_PATH)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                " key TEXT PRIMARY KEY,"
+                " owner TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " status TEXT NOT NULL,"
+                " version TEXT)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(leases)")]
+            if 'version' not in columns:
+                # Databases created before leases recorded the file version
+                conn.execute("ALTER TABLE leases ADD COLUMN version TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (calls arrive from asyncio worker threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key: str, owner: str, ttl: float, version: Optional[str] = None) -> str:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            # Single conditional upsert, so two workers cannot both win
+            cursor = conn.execute(
+                "INSERT INTO leases (key, owner, expires_at, status, version) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, "
+                " expires_at = excluded.expires_at, status = excluded.status, version = excluded.version "
+                "WHERE (leases.status != ? AND (leases.expires_at < ? OR leases.owner = excluded.owner)) "
+                " OR (leases.status = ? AND leases.version IS NOT NULL AND excluded.version IS NOT NULL"
+                "     AND leases.version != excluded.version)",
+                (key, owner, now + ttl, LEASED, version, DONE, now, DONE)
+            )
+            if cursor.rowcount:
+                return ACQUIRED
+            row = conn.execute("SELECT status FROM leases WHERE key = ?", (key,)).fetchone()
+        return DONE if row and row[0] == DONE else HELD
+
+    def renew(self, key: str, owner: str, ttl: float) -> bool:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ? AND status = ?",
+                (time.time() + ttl, key, owner, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, key: str, owner: str, done: bool):
+        conn = self._connect()
+        with conn:
+            if done:
+                conn.execute(
+                    "UPDATE leases SET status = ? WHERE key = ? AND owner = ?",
+                    (DONE, key, owner)
+                )
+            else:
+                conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def forget(self, key: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM leases WHERE key = ?", (key,))
+
+
+class DynamoDBLeaseStore(LeaseStore):
+    """
+    Lease store in a DynamoDB table (partition key "lease_key", string)
+    shared by workers on several hosts.
+    """
+
+    def __init__(self, table_name: str, region_name: Optional[str] = None):
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self._conditional_failure = ClientError
+        self.table_name = table_name
+        self.client = boto3.client(
+            'dynamodb',
+            region_name=region_name or os.getenv("AWS_DEFAULT_REGION", "us-east-1")
+        )
+
+    def _is_condition_failure(self, error: Exception) -> bool:
+        return (
+            isinstance(error, self._conditional_failure)
+            and error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+        )
+
+    def acquire(self, key: str, owner: str, ttl: float, version: Optional[str] = None) -> str:
+        now = time.time()
+        item = {
+            'lease_key': {'S': key},
+            'lease_owner': {'S': owner},
+            'expires_at': {'N': str(now + ttl)},
+            'lease_status': {'S': LEASED},
+        }
+        condition = (
+            "attribute_not_exists(lease_key) OR "
+            "(lease_status <> :done AND (expires_at < :now OR lease_owner = :owner))"
+        )
+        values = {
+            ':done': {'S': DONE},
+            ':now': {'N': str(now)},
+            ':owner': {'S': owner},
+        }
+        if version:
+            item['lease_version'] = {'S': version}
+            condition += " OR (lease_status = :done AND attribute_exists(lease_version) AND lease_version <> :version)"
+            values[':version'] = {'S': version}
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item=item,
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values
+            )
+            return ACQUIRED
+        except Exception as e:
+            if not self._is_condition_failure(e):
+                raise
+        item = self.client.get_item(
+            TableName=self.table_name,
+            Key={'lease_key': {'S': key}},
+            ConsistentRead=True
+        ).get('Item', {})
+        return DONE if item.get('lease_status', {}).get('S') == DONE else HELD
+
+    def renew(self, key: str, owner: str, ttl: float) -> bool:
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={'lease_key': {'S': key}},
+                UpdateExpression="SET expires_at = :expires",
+                ConditionExpression="lease_owner = :owner AND lease_status = :leased",
+                ExpressionAttributeValues={
+                    ':expires': {'N': str(time.time() + ttl)},
+                    ':owner': {'S': owner},
+                    ':leased': {'S': LEASED},
+                }
+            )
+            return True
+        except Exception as e:
+            if self._is_condition_failure(e):
+                return False
+            raise
+
+    def release(self, key: str, owner: str, done: bool):
+        try:
+            if done:
+                self.client.update_item(
+                    TableName=self.table_name,
+                    Key={'lease_key': {'S': key}},
+                    UpdateExpression="SET lease_status = :done",
+                    ConditionExpression="lease_owner = :owner",
+                    ExpressionAttributeValues={':done': {'S': DONE}, ':owner': {'S': owner}}
+                )
+            else:
+                self.client.delete_item(
+                    TableName=self.table_name,
+                    Key={'lease_key': {'S': key}},
+                    ConditionExpression="lease_owner = :owner",
+                    ExpressionAttributeValues={':owner': {'S': owner}}
+                )
+        except Exception as e:
+            if not self._is_condition_failure(e):
+                raise
+
+    def forget(self, key: str):
+        self.client.delete_item(TableName=self.table_name, Key={'lease_key': {'S': key}})
+
+
+def create_lease_store() -> Optional[LeaseStore]:
+    """Build the lease store selected by LEASE_BACKEND (None = single-worker mode)."""
+    backend = os.getenv("LEASE_BACKEND", "").lower()
+    if not backend or backend == "none":
+        return None
+    if backend == "memory":
+        return InMemoryLeaseStore()
+    if backend == "sqlite":
+        return SQLiteLeaseStore(os.getenv("LEASE_SQLITE_PATH", str(SQLiteLeaseStore.DEFAULT_PATH)))
+    if backend == "dynamodb":
+        return DynamoDBLeaseStore(os.getenv("LEASE_DYNAMODB_TABLE", "contract-processor-leases"))
+    raise ValueError(f"Unknown LEASE_BACKEND: {backend}")
+
+
+class LeaseManager:
+    """Claims, renews and releases leases for this worker."""
+
+    def __init__(self, store: LeaseStore, ttl: Optional[float] = None, owner: Optional[str] = None):
+        self.store = store
+        self.ttl = ttl or float(os.getenv("LEASE_TTL", "300"))
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._renewals: Dict[str, asyncio.Task] = {}
+        self._lost = set()
+
+    async def claim(self, key: str, version: Optional[str] = None) -> str:
+        """
+        Try to claim a contract (at a file version, e.g. its SHA-1) and keep
+        the lease alive while we hold it.
+
+        Returns:
+            ACQUIRED, HELD or DONE (DONE: processed at this version)
+        """
+        result = await asyncio.to_thread(self.store.acquire, key, self.owner, self.ttl, version)
+        if result == ACQUIRED:
+            self._lost.discard(key)
+            self._renewals[key] = asyncio.create_task(self._renew_loop(key))
+        return result
+
+    async def _renew_loop(self, key: str):
+        """Renew the lease every third of its TTL until released."""
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                renewed = await asyncio.to_thread(self.store.renew, key, self.owner, self.ttl)
+            except Exception as e:
+                # Keep trying; the lease only lapses after a full TTL without renewal
+                logger.warning(f"Could not renew lease on {key}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Lost lease on {key} to another worker")
+                self._lost.add(key)
+                return
+
+    def lost(self, key: str) -> bool:
+        """True if another worker took over our lease."""
+        return key in self._lost
+
+    async def release(self, key: str, done: bool):
+        """Stop renewing and release the lease (done=True marks the contract processed)."""
+        task = self._renewals.pop(key, None)
+        if task:
+            task.cancel()
+        if key in self._lost:
+            self._lost.discard(key)
+            return
+        try:
+            await asyncio.to_thread(self.store.release, key, self.owner, done)
+        except Exception as e:
+            logger.error(f"Error releasing lease on {key}: {e}")
+
+    async def forget(self, key: str):
+        """Allow a processed contract to be claimed and processed again."""
+        await asyncio.to_thread(self.store.forget, key)
+
+    async def release_all(self):
+        """Release every lease we still hold (e.g. on shutdown)."""
+        for key in list(self._renewals):
+            await self.release(key, done=False)